@@ -0,0 +1,139 @@
+"""Fixtures for the endpoint benchmarks (``pytest -m benchmark benchmarks``).
+
+The ``seed_store`` dataset is created once per session, outside the
+per-test transactions.
+Environment variables:
+
+- ``BENCHMARK_SCALE``: dataset size multiplier (default 1).
+- ``BENCHMARK_ITERATIONS``: timed requests per endpoint (default 30).
+- ``BENCHMARK_TOLERANCE``: allowed latency regression over the baseline,
+  as a fraction. Unset by default, since latency baselines only hold on
+  the machine that recorded them: set it where the baseline was recorded
+  (e.g. a dedicated CI runner) to check latency as well as query counts.
+- ``BENCHMARK_BASELINE``: baseline file (default ``benchmarks/baseline.json``).
+- ``BENCHMARK_UPDATE_BASELINE``: when true, write this run's results to the
+  baseline file instead of comparing against it.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from orders.models import Order
+from products.models import Product
+from products.seeding import PASSWORD, seed_store
+from products.sitemaps import build_sitemaps
+
+SCALE = float(os.getenv("BENCHMARK_SCALE", 1))
+ITERATIONS = int(os.getenv("BENCHMARK_ITERATIONS", 30))
+TOLERANCE = float(os.environ["BENCHMARK_TOLERANCE"]) if os.getenv("BENCHMARK_TOLERANCE") else None
+METRICS_TOKEN = "bench-scrape"
+BULK_IDS = 20
+BASELINE = Path(os.getenv("BENCHMARK_BASELINE", Path(__file__).with_name("baseline.json")))
+UPDATE_BASELINE = os.getenv("BENCHMARK_UPDATE_BASELINE", "False").lower() == "true"
+
+results_key = pytest.StashKey[dict]()
+
+
+@pytest.fixture(scope="session")
+def django_db_setup(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        seed_store(
+            categories=max(1, int(2000 * SCALE)),
+            products=max(1, int(5000 * SCALE)),
+            users=int(2000 * SCALE),
+            orders=int(20000 * SCALE),
+        )
+
+
+@pytest.fixture(scope="session")
+def bench(django_db_setup, django_db_blocker, tmp_path_factory):
+    """Objects, logged-in clients and built sitemaps shared by all endpoint benchmarks."""
+    sitemap_dir = tmp_path_factory.mktemp("sitemaps")
+    with django_db_blocker.unblock():
+        user = (
+            get_user_model()
+            .objects.annotate(order_count=Count("orders"))
+            .order_by("-order_count", "pk")
+            .first()
+        )
+        product = (
+            Product.objects.filter(is_active=True, stock__gt=10)
+            .order_by("-rating_count", "pk")
+            .first()
+        )
+        order = Order.objects.filter(user=user).order_by("pk").first()
+        refresh = RefreshToken.for_user(user)
+        staff, _ = get_user_model().objects.get_or_create(
+            username="bench-staff", defaults={"is_staff": True}
+        )
+        ids = list(
+            Product.objects.filter(is_active=True)
+            .order_by("-pk")
+            .values_list("pk", flat=True)[:BULK_IDS]
+        )
+
+        with override_settings(SITEMAP_DIR=str(sitemap_dir)):
+            build_sitemaps()
+
+        session_client = Client()
+        session_client.force_login(user)
+        session_client.post(f"/cart/add/{product.pk}/", {"quantity": 1})
+
+    return {
+        "user": user,
+        "username": user.username,
+        "password": PASSWORD,
+        "product": product,
+        "order": order,
+        "refresh": str(refresh),
+        "access": str(refresh.access_token),
+        "staff_access": str(RefreshToken.for_user(staff).access_token),
+        "ids": ",".join(map(str, ids)),
+        "session_client": session_client,
+        "sitemap_dir": sitemap_dir,
+    }
+
+
+@pytest.fixture
+def bench_settings(settings, bench):
+    """Serve the sitemaps ``bench`` built and let the benchmarks scrape ``/metrics``."""
+    settings.SITEMAP_DIR = str(bench["sitemap_dir"])
+    settings.METRICS_TOKEN = METRICS_TOKEN
+
+
+@pytest.fixture(scope="session")
+def baseline():
+    if UPDATE_BASELINE or not BASELINE.exists():
+        return {}
+    return json.loads(BASELINE.read_text())["endpoints"]
+
+
+@pytest.fixture(scope="session")
+def benchmark_results(pytestconfig):
+    results = pytestconfig.stash[results_key] = {}
+    yield results
+    if UPDATE_BASELINE and results:
+        BASELINE.write_text(
+            json.dumps({"endpoints": dict(sorted(results.items()))}, indent=2) + "\n"
+        )
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = config.stash.get(results_key, None)
+    if not results:
+        return
+    terminalreporter.section("endpoint benchmarks")
+    terminalreporter.write_line(f"{'endpoint':<32} {'queries':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, result in sorted(results.items()):
+        terminalreporter.write_line(
+            f"{name:<32} {result['queries']:>7} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}"
+        )
+    if UPDATE_BASELINE:
+        terminalreporter.write_line(f"Baseline written to {BASELINE}")
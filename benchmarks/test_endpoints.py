@@ -0,0 +1,193 @@
+"""Query-count and latency regression checks for every HTML view and API endpoint.
+
+Each endpoint is requested once to warm caches, once more to count its SQL
+queries, then ``BENCHMARK_ITERATIONS`` times to measure latency. A test
+fails when the query count exceeds the endpoint's budget or its baseline.
+Latency is always reported; it only fails the test when
+``BENCHMARK_TOLERANCE`` is set and p50/p95 exceed the baseline by more
+than that fraction.
+"""
+
+import itertools
+import statistics
+import time
+from contextlib import ExitStack
+from typing import NamedTuple, Optional
+
+import pytest
+from django.db import connections
+from django.test import Client
+
+from config.instrumentation import QueryRecorder
+from config.loadtest import percentile
+
+from .conftest import ITERATIONS, METRICS_TOKEN, TOLERANCE
+
+pytestmark = [
+    pytest.mark.benchmark, pytest.mark.django_db, pytest.mark.usefixtures("bench_settings")
+]
+
+# Latency differences below this are noise, whatever the relative change
+MIN_REGRESSION_MS = 5.0
+
+_client_ips = itertools.count()
+
+
+class Endpoint(NamedTuple):
+    name: str
+    path: str
+    budget: int
+    auth: str = "anon"  # "anon", "session" (logged-in browser), "jwt", "staff" or "metrics"
+    method: str = "get"
+    data: Optional[object] = None
+    content_type: Optional[str] = None
+
+
+ENDPOINTS = [
+    # HTML views
+    Endpoint("home", "/", 3),
+    Endpoint("product_list", "/products/", 4),
+    Endpoint("product_list_deep_page", "/products/?page=50", 4),
+    Endpoint("product_list_filtered", "/products/?category={category}&sort=rating", 4),
+    Endpoint("product_list_search", "/products/?search=Product+12&sort=price", 4),
+    Endpoint("product_detail", "/products/{slug}/", 3),
+    Endpoint("product_detail_user", "/products/{slug}/", 6, auth="session"),
+    Endpoint("guides_recipes", "/guides-recipes/", 0),
+    Endpoint("community", "/community/", 0),
+    Endpoint("resources", "/resources/", 0),
+    Endpoint("contact", "/contact/", 0),
+    Endpoint("cart", "/cart/", 0),
+    Endpoint("cart_with_items", "/cart/", 3, auth="session"),
+    Endpoint("checkout", "/checkout/", 2, auth="session"),
+    Endpoint("login", "/accounts/login/", 0),
+    Endpoint("register", "/accounts/register/", 0),
+    Endpoint("profile", "/accounts/profile/", 3, auth="session"),
+    Endpoint(
+        "cart_update", "/cart/update/{product_id}/", 5, auth="session", method="post",
+        data={"quantity": 1},
+    ),
+    # API
+    Endpoint("api_product_list", "/api/products/", 4),
+    Endpoint("api_product_list_deep_page", "/api/products/?page=100", 4),
+    Endpoint("api_product_list_ordered", "/api/products/?ordering=price&category={category_id}", 5),
+    Endpoint("api_product_bulk", "/api/products/?ids={ids}", 3),
+    Endpoint("api_product_changes", "/api/products/changes/", 4),
+    Endpoint(
+        "api_product_inventory", "/api/products/inventory/", 3, auth="staff", method="post",
+        data=[{"slug": "{slug}", "stock": "{stock}"}], content_type="application/json",
+    ),
+    Endpoint("api_product_detail", "/api/products/{product_id}/", 3),
+    Endpoint("api_product_reviews", "/api/products/{product_id}/reviews/", 2),
+    Endpoint("api_product_reviews_filtered", "/api/products/{product_id}/reviews/?rating=5", 2),
+    Endpoint("api_cart", "/api/cart/", 0),
+    Endpoint("api_orders", "/api/orders/", 3, auth="jwt"),
+    Endpoint("api_order_detail", "/api/orders/{order_id}/", 2, auth="jwt"),
+    Endpoint("api_profile", "/api/users/profile/", 1, auth="jwt"),
+    Endpoint(
+        "api_token", "/api/token/", 1, method="post",
+        data={"username": "{username}", "password": "{password}"},
+    ),
+    Endpoint(
+        "api_token_refresh", "/api/token/refresh/", 1, method="post", data={"refresh": "{refresh}"}
+    ),
+    Endpoint(
+        "api_batch", "/api/batch/", 8, method="post", content_type="application/json",
+        data={"requests": [
+            {"path": "/api/products/{product_id}/"},
+            {"path": "/api/products/?ids={ids}"},
+            {"path": "/api/products/{product_id}/reviews/"},
+        ]},
+    ),
+    Endpoint("api_schema", "/api/schema/", 0),
+    Endpoint("api_docs", "/api/docs/", 0),
+    Endpoint("api_redoc", "/api/redoc/", 0),
+    # Operations
+    Endpoint("metrics", "/metrics", 0, auth="metrics"),
+    Endpoint("sitemap_index", "/sitemap.xml", 0),
+    Endpoint("sitemap_shard", "/sitemap-products-0.xml.gz", 0),
+    Endpoint("product_feed", "/product-feed.xml.gz", 0),
+]
+
+
+def format_data(value, params):
+    """``value`` with ``{name}`` placeholders filled in, through nested lists and dicts."""
+    if isinstance(value, dict):
+        return {key: format_data(item, params) for key, item in value.items()}
+    if isinstance(value, list):
+        return [format_data(item, params) for item in value]
+    return str(value).format(**params)
+
+
+def make_request(endpoint, bench):
+    params = {
+        "slug": bench["product"].slug,
+        "product_id": bench["product"].pk,
+        "category": bench["product"].category.slug,
+        "category_id": bench["product"].category_id,
+        "order_id": bench["order"].pk,
+        "username": bench["username"],
+        "password": bench["password"],
+        "refresh": bench["refresh"],
+        "stock": bench["product"].stock,
+        "ids": bench["ids"],
+    }
+    client = bench["session_client"] if endpoint.auth == "session" else Client()
+    headers = {}
+    if endpoint.auth == "jwt":
+        headers["HTTP_AUTHORIZATION"] = f"Bearer {bench['access']}"
+    elif endpoint.auth == "staff":
+        headers["HTTP_AUTHORIZATION"] = f"Bearer {bench['staff_access']}"
+    elif endpoint.auth == "metrics":
+        headers["HTTP_AUTHORIZATION"] = f"Bearer {METRICS_TOKEN}"
+    if endpoint.content_type:
+        headers["content_type"] = endpoint.content_type
+    data = format_data(endpoint.data, params) if endpoint.data else None
+    path = endpoint.path.format(**params)
+
+    def request():
+        # A fresh client address per request keeps the rate limits out of the numbers
+        n = next(_client_ips)
+        return getattr(client, endpoint.method)(
+            path, data, REMOTE_ADDR=f"10.9.{n // 256 % 256}.{n % 256}", **headers
+        )
+
+    return request
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS, ids=lambda endpoint: endpoint.name)
+def test_endpoint(endpoint, bench, baseline, benchmark_results):
+    request = make_request(endpoint, bench)
+    response = request()
+    assert response.status_code < 400, f"{endpoint.name}: HTTP {response.status_code}"
+
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        request()
+
+    timings = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        request()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    result = {
+        "queries": recorder.count,
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(percentile(sorted(timings), 0.95), 2),
+    }
+    benchmark_results[endpoint.name] = result
+
+    failures = []
+    if result["queries"] > endpoint.budget:
+        failures.append(f"{result['queries']} queries, budget is {endpoint.budget}")
+    expected = baseline.get(endpoint.name)
+    if expected:
+        if result["queries"] > expected["queries"]:
+            failures.append(f"{result['queries']} queries, baseline is {expected['queries']}")
+        for key in ("p50_ms", "p95_ms") if TOLERANCE is not None else ():
+            allowed = max(expected[key] * (1 + TOLERANCE), expected[key] + MIN_REGRESSION_MS)
+            if result[key] > allowed:
+                failures.append(f"{key} {result[key]:.2f}, baseline {expected[key]:.2f}")
+    assert not failures, f"{endpoint.name}: " + "; ".join(failures)
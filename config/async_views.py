@@ -0,0 +1,78 @@
+"""Async (ASGI) read path for DRF views.
+
+DRF views are synchronous. ``AsyncReadAPIMixin`` adds an ``as_async_view``
+constructor that serves GET/HEAD from ``a<action>`` coroutines (``aget``,
+``alist``, ``aretrieve``) and hands every other method to the regular
+synchronous view. Authentication, permission and throttle checks keep using
+DRF's own code in a single thread hop; the ORM work and serialization of the
+response stay on the event loop.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+
+from products.pagination import apaginate
+
+SAFE_METHODS = ("GET", "HEAD")
+
+
+class AsyncReadAPIMixin:
+    """Serve a DRF view's safe methods from coroutines under ASGI."""
+
+    @classmethod
+    def as_async_view(cls, actions=None, **initkwargs):
+        if actions is not None:
+            actions = {"head": actions["get"], **actions}
+            sync_view = cls.as_view(actions, **initkwargs)
+        else:
+            sync_view = cls.as_view(**initkwargs)
+        sync_view = sync_to_async(sync_view)
+
+        async def view(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return await sync_view(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            if actions is not None:
+                self.action_map = actions
+            return await self.adispatch(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.csrf_exempt = True
+        return view
+
+    async def adispatch(self, request, *args, **kwargs):
+        """Async counterpart of ``APIView.dispatch`` for safe methods."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, f"a{getattr(self, 'action', None) or 'get'}")
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def apaginate_queryset(self, queryset):
+        """Async counterpart of ``PageNumberPagination.paginate_queryset``."""
+        pagination = self.paginator
+        pagination.request = self.request
+        page_size = pagination.get_page_size(self.request)
+        number = self.request.query_params.get(pagination.page_query_param) or 1
+        if number in pagination.last_page_strings:
+            number = "last"
+
+        try:
+            pagination.page = await apaginate(queryset, page_size, number)
+        except InvalidPage as exc:
+            raise NotFound(
+                pagination.invalid_page_message.format(page_number=number, message=str(exc))
+            )
+        return list(pagination.page)
@@ -0,0 +1,131 @@
+"""Several read-only API requests in one HTTP round trip.
+
+``POST /api/batch/`` takes ``{"requests": [{"method": "GET", "path":
+"/api/products/1/"}, ...]}`` and answers ``{"responses": [{"status": 200,
+"body": ...}, ...]}`` in the same order. Every sub-request is resolved
+against the active URLconf and dispatched to its view in this process,
+carrying the batch request's headers and cookies. Authentication,
+permissions and throttling therefore apply to each sub-request as if it
+had been sent on its own. Only ``GET`` requests to ``/api/`` routes are
+accepted, at most ``API_BATCH_MAX_REQUESTS`` per batch.
+"""
+
+import copy
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, QueryDict
+from django.urls import Resolver404, resolve, reverse
+from django.utils.datastructures import MultiValueDict
+from rest_framework import generics, permissions, serializers
+from rest_framework.response import Response
+
+API_PREFIX = "/api/"
+# Headers that belong to the batch request itself, not to its sub-requests
+BATCH_ONLY_META = (
+    "CONTENT_LENGTH",
+    "CONTENT_TYPE",
+    "HTTP_IF_MATCH",
+    "HTTP_IF_MODIFIED_SINCE",
+    "HTTP_IF_NONE_MATCH",
+    "HTTP_IF_UNMODIFIED_SINCE",
+)
+# Cached properties of HttpRequest derived from META
+DERIVED_ATTRIBUTES = ("headers", "accepted_types")
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=["GET"], default="GET")
+    path = serializers.CharField(max_length=2048)
+
+    def validate_path(self, value):
+        path = urlsplit(value).path
+        if not path.startswith(API_PREFIX) or path == reverse("api_batch"):
+            raise serializers.ValidationError(
+                f"Must be an {API_PREFIX} path other than the batch endpoint."
+            )
+        return value
+
+
+class SubResponseSerializer(serializers.Serializer):
+    status = serializers.IntegerField()
+    body = serializers.JSONField()
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False, write_only=True)
+    responses = SubResponseSerializer(many=True, read_only=True)
+
+    def validate_requests(self, value):
+        limit = settings.API_BATCH_MAX_REQUESTS
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} requests per batch.")
+        return value
+
+
+class BatchAPIView(generics.GenericAPIView):
+    """Run a list of GET sub-requests and return their responses together."""
+
+    serializer_class = BatchSerializer
+    # Each sub-request checks its own permissions
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        responses = [
+            execute(request._request, item["path"])
+            for item in serializer.validated_data["requests"]
+        ]
+        return Response({"responses": responses})
+
+
+def execute(request, path):
+    """``{"status", "body"}`` of a GET of ``path`` made with ``request``'s credentials."""
+    subrequest = make_subrequest(request, path)
+    try:
+        match = resolve(subrequest.path_info, getattr(request, "urlconf", None))
+    except Resolver404:
+        return {"status": 404, "body": {"detail": "Not found."}}
+    subrequest.resolver_match = match
+    view = match.func
+    if iscoroutinefunction(view):
+        view = async_to_sync(view)
+    try:
+        response = view(subrequest, *match.args, **match.kwargs)
+    except Http404:
+        return {"status": 404, "body": {"detail": "Not found."}}
+    except PermissionDenied:
+        return {"status": 403, "body": {"detail": "Permission denied."}}
+    if hasattr(response, "data"):
+        body = response.data
+    else:
+        if hasattr(response, "render"):
+            response.render()
+        body = response.content.decode(response.charset)
+    return {"status": response.status_code, "body": body}
+
+
+def make_subrequest(request, path):
+    """Copy of the Django ``request`` turned into a body-less GET of ``path``."""
+    url = urlsplit(path)
+    subrequest = copy.copy(request)
+    for name in DERIVED_ATTRIBUTES:
+        subrequest.__dict__.pop(name, None)
+    subrequest.META = {
+        key: value for key, value in request.META.items() if key not in BATCH_ONLY_META
+    }
+    subrequest.META.update(
+        REQUEST_METHOD="GET",
+        PATH_INFO=url.path,
+        QUERY_STRING=url.query,
+        HTTP_ACCEPT="application/json",
+    )
+    subrequest.method = "GET"
+    subrequest.path = subrequest.path_info = url.path
+    subrequest.GET = QueryDict(url.query)
+    subrequest.POST = QueryDict()
+    subrequest._files = MultiValueDict()
+    return subrequest
@@ -0,0 +1,59 @@
+"""Conditional GET (``ETag``/``Last-Modified``) for catalog pages and API resources.
+
+Views compute validators from a few cheap values before loading anything
+else. For a product, those are its ``updated_at`` and the time of its latest
+review; for a list, the newest ``updated_at``, the newest tombstone and the
+product count, read in one aggregate. When the request's ``If-None-Match`` or
+``If-Modified-Since`` still matches, ``not_modified`` returns the 304 and the
+view skips its queries, serializers and templates.
+
+``last_modified`` may be ``None`` when the ETag covers state that has no
+timestamp; the response then carries no ``Last-Modified`` and only
+``If-None-Match`` can revalidate it.
+
+ETags are weak. HTML pages embed a freshly masked CSRF token on every render,
+so equal validators promise equivalent bodies, not identical bytes.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts) -> str:
+    return f'W/"{hashlib.sha256(repr(parts).encode()).hexdigest()[:32]}"'
+
+
+def not_modified(request, validators):
+    """The 304 (or 412) response when ``(etag, last_modified)`` match the request, else ``None``."""
+    if validators is None:
+        return None
+    etag, last_modified = validators
+    if last_modified is not None:
+        last_modified = int(last_modified)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return add_validators(response, validators) if response is not None else None
+
+
+def add_validators(response, validators):
+    """Set ``ETag`` and ``Last-Modified`` on a 200 or 304 response."""
+    if validators is not None and response.status_code in (200, 304):
+        etag, last_modified = validators
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def page_variant(request):
+    """What a server-rendered page shows besides the catalog: the user and the cart.
+
+    ``None`` when messages are waiting, since a 304 would never display them.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    cart = request.session.get(settings.CART_SESSION_ID) or {}
+    return request.user.pk, sorted((pk, item["quantity"]) for pk, item in cart.items())
@@ -0,0 +1,170 @@
+"""Read-replica routing with read-your-writes stickiness.
+
+Reads go to a replica only inside views marked with ``use_read_replica``
+and only for safe methods. Everything else, including management commands
+and background jobs, uses the primary. ``ReplicaRoutingMiddleware`` keeps
+the routing state for the request:
+
+- once the request writes, its remaining reads go to the primary;
+- a response to a request that wrote sets a short-lived cookie, and
+  requests carrying it read from the primary too, so a user sees their
+  own order or review even while replicas lag behind. The middleware sits
+  above ``SessionMiddleware``, so saving the session counts as a write;
+- sessions and users are always read from the primary, since every
+  request loads them and a stale row would sign the user out or show an
+  old cart.
+
+Each request picks one replica at random from those that passed a recent
+health check (connectable and, on PostgreSQL, within the allowed lag).
+"""
+
+import random
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PIN_COOKIE = "primary_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# Apps read from the primary only; so is AUTH_USER_MODEL, wherever it lives
+PRIMARY_APPS = {"sessions", "auth"}
+
+
+class RoutingState:
+    __slots__ = ("use_replica", "replica", "wrote")
+
+    def __init__(self):
+        self.use_replica = False
+        self.replica = None
+        self.wrote = False
+
+
+_state: ContextVar = ContextVar("db_routing", default=None)
+
+
+def use_read_replica(view):
+    """Let safe requests to ``view`` (a function or view class) read from a replica."""
+    if isinstance(view, type):
+        view.use_read_replica = True
+        return view
+
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        return view(*args, **kwargs)
+
+    wrapped.use_read_replica = True
+    return wrapped
+
+
+class ReplicaPool:
+    """Replica aliases from ``DATABASE_REPLICAS`` with cached health checks."""
+
+    def __init__(self):
+        self._health = {}  # alias -> (healthy, checked_at)
+        self._lock = threading.Lock()
+
+    def choose(self):
+        healthy = [alias for alias in settings.DATABASE_REPLICAS if self.is_healthy(alias)]
+        return random.choice(healthy) if healthy else None
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        healthy, checked_at = self._health.get(alias, (False, None))
+        if checked_at is not None and now - checked_at < settings.REPLICA_HEALTH_CHECK_INTERVAL:
+            return healthy
+        healthy = self.check(alias)
+        with self._lock:
+            self._health[alias] = (healthy, now)
+        return healthy
+
+    def check(self, alias):
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+            if connection.vendor != "postgresql":
+                return True
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                    "END"
+                )
+                return cursor.fetchone()[0] <= settings.REPLICA_MAX_LAG_SECONDS
+        except DatabaseError:
+            connection.close()
+            return False
+
+
+replicas = ReplicaPool()
+
+
+class ReplicaRouter:
+    """Send reads of replica-enabled requests to a replica; all writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None
+            or not state.use_replica
+            or state.wrote
+            or model._meta.app_label in PRIMARY_APPS
+            or model._meta.label == settings.AUTH_USER_MODEL
+        ):
+            return None
+        if state.replica is None:
+            state.replica = replicas.choose() or DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The primary and its replicas hold the same rows
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Track per-request routing state and pin recent writers to the primary."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            not settings.DATABASE_REPLICAS
+            or request.method not in SAFE_METHODS
+            or PIN_COOKIE in request.COOKIES
+        ):
+            return None
+        view_class = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+        if getattr(view_func, "use_read_replica", False) or getattr(
+            view_class, "use_read_replica", False
+        ):
+            _state.get().use_replica = True
+        return None
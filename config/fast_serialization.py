@@ -0,0 +1,288 @@
+"""Read-only list serialization straight from ``values_list()`` rows.
+
+To render a page, ``ModelSerializer`` instantiates every row as a model and
+runs each field's ``get_attribute`` and ``to_representation`` on it.
+``compile_plan`` turns a serializer, already pruned by ``?fields=`` and
+``?expand=``, into a ``ValuesPlan`` instead. For every output key the plan
+holds the ``values_list()`` lookups the key needs and a converter. Plain
+values (strings, integers, booleans) are copied as they are. A page is
+fetched as tuples and turned into dicts in one loop. A nested list costs one
+extra query per page, like the prefetch it replaces.
+
+Fields compile from the serializer: model fields and dotted ``source``
+paths through forward relations, primary-key relations, file fields,
+nested serializers of a forward relation and nested lists of a reverse
+foreign key. A field whose source is a model property or method must be
+declared as a ``Column`` in the serializer's ``values_fields``. When a
+field cannot be compiled, ``compile_plan`` returns ``None`` and the view
+keeps using the serializer, so the fast path never changes a response.
+
+``ValuesListMixin`` serves a viewset's ``list`` from the plan while
+``VALUES_LIST_SERIALIZATION`` is on.
+"""
+
+from datetime import datetime
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Fields whose ``to_representation`` returns a database value unchanged
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+
+
+class Column:
+    """Output value computed by ``convert(*values)`` from row ``lookups``.
+
+    Without ``convert`` the column takes a single lookup, copied as is.
+    """
+
+    def __init__(self, *lookups, convert=None):
+        self.lookups = lookups
+        self.convert = convert
+
+    def getter(self, start):
+        """Function of a row returning this column's value; its lookups begin at ``start``."""
+        convert = self.convert
+        if len(self.lookups) == 1:
+            if convert is None:
+                return itemgetter(start)
+            return lambda row: convert(row[start])
+        end = start + len(self.lookups)
+        return lambda row: convert(*row[start:end])
+
+
+class RelatedList:
+    """Nested list of related rows, fetched by ``fetch(ids)`` once per page."""
+
+    def __init__(self, fetch):
+        self.fetch = fetch
+
+    def getter(self, ids):
+        grouped = self.fetch(ids) if ids else {}
+        return lambda row: grouped.get(row[0]) or []
+
+
+class ValuesPlan:
+    """Output keys mapped to ``values_list()`` lookups, keyed by the ``key`` lookup.
+
+    The key (the primary key by default) is always the first lookup, so nested
+    lists can be matched to their rows.
+    """
+
+    def __init__(self, fields, key="pk"):
+        self.lookups = [key]
+        self._columns = []
+        self._related = []
+        for name, field in fields.items():
+            if isinstance(field, RelatedList):
+                self._columns.append((name, None))
+                self._related.append((name, field))
+            else:
+                self._columns.append((name, field.getter(len(self.lookups))))
+                self.lookups.extend(field.lookups)
+
+    def values(self, queryset):
+        """``queryset`` as the tuples this plan builds from."""
+        return queryset.prefetch_related(None).values_list(*self.lookups)
+
+    def row(self, row, getters=None):
+        return {name: getter(row) for name, getter in getters or self._columns}
+
+    def build(self, rows):
+        """Output dicts for a page of ``values()`` tuples."""
+        rows = list(rows)
+        getters = self._columns
+        if self._related:
+            ids = [row[0] for row in rows]
+            related = {name: field.getter(ids) for name, field in self._related}
+            getters = [(name, getter or related[name]) for name, getter in getters]
+        return [self.row(row, getters) for row in rows]
+
+
+def compile_plan(serializer):
+    """``ValuesPlan`` rendering like ``serializer``, or ``None``."""
+    fields = _compile_fields(serializer, serializer.Meta.model, nested=False)
+    return ValuesPlan(fields) if fields is not None else None
+
+
+def _compile_fields(serializer, model, nested):
+    declared = getattr(serializer, "values_fields", {})
+    compiled = {}
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        value = declared[name] if name in declared else _compile_field(field, model)
+        # A nested list inside a nested object would need a query per row
+        if value is None or (nested and isinstance(value, RelatedList)):
+            return None
+        compiled[name] = value
+    return compiled
+
+
+def _compile_field(field, model):
+    if field.source == "*":
+        return None
+    if isinstance(field, serializers.ListSerializer):
+        return _compile_related_list(field, model)
+    if isinstance(field, serializers.BaseSerializer):
+        return _compile_nested(field, model)
+
+    path = _lookup(model, field.source)
+    if path is None:
+        return None
+    lookup, model_field = path
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        if field.pk_field is not None or not _points_to_pk(model_field):
+            return None
+        return Column(lookup)
+    if isinstance(field, serializers.RelatedField) or model_field.is_relation:
+        return None
+    if isinstance(field, serializers.FileField):
+        if not isinstance(model_field, models.FileField):
+            return None
+        to_representation, attr_class = field.to_representation, model_field.attr_class
+        return Column(
+            lookup, convert=lambda name: to_representation(attr_class(None, model_field, name))
+        )
+    if isinstance(field, PLAIN_FIELDS):
+        return Column(lookup)
+    if isinstance(field, serializers.DateTimeField):
+        convert = _datetime_converter(field)
+        if convert is not None:
+            return Column(lookup, convert=convert)
+    to_representation = field.to_representation
+    return Column(
+        lookup, convert=lambda value: None if value is None else to_representation(value)
+    )
+
+
+def _datetime_converter(field):
+    """``DateTimeField.to_representation`` of aware values as ISO 8601.
+
+    The time zone is looked up once per plan rather than once per value.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if not settings.USE_TZ or output_format is None or output_format.lower() != ISO_8601:
+        return None
+    tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    to_representation = field.to_representation
+
+    def convert(value):
+        if not isinstance(value, datetime) or timezone.is_naive(value):
+            return to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    return convert
+
+
+def _lookup(model, source):
+    """``(lookup, model field)`` of a dotted source, or ``None``.
+
+    Every relation on the way must be a non-null forward relation: where a
+    serializer would skip the field for a missing object, a lookup would
+    give ``None``.
+    """
+    parts = source.split(".")
+    for part in parts[:-1]:
+        try:
+            relation = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if not _is_forward_relation(relation) or relation.null:
+            return None
+        model = relation.related_model
+    try:
+        field = model._meta.get_field(parts[-1])
+    except FieldDoesNotExist:
+        return None
+    if not field.concrete or field.many_to_many:
+        return None
+    return "__".join(parts), field
+
+
+def _is_forward_relation(field):
+    return field.concrete and (field.many_to_one or field.one_to_one)
+
+
+def _points_to_pk(field):
+    return field.is_relation and field.target_field.primary_key
+
+
+def _compile_nested(serializer, model):
+    try:
+        relation = model._meta.get_field(serializer.source)
+    except FieldDoesNotExist:
+        return None
+    if not _is_forward_relation(relation):
+        return None
+    fields = _compile_fields(serializer, relation.related_model, nested=True)
+    if fields is None:
+        return None
+    plan = ValuesPlan(fields)
+    # The related pk comes first and is None when the relation is empty
+    return Column(
+        *(f"{relation.name}__{lookup}" for lookup in plan.lookups),
+        convert=lambda *values: None if values[0] is None else plan.row(values),
+    )
+
+
+def _compile_related_list(list_serializer, model):
+    try:
+        relation = model._meta.get_field(list_serializer.source)
+    except FieldDoesNotExist:
+        return None
+    if not relation.one_to_many or not _points_to_pk(relation.field):
+        return None
+    fields = _compile_fields(list_serializer.child, relation.related_model, nested=True)
+    if fields is None:
+        return None
+    plan = ValuesPlan(fields, key=relation.field.attname)
+    manager = relation.related_model._default_manager
+
+    def fetch(ids):
+        # Same rows, in the same default ordering, as the related manager's prefetch
+        rows = manager.filter(**{f"{relation.field.name}__in": ids}).values_list(*plan.lookups)
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row[0], []).append(plan.row(row))
+        return grouped
+
+    return RelatedList(fetch)
+
+
+class ValuesListMixin:
+    """Serve ``list`` from a ``ValuesPlan`` of the view's serializer when it compiles."""
+
+    def get_values_serializer(self):
+        """The serializer whose fields the plan renders."""
+        return self.get_serializer()
+
+    def get_values_plan(self):
+        if not settings.VALUES_LIST_SERIALIZATION:
+            return None
+        return compile_plan(self.get_values_serializer())
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_values_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        return self.values_list_response(plan)
+
+    def values_list_response(self, plan):
+        queryset = plan.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(plan.build(queryset))
+        return self.get_paginated_response(plan.build(page))
@@ -0,0 +1,111 @@
+"""Per-request SQL instrumentation.
+
+``QueryInstrumentationMiddleware`` wraps every database connection with
+``connection.execute_wrapper`` for a sample of requests and records the
+query count, total database time and how often each statement shape was
+executed. Results are returned as a ``Server-Timing`` header and written to
+the ``config.sql`` logger as one JSON object per request. A statement shape
+that repeats more than ``SQL_N_PLUS_ONE_THRESHOLD`` times is reported as a
+likely N+1 at WARNING level.
+
+Unsampled requests pay for a single ``random()`` call. Sampled requests
+only count raw SQL strings; fingerprinting happens once per distinct
+statement when the request ends.
+"""
+
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("config.sql")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+
+
+def fingerprint(sql: str) -> str:
+    """Reduce a statement to its shape: literals and IN-list lengths removed."""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    return _PLACEHOLDER_LIST.sub("(%s...)", sql)
+
+
+class QueryRecorder:
+    """``execute_wrapper`` callable accumulating query statistics."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def repeated_shapes(self, threshold):
+        """Statement shapes executed more than ``threshold`` times, most frequent first."""
+        shapes = Counter()
+        for sql, count in self.statements.items():
+            shapes[fingerprint(sql)] += count
+        return [(shape, count) for shape, count in shapes.most_common() if count > threshold]
+
+
+class QueryInstrumentationMiddleware:
+    """Record SQL count/time per sampled request and flag likely N+1 patterns."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.SQL_INSTRUMENTATION_SAMPLE_RATE
+        self.threshold = settings.SQL_N_PLUS_ONE_THRESHOLD
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        timing = (
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+            f"total;dur={total * 1000:.1f}"
+        )
+        if response.has_header("Server-Timing"):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response["Server-Timing"] = timing
+
+        suspects = recorder.repeated_shapes(self.threshold)
+        match = getattr(request, "resolver_match", None)
+        payload = {
+            "method": request.method,
+            "path": request.path,
+            "route": match.view_name if match else None,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "db_ms": round(recorder.duration * 1000, 2),
+            "total_ms": round(total * 1000, 2),
+            "n_plus_one": [{"sql": shape, "count": count} for shape, count in suspects],
+        }
+        logger.log(
+            logging.WARNING if suspects else logging.DEBUG,
+            json.dumps(payload),
+            extra={"sql_stats": payload},
+        )
+        return response
@@ -0,0 +1,18 @@
+"""Helpers shared by the load and benchmark tools.
+
+Used by the ``benchmark_read_path`` and ``replay_access_log`` commands and
+the endpoint benchmarks in ``benchmarks/``.
+"""
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank ``fraction`` percentile of ``sorted_values``; 0.0 if empty."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def client_address(index) -> str:
+    """A distinct private IPv4 address per request ``index``, to keep rate limits out of a run."""
+    return f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"
@@ -0,0 +1,211 @@
+"""Opt-in per-request memory tracking with ``tracemalloc``.
+
+With ``MEMORY_TRACKING_ENABLED`` on, ``MemoryTrackingMiddleware`` starts
+``tracemalloc`` in every worker. Tracing can also be started in a single
+worker from the admin page. While tracing is on, the middleware records two
+numbers for every request, per route:
+
+- the peak of traced memory above the level at which the request started;
+- the retained bytes, meaning traced memory still held when the response
+  was returned. A view whose retained total keeps growing is a leak
+  candidate.
+
+tracemalloc counts memory for the whole process. The per-request numbers are
+therefore exact only while a worker serves one request at a time (prefork
+sync workers). Under threaded workers, concurrent requests blur into each
+other's numbers.
+
+``/admin/memory/`` shows the route table and the top allocation sites of
+the worker serving it. It can also save snapshots of that worker to
+``MEMORY_SNAPSHOT_DIR`` and diff any two of them. Take both snapshots of a
+diff from the same worker (same pid), for example before and after
+replaying traffic against one view.
+"""
+
+import os
+import re
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.http import Http404
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+
+from config.metrics import SIZE_BUCKETS, Histogram
+
+SNAPSHOT_ID = re.compile(r"^\d+-\d+$")
+# Allocations made by the tracker itself are not interesting
+IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<unknown>")
+
+REQUEST_PEAK_MEMORY = Histogram(
+    "http_request_peak_memory_bytes", "Traced memory peak above the request's start level.",
+    ["route"], buckets=SIZE_BUCKETS + (16777216, 67108864),
+)
+
+
+class RouteMemoryStats:
+    """Per-route request count, peak and retained bytes of this process."""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, peak, retained):
+        with self._lock:
+            stats = self._routes.setdefault(
+                route, {"requests": 0, "peak_max": 0, "peak_total": 0, "retained_total": 0}
+            )
+            stats["requests"] += 1
+            stats["peak_max"] = max(stats["peak_max"], peak)
+            stats["peak_total"] += peak
+            stats["retained_total"] += retained
+
+    def rows(self):
+        with self._lock:
+            rows = [{"route": route, **stats} for route, stats in self._routes.items()]
+        for row in rows:
+            row["peak_avg"] = row["peak_total"] / row["requests"]
+        return sorted(rows, key=lambda row: row["peak_max"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_stats = RouteMemoryStats()
+
+
+def start_tracing():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(settings.MEMORY_TRACEMALLOC_FRAMES)
+
+
+def take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, filename) for filename in IGNORED_FILES]
+    )
+
+
+def allocation_sites(statistics, limit):
+    """Template rows for ``Statistic``/``StatisticDiff`` objects."""
+    rows = []
+    for stat in statistics[:limit]:
+        frame = stat.traceback[0]
+        rows.append({
+            "location": f"{frame.filename}:{frame.lineno}",
+            "traceback": stat.traceback.format(),
+            "size": stat.size,
+            "count": stat.count,
+            "size_diff": getattr(stat, "size_diff", None),
+            "count_diff": getattr(stat, "count_diff", None),
+        })
+    return rows
+
+
+class SnapshotStore:
+    """Dumped ``tracemalloc`` snapshots in a directory, newest ``limit`` kept."""
+
+    def __init__(self, directory, limit):
+        self.directory = Path(directory)
+        self.limit = limit
+
+    def save(self, snapshot):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        snapshot_id = f"{time.time_ns()}-{os.getpid()}"
+        snapshot.dump(str(self.directory / f"{snapshot_id}.snapshot"))
+        for stale in self.ids()[self.limit:]:
+            (self.directory / f"{stale}.snapshot").unlink(missing_ok=True)
+        return snapshot_id
+
+    def ids(self):
+        """Snapshot ids, newest first."""
+        if not self.directory.is_dir():
+            return []
+        ids = [
+            path.stem for path in self.directory.glob("*.snapshot") if SNAPSHOT_ID.match(path.stem)
+        ]
+        return sorted(ids, key=lambda snapshot_id: int(snapshot_id.split("-")[0]), reverse=True)
+
+    def load(self, snapshot_id):
+        path = self.directory / f"{snapshot_id}.snapshot"
+        if not SNAPSHOT_ID.match(snapshot_id) or not path.is_file():
+            raise Http404("Unknown snapshot.")
+        return tracemalloc.Snapshot.load(str(path))
+
+
+def get_snapshot_store():
+    return SnapshotStore(settings.MEMORY_SNAPSHOT_DIR, settings.MEMORY_MAX_SNAPSHOTS)
+
+
+class MemoryTrackingMiddleware:
+    """Record the traced memory peak and retained bytes of every request per route."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.MEMORY_TRACKING_ENABLED:
+            start_tracing()
+
+    def __call__(self, request):
+        if not tracemalloc.is_tracing():
+            return self.get_response(request)
+
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        response = self.get_response(request)
+        after, peak = tracemalloc.get_traced_memory()
+
+        match = getattr(request, "resolver_match", None)
+        route = (match.view_name or match.route) if match else "unmatched"
+        route_stats.record(route, max(peak - before, 0), after - before)
+        REQUEST_PEAK_MEMORY.observe(max(peak - before, 0), route=route)
+        return response
+
+
+def memory_view(request):
+    """Admin page with per-route memory, top allocation sites and snapshot diffs."""
+    store = get_snapshot_store()
+    limit = settings.MEMORY_TOP_ALLOCATIONS
+
+    if request.method == "POST":
+        action = request.POST.get("action")
+        if action == "start":
+            start_tracing()
+            messages.success(request, f"Started tracemalloc in worker {os.getpid()}.")
+        elif action == "snapshot" and tracemalloc.is_tracing():
+            snapshot_id = store.save(take_snapshot())
+            messages.success(request, f"Saved snapshot {snapshot_id}.")
+        elif action == "reset":
+            route_stats.clear()
+            messages.success(request, f"Cleared route statistics of worker {os.getpid()}.")
+        return redirect("admin_memory")
+
+    tracing = tracemalloc.is_tracing()
+    context = {
+        **admin.site.each_context(request),
+        "title": "Memory",
+        "pid": os.getpid(),
+        "tracing": tracing,
+        "routes": route_stats.rows(),
+        "snapshots": store.ids(),
+        "sites": [],
+        "diff": None,
+    }
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        context.update(current=current, peak=peak)
+        context["sites"] = allocation_sites(take_snapshot().statistics("lineno"), limit)
+
+    old, new = request.GET.get("old"), request.GET.get("new")
+    if old and new:
+        statistics = store.load(new).compare_to(store.load(old), "lineno")
+        context["diff"] = {
+            "old": old,
+            "new": new,
+            "same_process": old.split("-")[1] == new.split("-")[1],
+            "sites": allocation_sites(statistics, limit),
+        }
+    return TemplateResponse(request, "admin/memory.html", context)
@@ -0,0 +1,363 @@
+"""Prometheus metrics collected in process and served at ``/metrics``.
+
+Metrics are counters and histograms whose samples live in a store shared by
+the whole process. With ``METRICS_MULTIPROC_DIR`` set, every process writes
+its samples to its own memory-mapped file in that directory (a forked
+worker opens a new file on its first update), and ``/metrics`` sums the
+files of all processes. That way each worker of a preforking server reports
+the totals of all workers, not only its own. Empty the directory whenever
+the server starts, because files of exited workers keep counting. Without a
+directory, samples stay in process memory, which is enough for
+``runserver`` and tests.
+
+Label values are limited to bounded sets: URL route names (never raw
+paths), HTTP methods, status classes and fixed operation names.
+"""
+
+import glob
+import hmac
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METHODS = frozenset({"GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE"})
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_HEADER = struct.Struct("<I4x")  # bytes in use
+_KEY_LENGTH = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+_INITIAL_SIZE = 1 << 16
+
+
+class MemoryStore:
+    """Samples of this process only, kept in a dict."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class MmapFile:
+    """Append-only ``key -> double`` records in a memory-mapped file.
+
+    Each record is a length-prefixed JSON key padded to 8 bytes, followed by
+    the value. The header holds the number of bytes in use, and it is only
+    advanced once a record is fully written, so readers never see half a
+    record.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+        size = max(os.fstat(self._file.fileno()).st_size, _INITIAL_SIZE)
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used = _HEADER.unpack_from(self._map, 0)[0] or _HEADER.size
+        self._positions = {key: position for key, position, _ in self._records(self._map, self._used)}
+
+    @staticmethod
+    def _records(buffer, used):
+        offset = _HEADER.size
+        while offset < used:
+            length = _KEY_LENGTH.unpack_from(buffer, offset)[0]
+            start = offset + _KEY_LENGTH.size
+            key = decode_key(bytes(buffer[start:start + length]))
+            position = start + length + (-(start + length) % 8)
+            yield key, position, _VALUE.unpack_from(buffer, position)[0]
+            offset = position + _VALUE.size
+
+    @classmethod
+    def read(cls, path):
+        """``{key: value}`` of a file, which may belong to another process."""
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < _HEADER.size:
+            return {}
+        return {key: value for key, _, value in cls._records(data, _HEADER.unpack_from(data, 0)[0])}
+
+    def inc(self, key, amount):
+        position = self._positions.get(key)
+        if position is None:
+            position = self._append(key)
+        _VALUE.pack_into(self._map, position, _VALUE.unpack_from(self._map, position)[0] + amount)
+
+    def _append(self, key):
+        encoded = encode_key(key)
+        start = self._used + _KEY_LENGTH.size
+        position = start + len(encoded) + (-(start + len(encoded)) % 8)
+        end = position + _VALUE.size
+        if end > len(self._map):
+            self._grow(end)
+        _KEY_LENGTH.pack_into(self._map, self._used, len(encoded))
+        self._map[start:start + len(encoded)] = encoded
+        _VALUE.pack_into(self._map, position, 0.0)
+        self._used = end
+        _HEADER.pack_into(self._map, 0, end)
+        self._positions[key] = position
+        return position
+
+    def _grow(self, needed):
+        size = len(self._map)
+        while size < needed:
+            size *= 2
+        self._map.close()
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+
+class MultiProcessStore:
+    """One ``MmapFile`` per process in ``directory``; collection sums all files."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._pid = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def inc(self, key, amount):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._file = MmapFile(os.path.join(self.directory, f"metrics_{self._pid}.db"))
+            self._file.inc(key, amount)
+
+    def collect(self):
+        totals = {}
+        for path in glob.glob(os.path.join(self.directory, "metrics_*.db")):
+            for key, value in MmapFile.read(path).items():
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+
+def encode_key(key):
+    sample, labels = key
+    return json.dumps([sample, labels], separators=(",", ":")).encode()
+
+
+def decode_key(data):
+    sample, labels = json.loads(data)
+    return sample, tuple(tuple(pair) for pair in labels)
+
+
+class Registry:
+    """The process's metrics and the store holding their samples."""
+
+    def __init__(self):
+        self.metrics = {}
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            directory = settings.METRICS_MULTIPROC_DIR
+            self._store = MultiProcessStore(directory) if directory else MemoryStore()
+        return self._store
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def get_sample_value(self, sample, **labels):
+        """Current value of one sample, or ``None``; used by tests and tools."""
+        key = (sample, tuple(sorted(labels.items())))
+        return self.store.collect().get(key)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        samples = {}
+        for (sample, labels), value in self.store.collect().items():
+            samples.setdefault(sample, []).append((labels, value))
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.expose(samples))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name, documentation, labelnames=(), registry=registry):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(sorted(labelnames))
+        self.registry = registry
+        registry.register(self)
+
+    def _labels(self, labels):
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {sorted(labels)}.")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        self.registry.store.inc((self.name, self._labels(labels)), amount)
+
+    def expose(self, samples):
+        for labels, value in sorted(samples.get(self.name, ())):
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, **kwargs):
+        super().__init__(name, documentation, labelnames, **kwargs)
+        self.buckets = tuple(float(bound) for bound in buckets) + (float("inf"),)
+        self.bucket_labels = [_format_value(bound) for bound in buckets] + ["+Inf"]
+
+    def observe(self, value, **labels):
+        labels = self._labels(labels)
+        store = self.registry.store
+        for bound, le in zip(self.buckets, self.bucket_labels):
+            if value <= bound:
+                # Buckets are stored as plain counts and made cumulative on export
+                store.inc((f"{self.name}_bucket", tuple(sorted(labels + (("le", le),)))), 1)
+                break
+        store.inc((f"{self.name}_sum", labels), value)
+        store.inc((f"{self.name}_count", labels), 1)
+
+    def expose(self, samples):
+        buckets = {}
+        for labels, value in samples.get(f"{self.name}_bucket", ()):
+            le = dict(labels)["le"]
+            series = tuple(pair for pair in labels if pair[0] != "le")
+            buckets.setdefault(series, {})[le] = value
+        sums = dict(samples.get(f"{self.name}_sum", ()))
+        for labels, count in sorted(samples.get(f"{self.name}_count", ())):
+            cumulative = 0.0
+            for le in self.bucket_labels:
+                cumulative += buckets.get(labels, {}).get(le, 0.0)
+                series = _format_labels(tuple(sorted(labels + (("le", le),))))
+                yield f"{self.name}_bucket{series} {_format_value(cumulative)}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(sums.get(labels, 0.0))}"
+            yield f"{self.name}_count{_format_labels(labels)} {_format_value(count)}"
+
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route, method and status class.",
+    ["route", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request.", ["route", "method"]
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Size of non-streaming response bodies.", ["route"],
+    buckets=SIZE_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "db_queries_per_request", "SQL queries executed per request.", ["route"],
+    buckets=QUERY_BUCKETS,
+)
+DB_TIME = Histogram(
+    "db_query_duration_seconds_per_request", "Time spent in SQL queries per request.", ["route"]
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Object cache lookups by cache and result (hit or miss).",
+    ["cache", "result"],
+)
+CART_OPERATIONS = Counter(
+    "cart_operations_total", "Cart changes by operation and result.", ["operation", "result"]
+)
+CHECKOUTS = Counter("checkouts_total", "Checkout attempts by result.", ["result"])
+EMAIL_SEND_LATENCY = Histogram(
+    "email_send_duration_seconds", "Time spent sending transactional email.", ["email", "result"]
+)
+
+
+class QueryTimer:
+    """``execute_wrapper`` callable counting queries and their total time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Record latency, response size and SQL usage of every request per route."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        route = (match.view_name or match.route) if match else "unmatched"
+        method = request.method if request.method in METHODS else "other"
+        REQUESTS.inc(route=route, method=method, status=f"{response.status_code // 100}xx")
+        REQUEST_LATENCY.observe(duration, route=route, method=method)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), route=route)
+        DB_QUERIES.observe(timer.count, route=route)
+        DB_TIME.observe(timer.duration, route=route)
+        return response
+
+
+def metrics_view(request):
+    """Serve all metrics to ``Authorization: Bearer <METRICS_TOKEN>``.
+
+    Without a token the endpoint is only open when ``DEBUG`` is on.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,23 @@
+"""Request body parsers beyond DRF's JSON, form and multipart ones."""
+
+import csv
+import io
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVParser(BaseParser):
+    """``text/csv`` bodies as a list of dicts keyed by the header row."""
+
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            # A leading byte order mark (as spreadsheet exports add) isn't part of the header
+            text = stream.read().decode(encoding).removeprefix("\ufeff")
+            return list(csv.DictReader(io.StringIO(text, newline="")))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ParseError(f"CSV parse error - {exc}")
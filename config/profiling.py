@@ -0,0 +1,210 @@
+"""On-demand cProfile capture of individual requests.
+
+A request is profiled when any of these holds:
+
+- it carries ``X-Profile-Token`` with a token signed by ``profile_token``
+  (shown on the admin profiles page, valid for ``PROFILING_TOKEN_MAX_AGE``
+  seconds), which also works for API clients authenticated by JWT. The
+  token names the staff user it was issued to and stops working once that
+  user is no longer active staff or changes their password;
+- a logged-in staff user adds ``?_profile=1`` to the URL;
+- it is the Nth request of the process, with ``PROFILING_SAMPLE_EVERY = N``.
+
+Each profile is written to ``PROFILING_DIR`` as a ``.prof`` file, readable by
+``pstats`` and snakeviz, with a JSON sidecar holding the route and timing.
+Only the newest ``PROFILING_MAX_PROFILES`` are kept. Python allows one
+active profiler at a time, so a request that would overlap a running
+profile in another thread is served unprofiled.
+"""
+
+import cProfile
+import itertools
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.utils.crypto import constant_time_compare
+
+HEADER = "X-Profile-Token"
+QUERY_FLAG = "_profile"
+TOKEN_SALT = "config.profiling"
+PROFILE_ID = re.compile(r"^\d+-\d+$")
+SORT_KEYS = {"cumulative": 3, "tottime": 2, "calls": 1}
+
+
+def profile_token(user) -> str:
+    """A profiling token issued to staff ``user``."""
+    return signing.dumps(
+        {"user": user.pk, "auth": user.get_session_auth_hash()}, salt=TOKEN_SALT
+    )
+
+
+def token_user(token):
+    """The staff user ``token`` was issued to, or ``None`` if it is invalid or revoked."""
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+        user = get_user_model().objects.get(pk=payload["user"], is_active=True, is_staff=True)
+    except (signing.BadSignature, KeyError, TypeError, ObjectDoesNotExist):
+        return None
+    if not constant_time_compare(payload.get("auth", ""), user.get_session_auth_hash()):
+        return None
+    return user
+
+
+class ProfileStore:
+    """``.prof`` files plus JSON metadata in a directory, newest ``limit`` kept."""
+
+    def __init__(self, directory, limit):
+        self.directory = Path(directory)
+        self.limit = limit
+
+    def save(self, profiler, meta):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_id = f"{time.time_ns()}-{os.getpid()}"
+        profiler.dump_stats(self.directory / f"{profile_id}.prof")
+        (self.directory / f"{profile_id}.json").write_text(json.dumps(meta))
+        for stale in self.ids()[self.limit:]:
+            self.delete(stale)
+        return profile_id
+
+    def ids(self):
+        """Profile ids, newest first."""
+        if not self.directory.is_dir():
+            return []
+        ids = [path.stem for path in self.directory.glob("*.prof") if PROFILE_ID.match(path.stem)]
+        return sorted(ids, key=lambda profile_id: int(profile_id.split("-")[0]), reverse=True)
+
+    def path(self, profile_id):
+        if not PROFILE_ID.match(profile_id):
+            raise Http404("Unknown profile.")
+        path = self.directory / f"{profile_id}.prof"
+        if not path.is_file():
+            raise Http404("Unknown profile.")
+        return path
+
+    def meta(self, profile_id):
+        try:
+            return json.loads((self.directory / f"{profile_id}.json").read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def delete(self, profile_id):
+        for suffix in (".prof", ".json"):
+            (self.directory / f"{profile_id}{suffix}").unlink(missing_ok=True)
+
+    def top_functions(self, profile_id, sort="cumulative", limit=40):
+        """The ``limit`` most expensive functions of a profile by ``sort``."""
+        stats = pstats.Stats(str(self.path(profile_id))).stats
+        column = SORT_KEYS[sort]
+        rows = sorted(stats.items(), key=lambda item: item[1][column], reverse=True)[:limit]
+        return [
+            {
+                "function": func,
+                "location": f"{filename}:{line}" if line else filename,
+                "primitive_calls": primitive,
+                "calls": calls,
+                "tottime_ms": tottime * 1000,
+                "cumtime_ms": cumtime * 1000,
+            }
+            for (filename, line, func), (primitive, calls, tottime, cumtime, _) in rows
+        ]
+
+
+def get_store():
+    return ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_PROFILES)
+
+
+class ProfilingMiddleware:
+    """Profile requests that ask for it (or every Nth request) with cProfile."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.every = settings.PROFILING_SAMPLE_EVERY
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None or not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - started
+        finally:
+            self.lock.release()
+
+        match = getattr(request, "resolver_match", None)
+        profile_id = get_store().save(profiler, {
+            "method": request.method,
+            "path": request.path,
+            "route": match.view_name if match else None,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 2),
+            "trigger": trigger,
+            "created": time.time(),
+        })
+        response["X-Profile-Id"] = profile_id
+        return response
+
+    def trigger(self, request):
+        if self.every and next(self.counter) % self.every == 0:
+            return "sample"
+        token = request.headers.get(HEADER)
+        if token and token_user(token) is not None:
+            return "token"
+        if request.GET.get(QUERY_FLAG) and request.user.is_staff:
+            return "staff"
+        return None
+
+
+def profile_list_view(request):
+    """Admin page listing stored profiles, newest first."""
+    store = get_store()
+    profiles = [{"id": profile_id, **store.meta(profile_id)} for profile_id in store.ids()]
+    context = {
+        **admin.site.each_context(request),
+        "title": "Request Profiles",
+        "profiles": profiles,
+        "header": HEADER,
+        "token": profile_token(request.user),
+        "token_max_age": settings.PROFILING_TOKEN_MAX_AGE,
+        "query_flag": QUERY_FLAG,
+    }
+    return TemplateResponse(request, "admin/profiling/profile_list.html", context)
+
+
+def profile_detail_view(request, profile_id):
+    """Admin page with a profile's top functions, or the ``.prof`` file itself."""
+    store = get_store()
+    if request.GET.get("download"):
+        return FileResponse(open(store.path(profile_id), "rb"), as_attachment=True)
+    sort = request.GET.get("sort", "cumulative")
+    if sort not in SORT_KEYS:
+        sort = "cumulative"
+    context = {
+        **admin.site.each_context(request),
+        "title": f"Profile {profile_id}",
+        "profile": {"id": profile_id, **store.meta(profile_id)},
+        "functions": store.top_functions(profile_id, sort),
+        "sort": sort,
+        "sort_keys": list(SORT_KEYS),
+    }
+    return TemplateResponse(request, "admin/profiling/profile_detail.html", context)
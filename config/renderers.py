@@ -0,0 +1,39 @@
+"""JSON renderer backed by orjson, a project dependency.
+
+``FastJSONRenderer`` produces the same bytes as DRF's compact
+``JSONRenderer`` for the data our views return: datetimes, decimals,
+lazy strings and other non-JSON types still go through DRF's encoder, and
+U+2028/U+2029 are escaped the same way. Indented output, ``UNICODE_JSON``
+or ``COMPACT_JSON`` turned off, and anything orjson rejects (such as
+integers wider than 64 bits) fall back to ``JSONRenderer``. So does
+everything if orjson can't be imported, e.g. on a platform without a wheel.
+"""
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # no wheel for this platform
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer, for embedding in <script> tags
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
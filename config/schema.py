@@ -0,0 +1,128 @@
+"""OpenAPI schema built once per code version and served with an ETag.
+
+Generating the schema walks every viewset and serializer, so the result is
+stored as a file under ``OPENAPI_SCHEMA_DIR/<code version>/``, one per
+format, language and API version. The ``build_openapi_schema`` command
+writes the default variants at deploy time; any other variant, or a
+missing file, is generated on first request. Only API versions in DRF's
+``ALLOWED_VERSIONS`` and languages in ``LANGUAGES`` are accepted; other
+values fall back to the default. Paths are therefore never built from
+arbitrary request input, and the set of files stays bounded. Files are
+also kept in process memory once read, at most ``MAX_CACHED_SCHEMAS``. A new code version (``APP_VERSION``, or else a
+hash of the project sources and the API libraries) starts with an empty
+directory, so a stale schema is never served.
+
+Responses carry a strong ETag and ``Cache-Control: no-cache``. Clients
+therefore revalidate on every load and usually get a 304.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import drf_spectacular
+import rest_framework
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.settings import api_settings
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularAPIView
+
+SOURCE_DIRS = ("config", "orders", "products", "reviews", "users")
+RENDERERS = {"yaml": OpenApiYamlRenderer, "json": OpenApiJsonRenderer}
+MAX_CACHED_SCHEMAS = 32
+# What a language or API version may look like in a file name
+SAFE_NAME = re.compile(r"^\w[\w.-]*$")
+
+_schemas = {}  # (code version, format, lang, api version) -> (body, etag)
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def code_version() -> str:
+    """``APP_VERSION``, or a digest of everything the schema is derived from."""
+    if settings.APP_VERSION:
+        return settings.APP_VERSION
+    digest = hashlib.sha256(f"{drf_spectacular.__version__}:{rest_framework.VERSION}".encode())
+    base = Path(settings.BASE_DIR)
+    for directory in SOURCE_DIRS:
+        for path in sorted((base / directory).rglob("*.py")):
+            digest.update(str(path.relative_to(base)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def schema_path(fmt, lang=None, api_version=None) -> Path:
+    for value in (lang, api_version):
+        if value is not None and not SAFE_NAME.match(value):
+            raise ValueError(f"Unsafe schema variant {value!r}.")
+    name = f"schema-{lang or 'default'}-{api_version or 'default'}.{fmt}"
+    return Path(settings.OPENAPI_SCHEMA_DIR) / code_version() / name
+
+
+def generate_schema(fmt, lang=None, api_version=None, request=None) -> bytes:
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(api_version=api_version)
+    with translation.override(lang or settings.LANGUAGE_CODE):
+        schema = generator.get_schema(request=request, public=True)
+    return RENDERERS[fmt]().render(schema)
+
+
+def write_schema(fmt, lang=None, api_version=None, request=None) -> Path:
+    """Generate a schema variant and store it atomically; returns its path."""
+    path = schema_path(fmt, lang, api_version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    body = generate_schema(fmt, lang, api_version, request)
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as f:
+        f.write(body)
+    os.replace(f.name, path)
+    return path
+
+
+def get_schema(fmt, lang=None, api_version=None, request=None):
+    """``(body, etag)`` of a schema variant: from memory, disk, or freshly built."""
+    key = (code_version(), fmt, lang, api_version)
+    cached = _schemas.get(key)
+    if cached is not None:
+        return cached
+    with _lock:
+        if key not in _schemas:
+            path = schema_path(fmt, lang, api_version)
+            if not path.is_file():
+                write_schema(fmt, lang, api_version, request)
+            body = path.read_bytes()
+            while len(_schemas) >= MAX_CACHED_SCHEMAS:
+                del _schemas[next(iter(_schemas))]
+            _schemas[key] = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+    return _schemas[key]
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """``SpectacularAPIView`` serving the stored schema with conditional GET."""
+
+    def get(self, request, *args, **kwargs):
+        version = self.api_version or request.version
+        requested = request.GET.get("version")
+        if version is None and requested in (api_settings.ALLOWED_VERSIONS or ()):
+            version = requested
+        lang = request.GET.get("lang") if settings.USE_I18N else None
+        if lang and lang not in dict(settings.LANGUAGES):
+            lang = None
+        renderer = request.accepted_renderer
+        body, etag = get_schema(renderer.format, lang, version, request)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type=f"{renderer.media_type}; charset=utf-8")
+            response["Content-Disposition"] = (
+                f'inline; filename="{self._get_filename(request, version)}"'
+            )
+        response["ETag"] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
@@ -54,11 +54,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "config.metrics.MetricsMiddleware",
+    "config.memory.MemoryTrackingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "config.throttling.RateLimitHeadersMiddleware",
+    "config.instrumentation.QueryInstrumentationMiddleware",
+    # Above SessionMiddleware, so session saves pin the client to the primary
+    "config.db_router.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "config.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -66,11 +73,15 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_RENDERER_CLASSES': (
+        'config.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': (
@@ -79,16 +90,28 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ),
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'config.throttling.SlidingWindowAnonThrottle',
+        'config.throttling.SlidingWindowUserThrottle',
+        'config.throttling.SlidingWindowScopedThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
-        'user': '1000/day'
+        'user': '1000/day',
+        'cart': '120/min',
+        'token': '10/min',
+        'checkout': '20/hour',
     },
+    # Reverse proxies in front of the app; throttles only trust that many
+    # X-Forwarded-For entries (0 = key clients on REMOTE_ADDR)
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Identifies the deployed code; the stored OpenAPI schema is rebuilt when it
+# changes. Defaults to a hash of the project sources.
+APP_VERSION = os.getenv("APP_VERSION", "")
+OPENAPI_SCHEMA_DIR = os.getenv("OPENAPI_SCHEMA_DIR", str(BASE_DIR / "openapi"))
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Hop & Barley API",
     "DESCRIPTION": "REST API for the Hop & Barley e-commerce store. "
@@ -103,9 +126,76 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.ClaimsTokenObtainPairSerializer",
 }
 
-ROOT_URLCONF = "config.urls"
+# Seconds an authenticated API user stays cached (invalidated on every user save)
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", 60))
+# Build API users from signed token claims instead of the cache/database.
+# Deactivation then only takes effect when the access token expires.
+JWT_TRUST_USER_CLAIMS = os.getenv("JWT_TRUST_USER_CLAIMS", "False").lower() == "true"
+
+# Build API list pages from values_list() rows instead of model instances
+# (config.fast_serialization); the output is the same either way.
+VALUES_LIST_SERIALIZATION = (
+    os.getenv("VALUES_LIST_SERIALIZATION", "True").lower() == "true"
+)
+
+# Most products one ``GET /api/products/?ids=`` may ask for
+API_BULK_MAX_IDS = int(os.getenv("API_BULK_MAX_IDS", 100))
+# Most sub-requests one ``POST /api/batch/`` may carry (config.batch)
+API_BATCH_MAX_REQUESTS = int(os.getenv("API_BATCH_MAX_REQUESTS", 20))
+
+# Catalog change feed (products.changes): the most ids per stream and page,
+# and how old a write must be before the feed reports it (room for slow commits)
+CATALOG_CHANGES_PAGE_SIZE = int(os.getenv("CATALOG_CHANGES_PAGE_SIZE", 100))
+CATALOG_CHANGES_SETTLE_SECONDS = int(os.getenv("CATALOG_CHANGES_SETTLE_SECONDS", 5))
+
+# Most rows one POST /api/products/inventory/ may carry
+INVENTORY_UPDATE_MAX_ROWS = int(os.getenv("INVENTORY_UPDATE_MAX_ROWS", 20000))
+
+# Sitemaps and the merchant product feed (products.sitemaps, build_sitemaps)
+SITE_URL = os.getenv("SITE_URL", "http://localhost:8000")
+SITEMAP_DIR = os.getenv("SITEMAP_DIR", str(BASE_DIR / "sitemaps"))
+SITEMAP_SHARD_SIZE = int(os.getenv("SITEMAP_SHARD_SIZE", 10000))  # at most 50,000 URLs
+PRODUCT_FEED_TITLE = os.getenv("PRODUCT_FEED_TITLE", "Hop & Barley")
+PRODUCT_FEED_CURRENCY = os.getenv("PRODUCT_FEED_CURRENCY", "USD")
+
+# Serve catalog and cart reads from async views (only worthwhile under ASGI)
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "False").lower() == "true"
+
+ROOT_URLCONF = "config.urls_async" if ASYNC_READ_VIEWS else "config.urls"
+
+# Fraction of requests whose SQL is instrumented (Server-Timing header and a
+# "config.sql" log record); a statement shape repeated more than the threshold
+# within one request is logged as a likely N+1.
+SQL_INSTRUMENTATION_SAMPLE_RATE = float(
+    os.getenv("SQL_INSTRUMENTATION_SAMPLE_RATE", 1.0 if DEBUG else 0.01)
+)
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))
+
+# Prometheus metrics at /metrics. Under a preforking server, point the
+# directory at an empty, worker-writable path so all workers' samples are
+# summed. Scrapers send the token as "Authorization: Bearer <token>"; without
+# one the endpoint is only served when DEBUG is on.
+METRICS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# cProfile capture of single requests (signed X-Profile-Token header, staff
+# "?_profile=1", or every Nth request when PROFILING_SAMPLE_EVERY > 0),
+# browsable at /admin/profiles/.
+PROFILING_DIR = os.getenv("PROFILING_DIR", str(BASE_DIR / "profiles"))
+PROFILING_MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", 50))
+PROFILING_SAMPLE_EVERY = int(os.getenv("PROFILING_SAMPLE_EVERY", 0))
+PROFILING_TOKEN_MAX_AGE = int(os.getenv("PROFILING_TOKEN_MAX_AGE", 3600))
+
+# tracemalloc-based per-route memory tracking, shown at /admin/memory/. Off by
+# default: tracing slows allocations down noticeably, more so with deeper frames.
+MEMORY_TRACKING_ENABLED = os.getenv("MEMORY_TRACKING_ENABLED", "False").lower() == "true"
+MEMORY_TRACEMALLOC_FRAMES = int(os.getenv("MEMORY_TRACEMALLOC_FRAMES", 10))
+MEMORY_SNAPSHOT_DIR = os.getenv("MEMORY_SNAPSHOT_DIR", str(BASE_DIR / "memory-snapshots"))
+MEMORY_MAX_SNAPSHOTS = int(os.getenv("MEMORY_MAX_SNAPSHOTS", 10))
+MEMORY_TOP_ALLOCATIONS = 25
 
 TEMPLATES = [
     {
@@ -127,6 +217,26 @@ TEMPLATES = [
 WSGI_APPLICATION = "config.wsgi.application"
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Use a shared backend (e.g. Redis) in production so throttle counters and
+# cached users are consistent across workers.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+THROTTLE_CACHE_ALIAS = "default"
+# Seconds a product snapshot used by the cart and checkout stays cached
+# (invalidated on every product save and on stock updates)
+PRODUCT_CACHE_TIMEOUT = int(os.getenv("PRODUCT_CACHE_TIMEOUT", 300))
+
+
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
@@ -141,6 +251,18 @@ DATABASES = {
     }
 }
 
+# Read replicas, e.g. DB_REPLICA_HOSTS=replica1,replica2 (aliases "replica_0", ...).
+# Only views marked with config.db_router.use_read_replica read from them.
+for index, host in enumerate(filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(","))):
+    DATABASES[f"replica_{index}"] = {**DATABASES["default"], "HOST": host.strip()}
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["config.db_router.ReplicaRouter"]
+# Seconds a client that wrote keeps reading from the primary
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 10))
+REPLICA_HEALTH_CHECK_INTERVAL = 5
+REPLICA_MAX_LAG_SECONDS = int(os.getenv("REPLICA_MAX_LAG_SECONDS", 10))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -188,6 +310,8 @@ LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"
 LOGIN_URL = "/accounts/login/"
 CART_SESSION_ID = "cart"
+# Pending orders older than this are cancelled by `expire_pending_orders`
+PENDING_ORDER_TTL_MINUTES = int(os.getenv("PENDING_ORDER_TTL_MINUTES", 60 * 24))
 SESSION_COOKIE_AGE = 1209600
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 SESSION_SAVE_EVERY_REQUEST = False
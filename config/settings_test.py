@@ -7,8 +7,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
-    }
+    },
+    # A separate database standing in for a read replica; enabled per test
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
 }
+DATABASE_REPLICAS = []
 
 # Disable migrations for faster tests (optional)
 # class DisableMigrations:
@@ -24,3 +30,6 @@ DATABASES = {
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
 ]
+
+# Instrument only in the tests that opt in
+SQL_INSTRUMENTATION_SAMPLE_RATE = 0
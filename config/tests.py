@@ -0,0 +1,351 @@
+"""Tests for the project-level middleware and throttles in config."""
+
+import tracemalloc
+from decimal import Decimal
+
+import pytest
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory
+
+from config.instrumentation import QueryInstrumentationMiddleware, fingerprint
+from config.memory import get_snapshot_store, route_stats
+from config.metrics import MmapFile, MultiProcessStore, registry
+from config.profiling import get_store as get_profile_store, profile_token
+from config.throttling import SlidingWindowAnonThrottle, SlidingWindowScopedThrottle
+from orders.models import Order, OrderItem
+from products.models import Product
+
+
+@pytest.mark.django_db
+class TestQueryInstrumentation:
+    """Tests for per-request SQL instrumentation."""
+
+    def test_server_timing_header(self, api_client, product, settings):
+        """Test sampled requests report query count and DB time."""
+        settings.SQL_INSTRUMENTATION_SAMPLE_RATE = 1.0
+        response = api_client.get('/api/products/')
+        assert response.status_code == 200
+        assert response['Server-Timing'].startswith('db;dur=')
+        assert 'queries"' in response['Server-Timing']
+
+    def test_unsampled_requests_untouched(self, api_client, product):
+        """Test requests outside the sample get no header."""
+        response = api_client.get('/api/products/')
+        assert 'Server-Timing' not in response
+
+    def test_fingerprint_ignores_literals_and_list_length(self):
+        """Test statements differing only in values share a shape."""
+        assert fingerprint('SELECT 1 FROM t WHERE id IN (%s, %s) LIMIT 21') == fingerprint(
+            "SELECT 2 FROM t WHERE id IN (%s) LIMIT 5"
+        )
+        assert fingerprint("SELECT * FROM t WHERE name = 'a'") == fingerprint(
+            "SELECT * FROM t WHERE name = 'b'"
+        )
+
+    def test_repeated_shape_flagged(self, product, settings, caplog):
+        """Test a statement repeated past the threshold is logged as N+1."""
+        settings.SQL_INSTRUMENTATION_SAMPLE_RATE = 1.0
+        settings.SQL_N_PLUS_ONE_THRESHOLD = 3
+
+        def view(request):
+            for _ in range(4):
+                Product.objects.get(pk=product.pk)
+            return HttpResponse()
+
+        middleware = QueryInstrumentationMiddleware(view)
+        with caplog.at_level('DEBUG', logger='config.sql'):
+            response = middleware(RequestFactory().get('/'))
+
+        assert '4 queries' in response['Server-Timing']
+        record = caplog.records[-1]
+        assert record.levelname == 'WARNING'
+        assert record.sql_stats['n_plus_one'][0]['count'] == 4
+
+    def test_order_list_has_no_n_plus_one(
+        self, authenticated_client, user, product, settings, caplog
+    ):
+        """Test listing many orders runs a constant number of queries."""
+        settings.SQL_INSTRUMENTATION_SAMPLE_RATE = 1.0
+        for _ in range(8):
+            order = Order.objects.create(
+                user=user, full_name='Test User', phone='1', city='C', address='A',
+                total_price=Decimal('19.99'),
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+
+        with caplog.at_level('DEBUG', logger='config.sql'):
+            response = authenticated_client.get('/api/orders/')
+
+        assert response.status_code == 200
+        assert caplog.records[-1].sql_stats['n_plus_one'] == []
+
+
+@pytest.mark.django_db
+class TestMetrics:
+    """Tests for the Prometheus metrics endpoint and its collectors."""
+
+    @pytest.fixture(autouse=True)
+    def metrics_token(self, settings):
+        settings.METRICS_TOKEN = 'scrape-me'
+
+    def test_requests_labelled_by_route(self, client, product):
+        """Test request samples use the route name, never the raw path."""
+        before = registry.get_sample_value(
+            'http_requests_total', route='product_detail', method='GET', status='2xx'
+        ) or 0
+        client.get(reverse('product_detail', kwargs={'slug': product.slug}))
+
+        response = client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        body = response.content.decode()
+        assert product.slug not in body
+        assert (
+            f'http_requests_total{{method="GET",route="product_detail",status="2xx"}} {before + 1:g}'
+            in body
+        )
+        assert 'http_request_duration_seconds_bucket{le="+Inf",method="GET",route="product_detail"}' in body
+        assert '# TYPE db_queries_per_request histogram' in body
+
+    def test_cart_and_checkout_counters(self, client, user, product):
+        """Test cart changes and checkout outcomes are counted."""
+        def value(sample, **labels):
+            return registry.get_sample_value(sample, **labels) or 0
+
+        adds = value('cart_operations_total', operation='add', result='success')
+        rejected = value('cart_operations_total', operation='add', result='error')
+        checkouts = value('checkouts_total', result='success')
+        emails = value('email_send_duration_seconds_count', email='order_confirmation', result='success')
+
+        client.force_login(user)
+        url = reverse('orders:cart_add', kwargs={'product_id': product.id})
+        client.post(url, {'quantity': 1})
+        client.post(url, {'quantity': 1000})
+        client.post(reverse('orders:checkout'), {
+            'full_name': 'Test User', 'phone': '1234567890', 'city': 'Test City', 'address': '1 St',
+        })
+
+        assert value('cart_operations_total', operation='add', result='success') == adds + 1
+        assert value('cart_operations_total', operation='add', result='error') == rejected + 1
+        assert value('checkouts_total', result='success') == checkouts + 1
+        assert value(
+            'email_send_duration_seconds_count', email='order_confirmation', result='success'
+        ) == emails + 1
+
+    def test_token_required(self, client, settings):
+        """Test scrapes need the token, and without one the endpoint is closed unless DEBUG."""
+        assert client.get('/metrics').status_code == 403
+        assert client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code == 403
+        assert client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me').status_code == 200
+
+        settings.METRICS_TOKEN = ''
+        assert client.get('/metrics').status_code == 403
+        settings.DEBUG = True
+        assert client.get('/metrics').status_code == 200
+
+    def test_multiprocess_files_are_summed(self, tmp_path):
+        """Test samples written by separate processes' files add up."""
+        key = ('jobs_total', (('queue', 'default'),))
+        first = MmapFile(str(tmp_path / 'metrics_1.db'))
+        second = MmapFile(str(tmp_path / 'metrics_2.db'))
+        first.inc(key, 2)
+        second.inc(key, 3)
+        # Enough distinct series to grow the file past its initial size
+        for number in range(2000):
+            second.inc(('jobs_total', (('queue', f'q{number}'),)), 1)
+
+        totals = MultiProcessStore(str(tmp_path)).collect()
+        assert totals[key] == 5
+        assert totals[('jobs_total', (('queue', 'q1999'),))] == 1
+        assert MmapFile(str(tmp_path / 'metrics_2.db'))._positions.keys() == {
+            key, *(('jobs_total', (('queue', f'q{n}'),)) for n in range(2000))
+        }
+
+
+@pytest.mark.django_db
+class TestRequestProfiling:
+    """Tests for on-demand cProfile capture and the admin profile browser."""
+
+    @pytest.fixture(autouse=True)
+    def profile_dir(self, settings, tmp_path):
+        settings.PROFILING_DIR = str(tmp_path)
+        return tmp_path
+
+    def test_staff_query_flag_profiles_request(self, admin_client, product):
+        """Test a staff request with the flag is profiled and browsable."""
+        response = admin_client.get(reverse('products'), {'category': 'test-category', '_profile': '1'})
+        profile_id = response['X-Profile-Id']
+
+        listing = admin_client.get(reverse('admin_profiles'))
+        assert listing.context['profiles'][0]['id'] == profile_id
+        assert listing.context['profiles'][0]['route'] == 'products'
+
+        detail = admin_client.get(reverse('admin_profile_detail', args=[profile_id]))
+        assert detail.status_code == 200
+        cumulative = [row['cumtime_ms'] for row in detail.context['functions']]
+        assert cumulative == sorted(cumulative, reverse=True)
+        download = admin_client.get(reverse('admin_profile_detail', args=[profile_id]), {'download': 1})
+        assert download['Content-Disposition'].startswith('attachment')
+
+    def test_signed_header_profiles_api_request(self, api_client, admin_user, user, product):
+        """Test the header works without a session only while its staff user stays staff."""
+        def profiled(token):
+            return 'X-Profile-Id' in api_client.get('/api/products/', HTTP_X_PROFILE_TOKEN=token)
+
+        assert not profiled('forged')
+        assert not profiled(profile_token(user))
+        token = profile_token(admin_user)
+        assert profiled(token)
+        admin_user.is_staff = False
+        admin_user.save()
+        assert not profiled(token)
+
+    def test_flag_ignored_for_non_staff(self, client, user, product):
+        """Test regular users cannot trigger profiling."""
+        client.force_login(user)
+        assert 'X-Profile-Id' not in client.get(reverse('products'), {'_profile': '1'})
+
+    def test_sampling_keeps_newest_profiles(self, client, settings, profile_dir):
+        """Test every Nth request is profiled and only the newest are kept."""
+        settings.PROFILING_SAMPLE_EVERY = 2
+        settings.PROFILING_MAX_PROFILES = 2
+        ids = [client.get(reverse('home')).get('X-Profile-Id') for _ in range(8)]
+        kept = [profile_id for profile_id in ids if profile_id][-2:]
+        assert len(list(profile_dir.glob('*.prof'))) == 2
+        assert get_profile_store().ids() == kept[::-1]
+
+    def test_admin_pages_require_staff(self, client, user):
+        """Test profiles are not visible to regular users."""
+        client.force_login(user)
+        assert client.get(reverse('admin_profiles')).status_code == 302
+
+
+@pytest.mark.django_db
+class TestMemoryTracking:
+    """Tests for tracemalloc-based per-route memory tracking."""
+
+    @pytest.fixture(autouse=True)
+    def tracing(self, settings, tmp_path):
+        settings.MEMORY_SNAPSHOT_DIR = str(tmp_path)
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        route_stats.clear()
+        yield
+        route_stats.clear()
+        if started:
+            tracemalloc.stop()
+
+    def test_peak_recorded_per_route(self, client, admin_client, user, order):
+        """Test requests are attributed to their route with a positive peak."""
+        client.force_login(user)
+        client.get(reverse('users:profile'))
+        client.get(reverse('users:profile'))
+
+        rows = {row['route']: row for row in route_stats.rows()}
+        assert rows['users:profile']['requests'] == 2
+        assert rows['users:profile']['peak_max'] > 0
+
+        response = admin_client.get(reverse('admin_memory'))
+        assert response.status_code == 200
+        assert 'users:profile' in [row['route'] for row in response.context['routes']]
+        assert response.context['sites']
+
+    def test_snapshot_diff(self, admin_client, tmp_path):
+        """Test two saved snapshots of one worker can be compared."""
+        admin_client.post(reverse('admin_memory'), {'action': 'snapshot'})
+        retained = [bytearray(1024) for _ in range(1000)]  # noqa: F841
+        admin_client.post(reverse('admin_memory'), {'action': 'snapshot'})
+        new, old = get_snapshot_store().ids()
+
+        diff = admin_client.get(reverse('admin_memory'), {'old': old, 'new': new}).context['diff']
+        assert diff['same_process']
+        assert any(site['size_diff'] >= 1024 * 1000 for site in diff['sites'])
+
+    def test_staff_only(self, client, user):
+        """Test the memory page is not visible to regular users."""
+        client.force_login(user)
+        assert client.get(reverse('admin_memory')).status_code == 302
+
+
+@pytest.mark.django_db
+class TestAPIThrottling:
+    """Tests for sliding-window API throttles."""
+
+    def test_cart_scope_limit_and_headers(self, api_client, monkeypatch):
+        """Test the cart scope is enforced and reported in headers."""
+        monkeypatch.setitem(SlidingWindowScopedThrottle.THROTTLE_RATES, 'cart', '2/min')
+
+        first = api_client.get('/api/cart/')
+        assert first.status_code == 200
+        assert first['X-RateLimit-Limit'] == '2'
+        assert first['X-RateLimit-Remaining'] == '1'
+
+        assert api_client.get('/api/cart/').status_code == 200
+        denied = api_client.get('/api/cart/')
+        assert denied.status_code == 429
+        assert denied['X-RateLimit-Remaining'] == '0'
+        assert 'Retry-After' in denied
+        # Without trusted proxies a forged X-Forwarded-For is ignored
+        assert api_client.get('/api/cart/', HTTP_X_FORWARDED_FOR='10.1.2.3').status_code == 429
+
+    def test_previous_window_weighted(self, monkeypatch):
+        """Test the previous window's count decays across the current one."""
+        throttle = SlidingWindowAnonThrottle()
+        throttle.rate = '10/min'
+        throttle.num_requests, throttle.duration = 10, 60
+        request = APIRequestFactory().get('/api/cart/')
+        request.user = AnonymousUser()
+
+        monkeypatch.setattr(throttle, 'timer', lambda: 5970.0)
+        for _ in range(10):
+            assert throttle.allow_request(request, None)
+
+        # 45s into the next window only a quarter of the old count remains
+        monkeypatch.setattr(throttle, 'timer', lambda: 6045.0)
+        results = [throttle.allow_request(request, None) for _ in range(8)]
+        assert results == [True] * 7 + [False]
+        # 0.25 * 10 + 7 + 1 <= 10 once the old weight drops to 0.2, at 48s
+        assert throttle.wait() == pytest.approx(3.0)
+
+    @pytest.mark.parametrize('misses', [1, 2])
+    def test_counter_expiring_before_incr(self, monkeypatch, misses):
+        """Test a counter evicted between add() and incr() starts over instead of failing."""
+        throttle = SlidingWindowAnonThrottle()
+        throttle.rate = '10/min'
+        throttle.num_requests, throttle.duration = 10, 60
+        request = APIRequestFactory().get('/api/cart/')
+        request.user = AnonymousUser()
+        incr = throttle.cache.incr
+        calls = []
+
+        def evicting_incr(key, *args, **kwargs):
+            calls.append(key)
+            if len(calls) <= misses:
+                throttle.cache.delete(key)
+            return incr(key, *args, **kwargs)
+
+        monkeypatch.setattr(throttle.cache, 'incr', evicting_incr)
+        assert throttle.allow_request(request, None)
+        assert throttle.current == 1
+
+    def test_denied_requests_not_counted(self, monkeypatch):
+        """Test retries while locked out don't extend the lockout."""
+        throttle = SlidingWindowAnonThrottle()
+        throttle.rate = '10/min'
+        throttle.num_requests, throttle.duration = 10, 60
+        request = APIRequestFactory().get('/api/cart/')
+        request.user = AnonymousUser()
+
+        monkeypatch.setattr(throttle, 'timer', lambda: 6000.0)
+        results = [throttle.allow_request(request, None) for _ in range(30)]
+        assert results == [True] * 10 + [False] * 20
+        # Next window: 10 * (1 - elapsed) + 1 <= 10 from 6s in
+        assert throttle.wait() == pytest.approx(66.0)
+
+        monkeypatch.setattr(throttle, 'timer', lambda: 6066.0)
+        assert throttle.allow_request(request, None)
@@ -0,0 +1,131 @@
+"""Sliding-window API throttles backed by atomic counters in a shared cache.
+
+DRF's stock throttles keep a list of request timestamps per client and
+rewrite it on every request. These throttles keep two integer counters
+per client instead - the current and the previous fixed window - and
+estimate the sliding window as::
+
+    previous * (1 - elapsed_fraction) + current
+
+Each check is an atomic ``incr`` plus one ``get``, regardless of the rate,
+and works across workers whenever the configured cache is shared. Denied
+requests are taken back off the counter, so a client retrying while it
+is locked out doesn't extend its own lockout.
+"""
+
+import math
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    ScopedRateThrottle,
+    SimpleRateThrottle,
+    UserRateThrottle,
+)
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """Approximate sliding-window throttle using two fixed-window counters."""
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        current_key = f"{self.key}:{window}"
+
+        self.current = self.increment(current_key)
+        self.previous = self.cache.get(f"{self.key}:{window - 1}", 0)
+        self.elapsed = (self.now % self.duration) / self.duration
+        self.estimate = self.previous * (1 - self.elapsed) + self.current
+
+        self.record_limit(request)
+        if self.estimate <= self.num_requests:
+            return True
+        # Only allowed requests count
+        try:
+            self.current = self.cache.decr(current_key)
+        except ValueError:  # expired since the incr()
+            self.current = 0
+        return False
+
+    def increment(self, key):
+        """Add one to the counter at ``key``, creating it if it is missing.
+
+        ``add()`` followed by ``incr()`` can still miss the key when it
+        expires or is evicted in between, so that case retries once and
+        then starts the counter with ``set()``.
+        """
+        for _ in range(2):
+            self.cache.add(key, 0, self.duration * 2)
+            try:
+                return self.cache.incr(key)
+            except ValueError:
+                continue
+        self.cache.set(key, 1, self.duration * 2)
+        return 1
+
+    def wait(self):
+        """Seconds until ``previous * (1 - elapsed) + current + 1 <= num_requests``."""
+        window_left = self.duration * (1 - self.elapsed)
+        if self.current < self.num_requests and self.previous:
+            # Within this window, once the previous window's weight has decayed enough
+            needed = 1 - (self.num_requests - self.current - 1) / self.previous
+            return max(0.0, (needed - self.elapsed) * self.duration)
+        # In the next window, where this window's count is the one decaying
+        needed = 1 - (self.num_requests - 1) / self.current if self.current else 0
+        return window_left + max(0.0, needed) * self.duration
+
+    def record_limit(self, request):
+        """Remember the tightest limit on the request for the rate-limit headers."""
+        remaining = max(0, self.num_requests - math.ceil(self.estimate))
+        limit = {
+            "limit": self.num_requests,
+            "remaining": remaining,
+            "reset": math.ceil(self.duration * (1 - self.elapsed)),
+        }
+        http_request = getattr(request, "_request", request)
+        current = getattr(http_request, "rate_limit", None)
+        if current is None or remaining < current["remaining"]:
+            http_request.rate_limit = limit
+
+
+class SlidingWindowAnonThrottle(AnonRateThrottle, SlidingWindowRateThrottle):
+    """Sliding-window version of DRF's ``AnonRateThrottle``."""
+
+
+class SlidingWindowUserThrottle(UserRateThrottle, SlidingWindowRateThrottle):
+    """Sliding-window version of DRF's ``UserRateThrottle``."""
+
+
+class SlidingWindowScopedThrottle(ScopedRateThrottle, SlidingWindowRateThrottle):
+    """Sliding-window version of DRF's ``ScopedRateThrottle``.
+
+    Applies only to views that set ``throttle_scope``.
+    """
+
+
+class RateLimitHeadersMiddleware:
+    """Add ``X-RateLimit-*`` headers for requests checked by the throttles above."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        limit = getattr(request, "rate_limit", None)
+        if limit is not None:
+            response["X-RateLimit-Limit"] = limit["limit"]
+            response["X-RateLimit-Remaining"] = limit["remaining"]
+            response["X-RateLimit-Reset"] = limit["reset"]
+        return response
@@ -11,25 +11,31 @@ Class-based views
     1. Add an import:  from other_app.views import Home
     2. Add a URL to urlpatterns:  path('', Home.as_view(), name='home')
 Including another URLconf
-    1. Import the include() function: from django.urls import include, path
+    1. Import the include() function: from django.urls import include, path, re_path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularRedocView,
-    SpectacularSwaggerView,
-)
+from django.urls import include, path, re_path
+from drf_spectacular.views import SpectacularRedocView, SpectacularSwaggerView
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from config.batch import BatchAPIView
+from config.memory import memory_view
+from config.metrics import metrics_view
+from config.profiling import profile_detail_view, profile_list_view
+from config.schema import CachedSpectacularAPIView
 from orders.views import OrderViewSet, CartAPIView
+from products.sitemaps import sitemap_file
 from products.views import ProductViewSet
-from users.views import RegisterAPIView, UserProfileAPIView
+from users.views import (
+    RegisterAPIView,
+    ThrottledTokenObtainView,
+    ThrottledTokenRefreshView,
+    UserProfileAPIView,
+)
 
 router = DefaultRouter()
 router.register(r"products", ProductViewSet, basename="product")
@@ -37,9 +43,17 @@ router.register(r"orders", OrderViewSet, basename="order")
 
 
 urlpatterns = [
+    path("admin/profiles/", admin.site.admin_view(profile_list_view), name="admin_profiles"),
+    path(
+        "admin/profiles/<str:profile_id>/",
+        admin.site.admin_view(profile_detail_view),
+        name="admin_profile_detail",
+    ),
+    path("admin/memory/", admin.site.admin_view(memory_view), name="admin_memory"),
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     # API Documentation
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
+    path("api/schema/", CachedSpectacularAPIView.as_view(), name="schema"),
     path(
         "api/docs/",
         SpectacularSwaggerView.as_view(url_name="schema"),
@@ -48,11 +62,18 @@ urlpatterns = [
     path("api/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
     # API endpoints
     path("api/", include(router.urls)),
-    path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("api/token/", ThrottledTokenObtainView.as_view(), name="token_obtain_pair"),
+    path("api/token/refresh/", ThrottledTokenRefreshView.as_view(), name="token_refresh"),
     path("api/users/register/", RegisterAPIView.as_view(), name="api_register"),
     path("api/users/profile/", UserProfileAPIView.as_view(), name="api_profile"),
     path("api/cart/", CartAPIView.as_view(), name="api_cart"),
+    path("api/batch/", BatchAPIView.as_view(), name="api_batch"),
+    # Files written by build_sitemaps
+    re_path(
+        r"^(?P<path>(sitemap|product-feed)[\w-]*\.xml(\.gz)?)$",
+        sitemap_file,
+        name="sitemap_file",
+    ),
     # Web URLs
     path("accounts/", include("users.urls")),
     path("", include("orders.urls")),
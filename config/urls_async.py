@@ -0,0 +1,57 @@
+"""URL configuration for ASGI deployments.
+
+Identical to ``config.urls`` except that the catalog and cart read paths are
+served by async views. Selected with ``ASYNC_READ_VIEWS=True``; under WSGI
+keep the default ``config.urls``, since every async view would need its own
+event loop there.
+"""
+
+from django.urls import path, re_path
+
+from orders.views import CartAPIView
+from products.views import AsyncProductDetailView, AsyncProductListView, ProductViewSet
+
+from .urls import urlpatterns as sync_urlpatterns
+
+# Listed first so they shadow the synchronous routes for the same paths
+urlpatterns = [
+    re_path(
+        r"^api/products/$",
+        ProductViewSet.as_async_view(
+            {"get": "list", "post": "create"}, basename="product", detail=False
+        ),
+        name="product-list",
+    ),
+    # Ahead of the detail route below, which would take their names for a pk
+    re_path(
+        r"^api/products/changes/$",
+        ProductViewSet.as_view({"get": "changes"}, basename="product", detail=False),
+        name="product-changes",
+    ),
+    re_path(
+        r"^api/products/inventory/$",
+        ProductViewSet.as_view({"post": "inventory"}, basename="product", detail=False),
+        name="product-inventory",
+    ),
+    re_path(
+        r"^api/products/(?P<pk>[^/.]+)/$",
+        ProductViewSet.as_async_view(
+            {
+                "get": "retrieve",
+                "put": "update",
+                "patch": "partial_update",
+                "delete": "destroy",
+            },
+            basename="product",
+            detail=True,
+        ),
+        name="product-detail",
+    ),
+    path("api/cart/", CartAPIView.as_async_view(), name="api_cart"),
+    path("products/", AsyncProductListView.as_view(), name="products"),
+    path(
+        "products/<slug:slug>/",
+        AsyncProductDetailView.as_view(),
+        name="product_detail",
+    ),
+] + sync_urlpatterns
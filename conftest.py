@@ -3,6 +3,7 @@
 import pytest
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
@@ -13,6 +14,12 @@ from reviews.models import Review
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with empty caches (throttle counters, cached users and products)."""
+    cache.clear()
+
+
 @pytest.fixture
 def user(db):
     """Create a test user."""
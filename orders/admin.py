@@ -3,6 +3,8 @@ from django.db.models import Sum, Count
 from django.template.response import TemplateResponse
 from django.urls import path
 
+from config.db_router import use_read_replica
+
 from .models import Order, OrderItem
 
 
@@ -37,7 +39,7 @@ class OrderAdmin(admin.ModelAdmin):
         custom_urls = [
             path(
                 "analytics/",
-                self.admin_site.admin_view(self.analytics_view),
+                self.admin_site.admin_view(use_read_replica(self.analytics_view)),
                 name="orders_analytics",
             ),
         ]
@@ -2,20 +2,31 @@ from decimal import Decimal
 
 from django.conf import settings
 from typing import Dict
+from config.metrics import CART_OPERATIONS
+from products.cache import aget_products, get_products
 from products.models import Product
 
 
 class Cart:
     def __init__(self, request):
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
+        # An empty cart is only stored on the first change, so browsing doesn't write the session
+        self.cart = self.session.get(settings.CART_SESSION_ID) or {}
 
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-
-        self.cart = cart
+    @classmethod
+    async def acreate(cls, request) -> "Cart":
+        """Build a cart from an async view, loading the session without blocking."""
+        await request.session.aget(settings.CART_SESSION_ID)
+        return cls(request)
 
     def add(self, product: Product, quantity:int = 1, override_quantity:bool = False) -> Dict[str, str]:
+        result = self._add(product, quantity, override_quantity)
+        CART_OPERATIONS.inc(
+            operation='update' if override_quantity else 'add', result=result['status']
+        )
+        return result
+
+    def _add(self, product: Product, quantity: int, override_quantity: bool) -> Dict[str, str]:
         product_id = str(product.id)
 
         if quantity > product.stock:
@@ -55,6 +66,7 @@ class Cart:
         if product_id in self.cart:
             del self.cart[product_id]
             self.save()
+        CART_OPERATIONS.inc(operation='remove', result='success')
 
     def update(self, product: Product, quantity:int) -> Dict[str, str]:
         if quantity <= 0:
@@ -67,26 +79,41 @@ class Cart:
         return self.add(product, quantity, override_quantity=True)
 
     def save(self) -> None:
+        self.session[settings.CART_SESSION_ID] = self.cart
         self.session.modified = True
 
     def clear(self) -> None:
-        del self.session[settings.CART_SESSION_ID]
+        self.session.pop(settings.CART_SESSION_ID, None)
         self.cart = {}
         self.save()
+        CART_OPERATIONS.inc(operation='clear', result='success')
 
     def __iter__(self):
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        cart = self.cart.copy()
+        """Cart items with their products, leaving the session data untouched.
 
-        for product in products:
-            cart[str(product.id)]['product'] = product
+        Products come from the product cache; items whose product no longer
+        exists are skipped.
+        """
+        return self._items(get_products(self.cart.keys()))
 
-        for item in cart.values():
-            item['price'] = Decimal(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
+    async def __aiter__(self):
+        """Async counterpart of ``__iter__``."""
+        for item in self._items(await aget_products(self.cart.keys())):
             yield item
 
+    def _items(self, products):
+        for product_id, item in self.cart.items():
+            product = products.get(int(product_id))
+            if product is None:
+                continue
+            price = Decimal(item['price'])
+            yield {
+                'product': product,
+                'quantity': item['quantity'],
+                'price': price,
+                'total_price': price * item['quantity'],
+            }
+
     def __len__(self) -> int:
         return sum(item['quantity'] for item in self.cart.values())
 
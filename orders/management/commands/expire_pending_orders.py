@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.services import expire_pending_orders
+
+
+class Command(BaseCommand):
+    """Cancel abandoned pending orders and release their reserved stock."""
+
+    help = "Cancel pending orders older than a TTL and restore product stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl-minutes",
+            type=int,
+            default=settings.PENDING_ORDER_TTL_MINUTES,
+            help="Age in minutes after which a pending order expires.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of orders cancelled per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        if options["ttl_minutes"] <= 0 or options["batch_size"] <= 0:
+            raise CommandError("--ttl-minutes and --batch-size must be positive.")
+
+        stats = expire_pending_orders(
+            ttl=timedelta(minutes=options["ttl_minutes"]),
+            batch_size=options["batch_size"],
+        )
+        rate = stats["orders"] / stats["elapsed"] if stats["elapsed"] else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Cancelled {stats['orders']} orders in {stats['batches']} batches, "
+                f"restored stock for {stats['products']} products "
+                f"in {stats['elapsed']:.2f}s ({rate:.0f} orders/s)."
+            )
+        )
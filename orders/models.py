@@ -35,6 +35,7 @@ class Order(models.Model):
         verbose_name = "Order"
         verbose_name_plural = "Orders"
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
 
     @property
     def is_paid(self):
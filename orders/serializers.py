@@ -1,7 +1,12 @@
 from rest_framework import serializers
 
+from config.fast_serialization import Column
+from products.serializers import SparseFieldsMixin
+
 from .models import Order, OrderItem
 
+STATUS_LABELS = dict(Order.Status.choices)
+
 
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,7 +14,15 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ["id", "product", "quantity", "price"]
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {"items": None}
+    field_columns = {"status_display": ["status"]}
+    values_fields = {
+        "status_display": Column(
+            "status", convert=lambda status: str(STATUS_LABELS.get(status, status))
+        ),
+    }
+
     items = OrderItemSerializer(many=True, read_only=True)
     user = serializers.ReadOnlyField(source="user.username")
     status_display = serializers.CharField(source="get_status_display", read_only=True)
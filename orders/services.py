@@ -1,8 +1,20 @@
+import time
+from functools import partial
+from datetime import timedelta
+from typing import Dict
+
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Sum, Value, When
 from django.template.loader import render_to_string
+from django.utils import timezone
+
+from config.metrics import EMAIL_SEND_LATENCY
+from products.cache import invalidate_products
+from products.models import Product
 
-from .models import Order
+from .models import Order, OrderItem
 
 
 def send_order_confirmation_email(order: Order) -> bool:
@@ -28,8 +40,7 @@ def send_order_confirmation_email(order: Order) -> bool:
             to=[order.user.email]
         )
         email.attach_alternative(html_context, "text/html")
-        email.send(fail_silently=False)
-        return True
+        return _send(email, 'order_confirmation')
     except Exception:
         return False
 
@@ -67,7 +78,80 @@ def send_order_admin_notification(order: Order, request=None) -> bool:
             from_email=settings.DEFAULT_FROM_EMAIL,
             to=[settings.ADMIN_EMAIL],
         )
+        return _send(email, 'order_admin_notification')
+    except Exception:
+        return False
+
+
+def _send(email: EmailMultiAlternatives, name: str) -> bool:
+    """Send ``email``, recording how long delivery took under ``name``."""
+    started = time.perf_counter()
+    try:
         email.send(fail_silently=False)
-        return True
     except Exception:
-        return False
\ No newline at end of file
+        EMAIL_SEND_LATENCY.observe(time.perf_counter() - started, email=name, result='failure')
+        raise
+    EMAIL_SEND_LATENCY.observe(time.perf_counter() - started, email=name, result='success')
+    return True
+
+
+def expire_pending_orders(ttl: timedelta, batch_size: int = 500) -> Dict[str, float]:
+    """Cancel pending orders older than ``ttl`` and return their stock.
+
+    Orders are processed in batches. Each batch locks its rows with
+    ``SKIP LOCKED`` so concurrent sweepers (or a checkout touching the same
+    order) never block each other, and restores stock for every affected
+    product with a single aggregated ``UPDATE``.
+
+    Args:
+        ttl: Age after which a pending order is considered abandoned.
+        batch_size: Maximum number of orders handled per transaction.
+
+    Returns:
+        Dict with processed order/product counts, batch count and
+        elapsed time in seconds.
+    """
+    cutoff = timezone.now() - ttl
+    stats = {'orders': 0, 'products': 0, 'batches': 0, 'elapsed': 0.0}
+    started = time.monotonic()
+
+    while True:
+        with transaction.atomic():
+            order_ids = list(
+                Order.objects.select_for_update(skip_locked=True)
+                .filter(status=Order.Status.PENDING, created_at__lt=cutoff)
+                .order_by('created_at')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                break
+
+            quantities = dict(
+                OrderItem.objects.filter(order_id__in=order_ids)
+                .values('product_id')
+                .annotate(total=Sum('quantity'))
+                .values_list('product_id', 'total')
+            )
+            now = timezone.now()
+            if quantities:
+                Product.objects.filter(id__in=quantities).update(
+                    stock=F('stock') + Case(
+                        *[When(id=pk, then=Value(qty)) for pk, qty in quantities.items()],
+                        default=Value(0),
+                        output_field=PositiveIntegerField(),
+                    ),
+                    updated_at=now,
+                )
+                transaction.on_commit(partial(invalidate_products, list(quantities)))
+            Order.objects.filter(id__in=order_ids).update(
+                status=Order.Status.CANCELLED, updated_at=now
+            )
+
+        stats['orders'] += len(order_ids)
+        stats['products'] += len(quantities)
+        stats['batches'] += 1
+        if len(order_ids) < batch_size:
+            break
+
+    stats['elapsed'] = time.monotonic() - started
+    return stats
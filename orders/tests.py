@@ -1,12 +1,16 @@
 """Tests for orders app."""
 
 import pytest
+from datetime import timedelta
 from decimal import Decimal
 
+from django.core.management import call_command
 from django.urls import reverse
+from django.utils import timezone
 
 from orders.models import Order, OrderItem
 from orders.cart import Cart
+from products.cache import get_product
 
 
 @pytest.mark.django_db
@@ -135,6 +139,12 @@ class TestCartViews:
         response = client.get(reverse('orders:cart'))
         assert response.status_code == 200
 
+    def test_browsing_does_not_create_session(self, client, product, settings):
+        """Test an empty cart is not written to the session."""
+        client.get(reverse('orders:cart'))
+        client.get(reverse('product_detail', kwargs={'slug': product.slug}))
+        assert settings.SESSION_COOKIE_NAME not in client.cookies
+
     def test_cart_add_view(self, client, product):
         """Test adding to cart via AJAX."""
         response = client.post(
@@ -176,6 +186,29 @@ class TestCheckout:
         response = client.get(reverse('orders:checkout'))
         assert response.status_code == 200
 
+    def test_checkout_decrements_cached_stock(
+        self, client, user, product, django_capture_on_commit_callbacks
+    ):
+        """Test an order updates stock without serving a stale cached product."""
+        client.force_login(user)
+        client.post(
+            reverse('orders:cart_add', kwargs={'product_id': product.id}),
+            {'quantity': 3}
+        )
+        assert get_product(product.id).stock == 100
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.post(reverse('orders:checkout'), {
+                'full_name': 'Test User',
+                'phone': '1234567890',
+                'city': 'Test City',
+                'address': '123 Test St',
+            })
+        assert response.status_code == 200
+        assert get_product(product.id).stock == 97
+        product.refresh_from_db()
+        assert product.stock == 97
+
     def test_checkout_empty_cart_redirect(self, client, user):
         """Test checkout redirects if cart is empty."""
         client.force_login(user)
@@ -203,6 +236,30 @@ class TestOrderAPI:
         assert response.status_code == 200
         assert response.data['id'] == order.id
 
+    def test_order_sparse_fields(self, authenticated_client, order, django_assert_num_queries):
+        """Test ?fields= skips the items prefetch and the user join."""
+        with django_assert_num_queries(3):  # auth user, count, page
+            response = authenticated_client.get(
+                '/api/orders/', {'fields': 'id,status_display,total_price'}
+            )
+        assert response.data['results'] == [
+            {'id': order.id, 'total_price': '19.99', 'status_display': 'Paid'}
+        ]
+
+    @pytest.mark.parametrize('params', [
+        {}, {'expand': ''}, {'fields': 'id,user,status_display,items'}, {'ordering': 'x'},
+    ])
+    def test_order_list_fast_path_matches_serializer(
+        self, authenticated_client, order, settings, params
+    ):
+        """Test the values_list() fast path renders what OrderSerializer renders."""
+        Order.objects.create(user=order.user, status='shipped', total_price=Decimal('5.00'))
+        fast = authenticated_client.get('/api/orders/', params)
+        settings.VALUES_LIST_SERIALIZATION = False
+        slow = authenticated_client.get('/api/orders/', params)
+        assert fast.status_code == 200
+        assert fast.content == slow.content
+
 
 @pytest.mark.django_db
 class TestCartAPI:
@@ -226,3 +283,48 @@ class TestCartAPI:
         """Test clearing cart via API."""
         response = api_client.delete('/api/cart/')
         assert response.status_code == 200
+
+
+@pytest.mark.django_db
+class TestExpirePendingOrders:
+    """Tests for the stale pending order sweeper."""
+
+    def _pending_order(self, user, product, quantity, age):
+        order = Order.objects.create(
+            user=user,
+            full_name='Test User',
+            total_price=product.price * quantity,
+        )
+        OrderItem.objects.create(
+            order=order, product=product, quantity=quantity, price=product.price
+        )
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - age)
+        return order
+
+    def test_stale_orders_cancelled_and_stock_restored(self, user, product):
+        """Test expired orders are cancelled with stock returned in aggregate."""
+        first = self._pending_order(user, product, 2, timedelta(days=2))
+        second = self._pending_order(user, product, 3, timedelta(days=3))
+
+        call_command('expire_pending_orders', '--ttl-minutes=60', '--batch-size=1')
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        product.refresh_from_db()
+        assert first.status == Order.Status.CANCELLED
+        assert second.status == Order.Status.CANCELLED
+        assert product.stock == 105
+
+    def test_recent_and_paid_orders_untouched(self, user, product, order):
+        """Test fresh pending orders and non-pending orders are kept."""
+        fresh = self._pending_order(user, product, 1, timedelta(minutes=5))
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(days=5))
+
+        call_command('expire_pending_orders', '--ttl-minutes=60')
+
+        fresh.refresh_from_db()
+        order.refresh_from_db()
+        product.refresh_from_db()
+        assert fresh.status == Order.Status.PENDING
+        assert order.status == Order.Status.PAID
+        assert product.stock == 100
@@ -3,8 +3,10 @@
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db import transaction
+from django.db.models import F
 from django.http import JsonResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.shortcuts import redirect, render
+from django.utils import timezone
 from django.views import View
 from django.views.decorators.http import require_POST
 from rest_framework import permissions, status, viewsets
@@ -12,7 +14,12 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from config.async_views import AsyncReadAPIMixin
+from config.fast_serialization import ValuesListMixin
+from config.metrics import CHECKOUTS
+from products.cache import get_product, get_product_or_404, invalidate_products
 from products.models import Product
+from products.views import SPARSE_ACTIONS, SparseFieldsViewMixin
 
 from .cart import Cart
 from .forms import OrderCreateForm
@@ -83,12 +90,16 @@ class OrderCreateView(LoginRequiredMixin, View):
                             price=item['price'],
                             quantity=item['quantity']
                         )
-                        # Уменьшаем запас
+                        # Уменьшаем запас одним условным UPDATE, не перезаписывая строку целиком
                         product = item['product']
-                        if product.stock < item['quantity']:
+                        updated = Product.objects.filter(
+                            pk=product.pk, stock__gte=item['quantity']
+                        ).update(stock=F('stock') - item['quantity'], updated_at=timezone.now())
+                        if not updated:
                             raise ValueError(f"Not enough stock for {product.name}")
-                        product.stock -= item['quantity']
-                        product.save()
+
+                    product_ids = list(cart.cart)
+                    transaction.on_commit(lambda: invalidate_products(product_ids))
 
                     cart.clear()
 
@@ -97,10 +108,14 @@ class OrderCreateView(LoginRequiredMixin, View):
                     send_order_admin_notification(order, request)
 
                     messages.success(request, f'Order #{order.id} created! Confirmation email sent.')
-                    return render(request, 'order_created.html', {'order': order})
+                    response = render(request, 'order_created.html', {'order': order})
             except Exception as e:
+                CHECKOUTS.inc(result='failure')
                 messages.error(request, f"Error: {str(e)}")
                 return redirect('orders:cart')
+            CHECKOUTS.inc(result='success')
+            return response
+        CHECKOUTS.inc(result='invalid')
         return render(request, 'checkout.html', {'cart': cart, 'form': form})
 
 
@@ -117,7 +132,7 @@ def cart_add(request, product_id: int):
         JsonResponse с результатом операции
     """
     cart = Cart(request)
-    product = get_object_or_404(Product, id=product_id, is_active=True)
+    product = get_product_or_404(product_id)
 
     # Получаем количество из POST данных
     quantity = int(request.POST.get('quantity', 1))
@@ -152,7 +167,7 @@ def cart_remove(request, product_id: int):
         JsonResponse с результатом или redirect
     """
     cart = Cart(request)
-    product = get_object_or_404(Product, id=product_id)
+    product = get_product_or_404(product_id, active=False)
 
     cart.remove(product)
     messages.success(request, f'{product.name} removed from cart')
@@ -183,7 +198,7 @@ def cart_update(request, product_id: int):
         JsonResponse с результатом
     """
     cart = Cart(request)
-    product = get_object_or_404(Product, id=product_id, is_active=True)
+    product = get_product_or_404(product_id)
 
     # Получаем новое количество
     quantity = int(request.POST.get('quantity', 1))
@@ -222,23 +237,40 @@ def cart_clear(request):
     return redirect('orders:cart')
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseFieldsViewMixin, ValuesListMixin, viewsets.ModelViewSet):
     """API ViewSet for Order model."""
 
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_throttles(self):
+        # Only order creation counts against the checkout rate
+        self.throttle_scope = "checkout" if self.action == "create" else None
+        return super().get_throttles()
+
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        queryset = Order.objects.filter(user=self.request.user)
+        if self.action not in SPARSE_ACTIONS:
+            return queryset.select_related("user").prefetch_related("items")
+        serializer = self.get_sparse_serializer()
+        columns = serializer.model_columns()
+        if "user" in serializer.fields:
+            queryset = queryset.select_related("user")
+            columns.append("user__username")
+        queryset = queryset.only(*columns)
+        if serializer.is_expanded("items"):
+            queryset = queryset.prefetch_related("items")
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class CartAPIView(APIView):
+class CartAPIView(AsyncReadAPIMixin, APIView):
     """API endpoint for cart management."""
 
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'cart'
 
     def get(self, request):
         """Get cart contents."""
@@ -258,15 +290,33 @@ class CartAPIView(APIView):
             'items_count': len(cart),
         })
 
+    async def aget(self, request):
+        """Get cart contents without blocking the event loop (ASGI read path)."""
+        cart = await Cart.acreate(request)
+        items = [
+            {
+                'product_id': item['product'].id,
+                'product_name': item['product'].name,
+                'quantity': item['quantity'],
+                'price': str(item['price']),
+                'total_price': str(item['total_price']),
+            }
+            async for item in cart
+        ]
+        return Response({
+            'items': items,
+            'total_price': str(cart.get_total_price()),
+            'items_count': len(cart),
+        })
+
     def post(self, request):
         """Add item to cart."""
         cart = Cart(request)
         product_id = request.data.get('product_id')
         quantity = int(request.data.get('quantity', 1))
 
-        try:
-            product = Product.objects.get(id=product_id, is_active=True)
-        except Product.DoesNotExist:
+        product = get_product(product_id)
+        if product is None or not product.is_active:
             return Response(
                 {'error': 'Product not found'},
                 status=status.HTTP_404_NOT_FOUND
@@ -286,9 +336,8 @@ class CartAPIView(APIView):
         product_id = request.data.get('product_id')
         quantity = int(request.data.get('quantity', 1))
 
-        try:
-            product = Product.objects.get(id=product_id, is_active=True)
-        except Product.DoesNotExist:
+        product = get_product(product_id)
+        if product is None or not product.is_active:
             return Response(
                 {'error': 'Product not found'},
                 status=status.HTTP_404_NOT_FOUND
@@ -308,19 +357,18 @@ class CartAPIView(APIView):
         product_id = request.data.get('product_id')
 
         if product_id:
-            try:
-                product = Product.objects.get(id=product_id)
-                cart.remove(product)
-                return Response({
-                    'message': f'{product.name} removed from cart',
-                    'cart_items_count': len(cart),
-                    'cart_total': str(cart.get_total_price()),
-                })
-            except Product.DoesNotExist:
+            product = get_product(product_id)
+            if product is None:
                 return Response(
                     {'error': 'Product not found'},
                     status=status.HTTP_404_NOT_FOUND
                 )
+            cart.remove(product)
+            return Response({
+                'message': f'{product.name} removed from cart',
+                'cart_items_count': len(cart),
+                'cart_total': str(cart.get_total_price()),
+            })
         else:
             cart.clear()
             return Response({'message': 'Cart cleared'})
@@ -0,0 +1,135 @@
+"""Read-through cache of compact Product snapshots.
+
+The cart paths only need a few columns of a product. Those columns are
+cached as a tuple under the product id, with a slug -> id pointer beside
+it. Lookups return real ``Product`` instances built with ``from_db`` and
+every other field deferred, so other attributes still load on access and
+``save()`` only writes the cached columns.
+
+Entries are dropped when a product is saved or deleted (``products.signals``).
+Queryset updates that change snapshot columns, such as stock decrements,
+must call ``invalidate_products``.
+
+Slug pointers are never deleted; a pointer is only trusted when the
+snapshot it leads to still has that slug.
+"""
+
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404
+
+from config.metrics import CACHE_LOOKUPS
+
+from .models import Product
+
+# In model field order, as ``Model.from_db`` expects for partial rows
+SNAPSHOT_FIELDS = ("id", "name", "slug", "price", "stock", "is_active", "image")
+
+
+def product_cache_key(pk) -> str:
+    return f"product:snapshot:{pk}"
+
+
+def product_slug_key(slug) -> str:
+    return f"product:slug:{slug}"
+
+
+def invalidate_products(ids: Iterable) -> None:
+    cache.delete_many([product_cache_key(pk) for pk in ids])
+
+
+def _ids(ids: Iterable):
+    valid = set()
+    for pk in ids:
+        try:
+            valid.add(int(pk))
+        except (TypeError, ValueError):
+            continue
+    return valid
+
+
+def _count_lookups(hits, misses):
+    if hits:
+        CACHE_LOOKUPS.inc(hits, cache="product", result="hit")
+    if misses:
+        CACHE_LOOKUPS.inc(misses, cache="product", result="miss")
+
+
+def _from_snapshot(values) -> Product:
+    return Product.from_db(DEFAULT_DB_ALIAS, SNAPSHOT_FIELDS, values)
+
+
+def get_products(ids: Iterable) -> Dict[int, Product]:
+    """Products by id, with one cache round trip and at most one query for misses.
+
+    Ids that are not integers or do not exist are left out of the result.
+    """
+    keys = {product_cache_key(pk): pk for pk in _ids(ids)}
+    if not keys:
+        return {}
+    snapshots = {keys[key]: values for key, values in cache.get_many(keys).items()}
+    missing = set(keys.values()) - snapshots.keys()
+    _count_lookups(len(snapshots), len(missing))
+    if missing:
+        rows = {
+            row[0]: row
+            for row in Product.objects.filter(pk__in=missing).values_list(*SNAPSHOT_FIELDS)
+        }
+        cache.set_many(
+            {product_cache_key(pk): row for pk, row in rows.items()},
+            settings.PRODUCT_CACHE_TIMEOUT,
+        )
+        snapshots.update(rows)
+    return {pk: _from_snapshot(values) for pk, values in snapshots.items()}
+
+
+async def aget_products(ids: Iterable) -> Dict[int, Product]:
+    """Async counterpart of ``get_products``."""
+    keys = {product_cache_key(pk): pk for pk in _ids(ids)}
+    if not keys:
+        return {}
+    snapshots = {keys[key]: values for key, values in (await cache.aget_many(keys)).items()}
+    missing = set(keys.values()) - snapshots.keys()
+    _count_lookups(len(snapshots), len(missing))
+    if missing:
+        rows = {
+            row[0]: row
+            async for row in Product.objects.filter(pk__in=missing).values_list(*SNAPSHOT_FIELDS)
+        }
+        await cache.aset_many(
+            {product_cache_key(pk): row for pk, row in rows.items()},
+            settings.PRODUCT_CACHE_TIMEOUT,
+        )
+        snapshots.update(rows)
+    return {pk: _from_snapshot(values) for pk, values in snapshots.items()}
+
+
+def get_product(pk=None, slug=None) -> Optional[Product]:
+    """A product by id or slug, or ``None``."""
+    if slug is None:
+        return get_products([pk]).get(next(iter(_ids([pk])), None))
+
+    pk = cache.get(product_slug_key(slug))
+    if pk is not None:
+        product = get_products([pk]).get(pk)
+        if product is not None and product.slug == slug:
+            return product
+
+    row = Product.objects.filter(slug=slug).values_list(*SNAPSHOT_FIELDS).first()
+    if row is None:
+        return None
+    cache.set_many(
+        {product_cache_key(row[0]): row, product_slug_key(slug): row[0]},
+        settings.PRODUCT_CACHE_TIMEOUT,
+    )
+    return _from_snapshot(row)
+
+
+def get_product_or_404(pk=None, slug=None, active=True) -> Product:
+    product = get_product(pk=pk, slug=slug)
+    if product is None or (active and not product.is_active):
+        raise Http404("No Product matches the given query.")
+    return product
@@ -0,0 +1,130 @@
+"""Incremental catalog change feed behind ``GET /api/products/changes/``.
+
+A client keeps the ``since`` watermark of the last page it read and asks
+for what happened after it. Active products come from the
+``(updated_at, id)`` index, newest write last. Products that were
+deactivated or deleted come from ``ProductTombstone`` in
+``(removed_at, product_id)`` order. Both streams are paged by keyset, so a
+page boundary never skips or repeats a row, however many writes happen
+in between. The watermark holds one position per stream and is signed,
+so clients treat it as opaque.
+
+A product is either active or has a tombstone, never both. Each stream
+reports current state only, so a client applying pages in order ends up
+with the catalog as it is now. Rows younger than
+``CATALOG_CHANGES_SETTLE_SECONDS`` are left for a later page, so that a
+transaction committing late can't slip a timestamp in behind a watermark
+that has already moved past it.
+
+Queryset ``update()`` calls that change what the API shows must set
+``updated_at`` themselves, as the stock updates in ``orders`` do.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from .models import ProductTombstone
+
+SALT = "products.changes"
+
+# (time, id) of the last row a client has seen in a stream, or None before the first
+Position = Optional[Tuple[datetime, int]]
+
+
+class Watermark(NamedTuple):
+    updated: Position
+    removed: Position
+
+
+class ChangePage(NamedTuple):
+    changed: List[int]
+    removed: List[dict]
+    watermark: Watermark
+    has_more: bool
+
+
+def dump_watermark(watermark: Watermark) -> str:
+    return signing.dumps([_dump_position(position) for position in watermark], salt=SALT)
+
+
+def load_watermark(value: str) -> Watermark:
+    """The watermark ``dump_watermark`` returned; ``ValueError`` if it was altered."""
+    try:
+        return Watermark(*map(_load_position, signing.loads(value, salt=SALT)))
+    except (signing.BadSignature, TypeError, ValueError):
+        raise ValueError("Invalid watermark.")
+
+
+def _dump_position(position):
+    return None if position is None else (position[0].isoformat(), position[1])
+
+
+def _load_position(value):
+    return None if value is None else (datetime.fromisoformat(value[0]), value[1])
+
+
+def read_changes(products: QuerySet, watermark: Optional[Watermark], limit: int) -> ChangePage:
+    """Up to ``limit`` changed ids and ``limit`` removals after ``watermark``.
+
+    ``products`` is the set the feed covers (the active products). Without
+    a watermark the feed starts with every product and with removals from
+    now on, since a client syncing from scratch has nothing to remove.
+    """
+    settled = timezone.now() - timedelta(seconds=settings.CATALOG_CHANGES_SETTLE_SECONDS)
+    if watermark is None:
+        watermark = Watermark(None, (settled, 0))
+
+    updated = _after(
+        products.prefetch_related(None).filter(updated_at__lte=settled),
+        "updated_at", "pk", watermark.updated,
+    ).values_list("updated_at", "pk")[:limit + 1]
+    removed = _after(
+        ProductTombstone.objects.filter(removed_at__lte=settled),
+        "removed_at", "product_id", watermark.removed,
+    ).values_list("removed_at", "product_id", "reason")[:limit + 1]
+    updated, removed = list(updated), list(removed)
+
+    has_more = len(updated) > limit or len(removed) > limit
+    updated, removed = updated[:limit], removed[:limit]
+    return ChangePage(
+        changed=[pk for _, pk in updated],
+        removed=[{"id": pk, "reason": reason} for _, pk, reason in removed],
+        watermark=Watermark(
+            updated[-1] if updated else watermark.updated,
+            removed[-1][:2] if removed else watermark.removed,
+        ),
+        has_more=has_more,
+    )
+
+
+def record_activation(active_ids, inactive_ids) -> None:
+    """Take the tombstones of ``active_ids`` away and give ``inactive_ids`` one if they lack it.
+
+    ``products.signals`` calls this on every save; bulk writes that bypass
+    the signals call it themselves.
+    """
+    if active_ids:
+        ProductTombstone.objects.filter(product_id__in=active_ids).delete()
+    if inactive_ids:
+        ProductTombstone.objects.bulk_create(
+            [
+                ProductTombstone(product_id=pk, reason=ProductTombstone.Reason.DEACTIVATED)
+                for pk in inactive_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def _after(queryset, time_field, id_field, position):
+    """``queryset`` rows past ``position`` in ``(time_field, id_field)`` order."""
+    if position is not None:
+        moment, pk = position
+        queryset = queryset.filter(
+            Q(**{f"{time_field}__gt": moment}) | Q(**{time_field: moment, f"{id_field}__gt": pk})
+        )
+    return queryset.order_by(time_field, id_field)
@@ -0,0 +1,237 @@
+"""Streaming catalog import with upsert semantics (``import_catalog``).
+
+Rows arrive one at a time and are written in batches, so memory stays flat
+however large the file is. The importer keeps the category tree and the
+slugs it has handed out, and nothing per product beyond the current batch.
+
+A product is identified by its slug. A row without one gets
+``slugify(name)``, with ``-2``, ``-3`` ... appended when an earlier row of
+the same import already took it. Importing the same file again therefore
+assigns the same slugs and updates the same products. Each batch is one
+``INSERT ... ON CONFLICT (slug) DO UPDATE`` (``bulk_create`` with
+``update_conflicts``), plus one query reading the stored products. An
+existing product only gets the columns the row has, and rows that change
+nothing are skipped, so importing the same file again leaves
+``updated_at`` alone. Nothing goes through ``Product.save``, so the work
+its signals do is done once per batch instead: cache invalidation and
+change-feed tombstones.
+
+Categories are given as a path from the root, ``Hops > Aroma > Pellets``.
+The whole tree is read once up front, and missing categories are created
+parent first.
+"""
+
+from collections import defaultdict
+from functools import partial
+from typing import Dict, Mapping, Optional, Set, Tuple
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from .cache import invalidate_products
+from .changes import record_activation
+from .models import Category, Product
+from .services import clean_price, clean_stock
+
+CATEGORY_SEPARATOR = " > "
+# Every row has these; the optional ones are only written to existing products when not blank
+REQUIRED_FIELDS = ("name", "category", "price")
+OPTIONAL_FIELDS = ("description", "stock", "is_active")
+ATTNAMES = {
+    name: Product._meta.get_field(name).attname for name in REQUIRED_FIELDS + OPTIONAL_FIELDS
+}
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+FALSE_VALUES = {"0", "false", "no", "n", "f"}
+SLUG_LENGTH = Product._meta.get_field("slug").max_length
+CATEGORY_SLUG_LENGTH = Category._meta.get_field("slug").max_length
+
+
+def _is_blank(value) -> bool:
+    """Whether a cell is missing or empty, as blank CSV cells under a full header are."""
+    return value is None or isinstance(value, str) and not value.strip()
+
+
+class RowError(ValueError):
+    """An input row that can't be imported; ``errors`` maps field names to messages."""
+
+    def __init__(self, errors: Dict[str, str]):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class CatalogImporter:
+    """Upsert products row by row, writing every ``batch_size`` rows.
+
+    Call ``add`` for each row and ``finish`` at the end. ``stats`` counts
+    ``created``, ``updated`` and ``unchanged`` products and the
+    ``categories`` created.
+    """
+
+    def __init__(self, batch_size: int = 1000):
+        self.batch_size = batch_size
+        self.batch = []
+        self.slugs: Set[str] = set()
+        self.stats = {"created": 0, "updated": 0, "unchanged": 0, "categories": 0}
+        self._categories: Dict[Tuple[Optional[int], str], int] = {}
+        self._category_slugs: Set[str] = set()
+        for pk, parent_id, name, slug in Category.objects.values_list(
+            "pk", "parent_id", "name", "slug"
+        ).order_by("pk"):
+            self._categories.setdefault((parent_id, name), pk)
+            self._category_slugs.add(slug)
+
+    def add(self, row: Mapping) -> None:
+        """Queue ``row`` (a mapping of column names to values); ``RowError`` if it is invalid."""
+        product = self.clean(row)
+        fields = REQUIRED_FIELDS + tuple(
+            name for name in OPTIONAL_FIELDS if not _is_blank(row.get(name))
+        )
+        self.batch.append((product, fields))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def finish(self) -> None:
+        self.flush()
+
+    def clean(self, row: Mapping) -> Product:
+        if not isinstance(row, Mapping):
+            raise RowError({"row": "Must be an object of column names to values."})
+        errors = {}
+        values = {
+            key: value.strip() if isinstance(value, str) else value for key, value in row.items()
+        }
+
+        name = values.get("name") or ""
+        if not isinstance(name, str) or not name or len(name) > 200:
+            errors["name"] = "Required, at most 200 characters."
+        path = values.get("category") or ""
+        if not isinstance(path, str) or not path.strip(CATEGORY_SEPARATOR):
+            errors["category"] = f"Required, e.g. 'Hops{CATEGORY_SEPARATOR}Aroma'."
+        description = values.get("description") or ""
+        if not isinstance(description, str):
+            errors["description"] = "Must be text."
+
+        price = stock = None
+        try:
+            price = clean_price(values.get("price", ""))
+        except ValueError as exc:
+            errors["price"] = str(exc)
+        try:
+            stock = clean_stock(values.get("stock") or 0)
+        except ValueError as exc:
+            errors["stock"] = str(exc)
+        is_active = values.get("is_active")
+        if is_active in (None, ""):
+            is_active = True
+        elif not isinstance(is_active, bool):
+            is_active = str(is_active).lower()
+            if is_active not in TRUE_VALUES | FALSE_VALUES:
+                errors["is_active"] = "Must be true or false."
+            is_active = is_active in TRUE_VALUES
+
+        slug = values.get("slug")
+        if slug:
+            if not isinstance(slug, str) or slugify(slug) != slug or len(slug) > SLUG_LENGTH:
+                errors["slug"] = f"Must be a slug of at most {SLUG_LENGTH} characters."
+            elif slug in self.slugs:
+                errors["slug"] = "Repeats the slug of an earlier row."
+        elif "name" not in errors:
+            slug = self.unique_slug(slugify(name) or "product", self.slugs, SLUG_LENGTH)
+
+        if errors:
+            raise RowError(errors)
+        self.slugs.add(slug)
+        return Product(
+            name=name,
+            slug=slug,
+            category_id=self.category_id(path),
+            description=description,
+            price=price,
+            stock=stock,
+            is_active=is_active,
+        )
+
+    def category_id(self, path: str) -> int:
+        """Id of the category at ``path``, creating it and any missing ancestors."""
+        parent_id = None
+        for name in (part.strip() for part in path.split(CATEGORY_SEPARATOR)):
+            if not name:
+                continue
+            key = (parent_id, name[:200])
+            if key not in self._categories:
+                slug = self.unique_slug(
+                    slugify(name) or "category", self._category_slugs, CATEGORY_SLUG_LENGTH
+                )
+                self._category_slugs.add(slug)
+                category = Category.objects.create(name=key[1], slug=slug, parent_id=parent_id)
+                self._categories[key] = category.pk
+                self.stats["categories"] += 1
+            parent_id = self._categories[key]
+        return parent_id
+
+    @staticmethod
+    def unique_slug(base: str, taken: Set[str], max_length: int) -> str:
+        """``base`` cut to ``max_length``, with the first free ``-<n>`` suffix if it is taken."""
+        slug = base[:max_length]
+        n = 1
+        while slug in taken:
+            n += 1
+            suffix = f"-{n}"
+            slug = f"{base[:max_length - len(suffix)]}{suffix}"
+        return slug
+
+    def flush(self) -> None:
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        slugs = [product.slug for product, _ in batch]
+        with transaction.atomic():
+            stored = {
+                row["slug"]: row
+                for row in Product.objects.filter(slug__in=slugs).values(
+                    "slug", *ATTNAMES.values()
+                )
+            }
+            # Products to write, grouped by the columns their rows give
+            groups = defaultdict(list)
+            for product, fields in batch:
+                row = stored.get(product.slug)
+                if row is not None and all(
+                    getattr(product, ATTNAMES[name]) == row[ATTNAMES[name]] for name in fields
+                ):
+                    self.stats["unchanged"] += 1
+                    continue
+                groups[fields if row is not None else None].append(product)
+
+            for fields, products in groups.items():
+                Product.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=["slug"],
+                    update_fields=[*(fields or ATTNAMES), "updated_at"],
+                )
+            written = [product for products in groups.values() for product in products]
+            if any(product.pk is None for product in written):
+                # Backends that can't return ids from an upsert
+                ids = dict(
+                    Product.objects.filter(
+                        slug__in=[product.slug for product in written]
+                    ).values_list("slug", "pk")
+                )
+                for product in written:
+                    product.pk = ids[product.slug]
+            # Existing products keep their activation unless the row sets it
+            activated = [
+                product for fields, products in groups.items()
+                if fields is None or "is_active" in fields for product in products
+            ]
+            record_activation(
+                [product.pk for product in activated if product.is_active],
+                [product.pk for product in activated if not product.is_active],
+            )
+            transaction.on_commit(
+                partial(invalidate_products, [product.pk for product in written])
+            )
+        created = len(groups.get(None, ()))
+        self.stats["created"] += created
+        self.stats["updated"] += len(written) - created
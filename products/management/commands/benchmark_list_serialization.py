@@ -0,0 +1,56 @@
+from django.core.management.base import CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from .benchmark_read_path import Command as ReadPathCommand
+
+DEFAULT_PATHS = [
+    "/api/products/",
+    "/api/products/?page=2&expand=",
+    "/api/products/?fields=id,name,price,image",
+]
+MODES = (("drf", False), ("fast", True))
+
+
+class Command(ReadPathCommand):
+    """Compare API list pages rendered by DRF serializers and by the values_list() path.
+
+    Every path is served by Django's real WSGIHandler twice: with
+    ``VALUES_LIST_SERIALIZATION`` off (model instances through the
+    serializer) and on (``config.fast_serialization``). Before timing, the
+    two response bodies are compared and the command fails if they differ.
+    Use ``--threads 1`` (the default) to compare CPU cost per request.
+    """
+
+    help = "Benchmark requests per second of API list endpoints with and without the fast path."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=300, help="Requests per path and mode.")
+        parser.add_argument("--threads", type=int, default=1, help="Worker threads.")
+        parser.add_argument(
+            "--path", action="append", dest="paths", help="Path to request (repeatable)."
+        )
+
+    def handle(self, *args, **options):
+        # Same host as the WSGI runs, and an address of its own for throttling
+        self.client = Client(HTTP_HOST="localhost", REMOTE_ADDR="10.255.255.255")
+        self.stdout.write(
+            f"{'path':<28} {'mode':<5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}"
+        )
+        for path in options["paths"] or DEFAULT_PATHS:
+            results, bodies = {}, {}
+            for mode, enabled in MODES:
+                with override_settings(ROOT_URLCONF="config.urls", VALUES_LIST_SERIALIZATION=enabled):
+                    response = self.client.get(path)
+                    if response.status_code != 200:
+                        raise CommandError(f"{path}: status {response.status_code} in {mode} mode.")
+                    bodies[mode] = response.content
+                    results[mode] = self.run_wsgi(path, options["requests"], options["threads"])
+            if bodies["drf"] != bodies["fast"]:
+                raise CommandError(f"{path}: the fast path changed the response body.")
+            for mode, _ in MODES:
+                self.report(path, mode, results[mode])
+            if results["drf"]["rps"]:
+                self.stdout.write(
+                    f"{'':<28} fast/drf throughput x{results['fast']['rps'] / results['drf']['rps']:.2f}"
+                )
@@ -0,0 +1,165 @@
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+
+from config.loadtest import client_address, percentile
+
+DEFAULT_PATHS = ["/api/products/", "/api/products/?page=2", "/products/", "/api/cart/"]
+
+
+class Command(BaseCommand):
+    """Compare the sync WSGI and async ASGI read paths in-process.
+
+    Requests go through Django's real WSGIHandler (``config.urls``, a fixed
+    pool of worker threads) and ASGIHandler (``config.urls_async``, many
+    concurrent requests on one event loop). ``--db-latency-ms`` adds a delay
+    to every query to simulate a slow database, which is where the async
+    path is expected to pull ahead. Each request uses a distinct client
+    address so throttling does not skew the numbers.
+    """
+
+    help = "Benchmark sync (WSGI) vs async (ASGI) throughput of catalog and cart reads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests per path and mode.")
+        parser.add_argument(
+            "--concurrency", type=int, default=64, help="In-flight requests for the ASGI run."
+        )
+        parser.add_argument(
+            "--wsgi-threads", type=int, default=8, help="Worker threads for the WSGI run."
+        )
+        parser.add_argument(
+            "--db-latency-ms", type=float, default=0.0, help="Artificial delay added to every query."
+        )
+        parser.add_argument(
+            "--path", action="append", dest="paths", help="Path to request (repeatable)."
+        )
+
+    def handle(self, *args, **options):
+        self.latency = options["db_latency_ms"] / 1000
+        if self.latency:
+            for connection in connections.all():
+                self.slow_down(connection=connection)
+            connection_created.connect(self.slow_down)
+
+        self.stdout.write(
+            f"{'path':<28} {'mode':<5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}"
+        )
+        try:
+            for path in options["paths"] or DEFAULT_PATHS:
+                with override_settings(ROOT_URLCONF="config.urls"):
+                    wsgi = self.run_wsgi(path, options["requests"], options["wsgi_threads"])
+                with override_settings(ROOT_URLCONF="config.urls_async"):
+                    asgi = asyncio.run(
+                        self.run_asgi(path, options["requests"], options["concurrency"])
+                    )
+                self.report(path, "wsgi", wsgi)
+                self.report(path, "asgi", asgi)
+                if wsgi["rps"]:
+                    self.stdout.write(f"{'':<28} asgi/wsgi throughput x{asgi['rps'] / wsgi['rps']:.2f}")
+        finally:
+            connection_created.disconnect(self.slow_down)
+
+    def slow_down(self, sender=None, connection=None, **kwargs):
+        def delayed(execute, sql, params, many, context):
+            time.sleep(self.latency)
+            return execute(sql, params, many, context)
+
+        connection.execute_wrappers.append(delayed)
+
+    def run_wsgi(self, path, total, threads):
+        handler = WSGIHandler()
+        url = urlsplit(path)
+
+        def call(index):
+            statuses = []
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": url.path,
+                "QUERY_STRING": url.query,
+                "SERVER_NAME": "localhost",
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "REMOTE_ADDR": client_address(index),
+                "wsgi.input": io.BytesIO(),
+                "wsgi.errors": sys.stderr,
+                "wsgi.url_scheme": "http",
+            }
+            started = time.perf_counter()
+            response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            b"".join(response)
+            response.close()
+            return time.perf_counter() - started, int(statuses[0].split()[0])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(call, range(total)))
+        return self.summarize(results, time.perf_counter() - started)
+
+    async def run_asgi(self, path, total, concurrency):
+        handler = ASGIHandler()
+        url = urlsplit(path)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(index):
+            statuses = []
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": url.path,
+                "raw_path": url.path.encode(),
+                "query_string": url.query.encode(),
+                "root_path": "",
+                "headers": [(b"host", b"localhost")],
+                "client": (client_address(index), 0),
+                "server": ("localhost", 80),
+            }
+            body_sent = False
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await asyncio.Future()  # the client never disconnects
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            async with semaphore:
+                started = time.perf_counter()
+                await handler(scope, receive, send)
+                return time.perf_counter() - started, statuses[0]
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(call(index) for index in range(total)))
+        return self.summarize(results, time.perf_counter() - started)
+
+    def summarize(self, results, elapsed):
+        latencies = sorted(latency for latency, _ in results)
+        return {
+            "rps": len(results) / elapsed if elapsed else 0.0,
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p95": percentile(latencies, 0.95) * 1000,
+            "errors": sum(1 for _, status in results if status >= 400),
+        }
+
+    def report(self, path, mode, stats):
+        self.stdout.write(
+            f"{path:<28} {mode:<5} {stats['rps']:>9.1f} {stats['p50']:>8.1f} "
+            f"{stats['p95']:>8.1f} {stats['errors']:>7}"
+        )
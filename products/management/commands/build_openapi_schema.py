@@ -0,0 +1,44 @@
+import shutil
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from config.schema import RENDERERS, code_version, write_schema
+
+
+class Command(BaseCommand):
+    """Pre-build the OpenAPI schema served at ``/api/schema/``.
+
+    Run once per deploy, before the server starts, so no request pays for
+    schema generation. Schemas of other code versions are removed unless
+    ``--keep-old`` is given.
+    """
+
+    help = "Generate the OpenAPI schema for the current code version."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lang", action="append", default=[],
+            help="Also build this language (repeatable); the default language is always built.",
+        )
+        parser.add_argument(
+            "--keep-old", action="store_true", help="Keep schemas of other code versions."
+        )
+
+    def handle(self, *args, **options):
+        version = code_version()
+        for lang in [None, *options["lang"]]:
+            for fmt in RENDERERS:
+                started = time.perf_counter()
+                path = write_schema(fmt, lang)
+                self.stdout.write(
+                    f"{path} ({path.stat().st_size} bytes, {time.perf_counter() - started:.2f}s)"
+                )
+
+        if not options["keep_old"]:
+            for directory in Path(settings.OPENAPI_SCHEMA_DIR).iterdir():
+                if directory.is_dir() and directory.name != version:
+                    shutil.rmtree(directory)
+        self.stdout.write(self.style.SUCCESS(f"Built the OpenAPI schema for version {version}."))
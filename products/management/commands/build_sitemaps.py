@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.sitemaps import build_sitemaps
+
+
+class Command(BaseCommand):
+    """Refresh the sitemap and product feed files that ``products.sitemaps`` serves."""
+
+    help = "Write the sitemap index, sitemap shards and product feed to SITEMAP_DIR."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rewrite every shard, not just those whose products changed.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stats = build_sitemaps(force=options["force"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {stats['written']} of {stats['shards']} shards "
+                f"({stats['products']} products), removed {stats['removed']} "
+                f"in {time.monotonic() - started:.2f}s."
+            )
+        )
@@ -0,0 +1,113 @@
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importing import CatalogImporter, RowError
+
+
+class Command(BaseCommand):
+    """Create or update products from a CSV or JSON Lines file, streaming it.
+
+    Columns: ``name``, ``category`` (a path such as ``Hops > Aroma``),
+    ``price``, and optionally ``slug``, ``description``, ``stock`` and
+    ``is_active``. Existing products are matched by slug (see
+    ``products.importing``). Rows that fail validation are written with
+    their errors to a JSON Lines error file and skipped.
+    """
+
+    help = "Upsert products from a CSV or JSONL file in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row, or JSON Lines file.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="File format (default: from the file extension).",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per upsert.")
+        parser.add_argument(
+            "--errors",
+            help="Where to write rejected rows (default: <path>.errors.jsonl).",
+        )
+        parser.add_argument(
+            "--progress-every",
+            type=int,
+            default=10000,
+            help="Report progress every this many rows (0 for never).",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0 or options["progress_every"] < 0:
+            raise CommandError("--batch-size must be positive and --progress-every not negative.")
+        path = Path(options["path"])
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        if file_format == "json":
+            file_format = "jsonl"
+        if file_format not in ("csv", "jsonl"):
+            raise CommandError("Can't tell the file format; pass --format csv or --format jsonl.")
+        error_path = Path(options["errors"] or f"{path}.errors.jsonl")
+
+        importer = CatalogImporter(batch_size=options["batch_size"])
+        rows = errors = 0
+        started = time.monotonic()
+        try:
+            with path.open(encoding="utf-8-sig", newline="") as f, error_path.open("w") as error_file:
+                for line, row in self.read(f, file_format):
+                    rows += 1
+                    try:
+                        importer.add(self.parse(row, file_format))
+                    except RowError as exc:
+                        errors += 1
+                        error_file.write(
+                            json.dumps({"line": line, "errors": exc.errors, "row": row}) + "\n"
+                        )
+                    if options["progress_every"] and rows % options["progress_every"] == 0:
+                        self.progress(rows, errors, started)
+                importer.finish()
+        except (OSError, UnicodeDecodeError, csv.Error) as exc:
+            raise CommandError(f"Can't read {path}: {exc}")
+        if not errors:
+            error_path.unlink()
+
+        stats = importer.stats
+        elapsed = time.monotonic() - started
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Read {rows} rows: created {stats['created']} products, updated {stats['updated']}, "
+                f"unchanged {stats['unchanged']}, created {stats['categories']} categories, "
+                f"rejected {errors} "
+                f"in {elapsed:.2f}s ({rate:.0f} rows/s)."
+            )
+        )
+        if errors:
+            self.stdout.write(f"Rejected rows were written to {error_path}.")
+
+    def read(self, f, file_format):
+        """``(line number, row)`` pairs, one row in memory at a time.
+
+        CSV rows are dicts; JSON Lines rows are left as text for ``parse``.
+        """
+        if file_format == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line, text in enumerate(f, 1):
+            if text.strip():
+                yield line, text.rstrip("\n")
+
+    def parse(self, row, file_format):
+        if file_format == "csv":
+            return row
+        try:
+            return json.loads(row)
+        except json.JSONDecodeError as exc:
+            raise RowError({"row": f"Invalid JSON: {exc}"})
+
+    def progress(self, rows, errors, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"  {rows} rows, {errors} rejected, {rows / elapsed:.0f} rows/s")
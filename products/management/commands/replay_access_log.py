@@ -0,0 +1,312 @@
+import io
+import json
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import Resolver404, resolve
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from config.instrumentation import QueryRecorder
+from config.loadtest import client_address, percentile
+
+# Any 32 alphanumerics form a valid CSRF secret; sent as both cookie and header
+CSRF_TOKEN = "replayreplayreplayreplayreplay00"
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class Command(BaseCommand):
+    """Replay a JSONL request log and report per-route latency.
+
+    Each log line is an object with ``path`` and optionally ``method``
+    (default GET), ``query`` (string or object), ``body`` (object sent as
+    JSON, or a form-encoded string), ``user`` (username) and ``ip``.
+    Requests from a user are authenticated with a JWT on ``/api/`` paths and
+    a session cookie elsewhere. All requests come from one client address
+    unless ``--client-addresses`` is given: then each line is sent from its
+    ``ip``, or from an address of its own, so per-client rate limits don't
+    skew the run. In-process transports set ``REMOTE_ADDR``; ``http`` can
+    only send ``X-Forwarded-For``, which the server honours when its
+    ``NUM_PROXIES`` trusts it.
+
+    ``--transport`` picks how requests reach the app: ``wsgi`` calls
+    Django's WSGIHandler in-process, ``client`` uses the test client, and
+    ``http`` sends real requests to ``--url``. In-process transports count
+    SQL queries directly. ``http`` reads them from the ``Server-Timing``
+    header, so the server needs ``SQL_INSTRUMENTATION_SAMPLE_RATE=1``.
+    """
+
+    help = "Replay a JSONL access log and report per-route throughput, latency and errors."
+
+    def add_arguments(self, parser):
+        parser.add_argument("log", help="JSONL request log.")
+        parser.add_argument(
+            "--transport", choices=["wsgi", "client", "http"], default="wsgi",
+            help="How requests reach the app.",
+        )
+        parser.add_argument(
+            "--url", default="http://127.0.0.1:8000", help="Server for --transport=http."
+        )
+        parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight.")
+        parser.add_argument("--limit", type=int, help="Replay only the first N log lines.")
+        parser.add_argument("--timeout", type=float, default=30.0, help="HTTP timeout in seconds.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--compare", help="Results JSON of a previous run to diff against.")
+        parser.add_argument(
+            "--client-addresses", action="store_true",
+            help="Send each line from its ip, or a distinct address, instead of one client.",
+        )
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be positive.")
+        entries = self.load(options["log"], options["limit"])
+        if not entries:
+            raise CommandError("The log contains no requests.")
+        previous = None
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                previous = json.load(f)
+
+        self.options = options
+        self.credentials = self.authenticate({entry["user"] for entry in entries if entry["user"]})
+        self.local = threading.local()
+        self.wsgi_handler = WSGIHandler() if options["transport"] == "wsgi" else None
+
+        started = time.perf_counter()
+        if options["concurrency"] == 1:
+            results = [self.replay(index, entry) for index, entry in enumerate(entries)]
+        else:
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+                results = list(pool.map(self.replay, range(len(entries)), entries))
+        elapsed = time.perf_counter() - started
+
+        summary = self.summarize(results, elapsed)
+        self.report(summary, previous)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(summary, f, indent=2)
+
+    def load(self, path, limit):
+        entries = []
+        with open(path) as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    if not entry["path"].startswith("/"):
+                        raise ValueError("path must start with /")
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    raise CommandError(f"{path}:{number}: invalid log line ({e}).")
+                entry.setdefault("user", None)
+                entries.append(entry)
+                if limit and len(entries) >= limit:
+                    break
+        return entries
+
+    def authenticate(self, usernames):
+        """JWT and session cookie per replayed user; unknown users stay anonymous."""
+        credentials = {}
+        for user in get_user_model().objects.filter(username__in=usernames):
+            client = Client()
+            client.force_login(user)
+            credentials[user.username] = {
+                "access": str(RefreshToken.for_user(user).access_token),
+                "session": client.cookies[settings.SESSION_COOKIE_NAME].value,
+            }
+        missing = usernames - credentials.keys()
+        if missing:
+            self.stderr.write(f"Replaying {len(missing)} unknown user(s) as anonymous.")
+        return credentials
+
+    def build(self, index, entry):
+        method = entry.get("method", "GET").upper()
+        query = entry.get("query") or ""
+        if isinstance(query, dict):
+            query = urlencode(query, doseq=True)
+        body = entry.get("body")
+        content_type = None
+        if isinstance(body, (dict, list)):
+            body, content_type = json.dumps(body).encode(), "application/json"
+        elif body is not None:
+            body, content_type = str(body).encode(), "application/x-www-form-urlencoded"
+
+        headers = {"X-CSRFToken": CSRF_TOKEN}
+        address = None
+        if self.options["client_addresses"]:
+            address = entry.get("ip") or client_address(index)
+        cookies = {settings.CSRF_COOKIE_NAME: CSRF_TOKEN}
+        credentials = self.credentials.get(entry["user"])
+        if credentials and entry["path"].startswith("/api/"):
+            headers["Authorization"] = f"Bearer {credentials['access']}"
+        elif credentials:
+            cookies[settings.SESSION_COOKIE_NAME] = credentials["session"]
+        headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in cookies.items())
+        return method, entry["path"], query, body or b"", content_type, headers, address
+
+    def replay(self, index, entry):
+        request = self.build(index, entry)
+        method, path = request[:2]
+        try:
+            match = resolve(path)
+            route = f"{method} {match.view_name or match.route}"
+        except Resolver404:
+            route = f"{method} (unresolved)"
+
+        send = getattr(self, f"send_{self.options['transport']}")
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        try:
+            if self.options["transport"] == "http":
+                status, queries = send(*request)
+            else:
+                with ExitStack() as stack:
+                    for connection in connections.all():
+                        stack.enter_context(connection.execute_wrapper(recorder))
+                    status = send(*request)
+                queries = recorder.count
+        except Exception as e:  # a crashed request is an error, not the end of the run
+            self.stderr.write(f"{method} {path}: {e!r}")
+            status, queries = 0, None
+        return route, time.perf_counter() - started, status, queries
+
+    def send_wsgi(self, method, path, query, body, content_type, headers, address):
+        environ = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": address or "127.0.0.1",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http",
+        }
+        if content_type:
+            environ["CONTENT_TYPE"] = content_type
+        for name, value in headers.items():
+            environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+        statuses = []
+        response = self.wsgi_handler(
+            environ, lambda status, response_headers, exc_info=None: statuses.append(status)
+        )
+        b"".join(response)
+        response.close()
+        return int(statuses[0].split()[0])
+
+    def send_client(self, method, path, query, body, content_type, headers, address):
+        if not hasattr(self.local, "client"):
+            # Same host as the WSGI transport: "testserver" is only allowed under the test runner
+            self.local.client = Client(HTTP_HOST="localhost")
+        extra = {f"HTTP_{name.upper().replace('-', '_')}": value for name, value in headers.items()}
+        if address:
+            extra["REMOTE_ADDR"] = address
+        response = self.local.client.generic(
+            method,
+            f"{path}?{query}" if query else path,
+            data=body,
+            content_type=content_type or "application/octet-stream",
+            **extra,
+        )
+        return response.status_code
+
+    def send_http(self, method, path, query, body, content_type, headers, address):
+        url = self.options["url"].rstrip("/") + path + (f"?{query}" if query else "")
+        if address:
+            headers = {**headers, "X-Forwarded-For": address}
+        request = urllib.request.Request(url, data=body or None, headers=headers, method=method)
+        if content_type:
+            request.add_header("Content-Type", content_type)
+        try:
+            with urllib.request.urlopen(request, timeout=self.options["timeout"]) as response:
+                response.read()
+                status, timing = response.status, response.headers.get("Server-Timing", "")
+        except urllib.error.HTTPError as e:
+            status, timing = e.code, e.headers.get("Server-Timing", "")
+        match = SERVER_TIMING_QUERIES.search(timing)
+        return status, int(match.group(1)) if match else None
+
+    def summarize(self, results, elapsed):
+        by_route = defaultdict(list)
+        for route, latency, status, queries in results:
+            by_route[route].append((latency, status, queries))
+        by_route["TOTAL"] = [(latency, status, queries) for _, latency, status, queries in results]
+
+        routes = {}
+        for route, rows in by_route.items():
+            latencies = sorted(latency * 1000 for latency, _, _ in rows)
+            queries = [count for _, _, count in rows if count is not None]
+            errors = sum(1 for _, status, _ in rows if status >= 500 or status == 0)
+            routes[route] = {
+                "requests": len(rows),
+                "rps": round(len(rows) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(latencies, 0.50), 2),
+                "p95_ms": round(percentile(latencies, 0.95), 2),
+                "p99_ms": round(percentile(latencies, 0.99), 2),
+                "client_errors": sum(1 for _, status, _ in rows if 400 <= status < 500),
+                "errors": errors,
+                "error_rate": round(errors / len(rows), 4),
+                "queries": round(sum(queries) / len(queries), 1) if queries else None,
+            }
+        return {
+            "transport": self.options["transport"],
+            "elapsed": round(elapsed, 3),
+            "routes": routes,
+        }
+
+    def report(self, summary, previous):
+        before = (previous or {}).get("routes", {})
+        header = (
+            f"{'route':<40} {'reqs':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'4xx':>5} {'err%':>6} {'queries':>7}"
+        )
+        if previous:
+            header += f" {'Δp95':>8} {'Δreq/s':>8} {'Δqueries':>8}"
+        self.stdout.write(header)
+
+        ordered = sorted(
+            summary["routes"].items(), key=lambda item: (item[0] == "TOTAL", -item[1]["requests"])
+        )
+        for route, stats in ordered:
+            queries = "-" if stats["queries"] is None else f"{stats['queries']:.1f}"
+            line = (
+                f"{route[:40]:<40} {stats['requests']:>6} {stats['rps']:>8.1f} "
+                f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} "
+                f"{stats['client_errors']:>5} {stats['error_rate'] * 100:>6.1f} {queries:>7}"
+            )
+            if previous:
+                line += " " + self.diff(stats, before.get(route))
+            self.stdout.write(line)
+        total = summary["routes"]["TOTAL"]["requests"]
+        self.stdout.write(f"Replayed {total} requests in {summary['elapsed']:.2f}s.")
+
+    def diff(self, stats, old):
+        if not old:
+            return f"{'new':>8}"
+
+        def change(key):
+            if not old[key]:
+                return f"{'-':>8}"
+            return f"{(stats[key] - old[key]) / old[key] * 100:>+7.1f}%"
+
+        if stats["queries"] is None or old["queries"] is None:
+            queries = f"{'-':>8}"
+        else:
+            queries = f"{stats['queries'] - old['queries']:>+8.1f}"
+        return f"{change('p95_ms')} {change('rps')} {queries}"
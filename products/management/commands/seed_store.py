@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from products.models import Category, Product
+from products.seeding import USERNAME_PREFIX, seed_store
+
+
+class Command(BaseCommand):
+    """Fill an empty database with a production-sized synthetic store.
+
+    The output is fully determined by ``--seed`` and the size options.
+    Categories form a three-level tree, product images reuse the files in
+    ``media/products``, order statuses follow order age, and reviews are
+    only written by shoppers who bought the product (one per product).
+    """
+
+    help = "Generate deterministic synthetic categories, products, users, orders and reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="RNG seed.")
+        parser.add_argument("--categories", type=int, default=200, help="Number of categories.")
+        parser.add_argument("--products", type=int, default=5000, help="Number of products.")
+        parser.add_argument("--users", type=int, default=2000, help="Number of shoppers.")
+        parser.add_argument("--orders", type=int, default=20000, help="Number of orders.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per INSERT.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processes generating orders and reviews (needs a server database).",
+        )
+
+    def handle(self, *args, **options):
+        for name in ("categories", "products", "users", "orders", "batch_size", "workers"):
+            if options[name] < (0 if name in ("users", "orders") else 1):
+                raise CommandError(f"--{name.replace('_', '-')} is out of range.")
+        if options["workers"] > 1 and connection.vendor == "sqlite":
+            raise CommandError("--workers above 1 needs a database that allows concurrent writers.")
+        if (
+            Category.objects.exists()
+            or Product.objects.exists()
+            or get_user_model().objects.filter(username__startswith=USERNAME_PREFIX).exists()
+        ):
+            raise CommandError("seed_store expects an empty catalog and no seeded shoppers.")
+
+        def progress(table, rows):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {table}: +{rows}")
+
+        stats = seed_store(
+            seed=options["seed"],
+            categories=options["categories"],
+            products=options["products"],
+            users=options["users"],
+            orders=options["orders"],
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            progress=progress,
+        )
+
+        for table in ("categories", "products", "users", "orders", "order_items", "reviews"):
+            self.stdout.write(f"{table:<12} {stats[table]:>9}")
+        rate = stats["rows"] / stats["elapsed"] if stats["elapsed"] else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {stats['rows']} rows in {stats['elapsed']:.2f}s ({rate:.0f} rows/s)."
+            )
+        )
@@ -0,0 +1,60 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.services import INVALID, NOT_FOUND, update_inventory
+
+
+class Command(BaseCommand):
+    """Apply a warehouse stock/price file, as ``POST /api/products/inventory/`` does."""
+
+    help = "Bulk-update product stock and price from a CSV or JSON file of slug, stock, price."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row, or a JSON list of objects.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "json"],
+            help="File format (default: from the file extension).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows read and written per statement.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be positive.")
+        path = Path(options["path"])
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        if file_format not in ("csv", "json"):
+            raise CommandError("Can't tell the file format; pass --format csv or --format json.")
+
+        try:
+            with path.open(encoding="utf-8-sig", newline="") as f:
+                rows = list(csv.DictReader(f)) if file_format == "csv" else json.load(f)
+        except (OSError, UnicodeDecodeError, csv.Error, json.JSONDecodeError) as exc:
+            raise CommandError(f"Can't read {path}: {exc}")
+        if not isinstance(rows, list):
+            raise CommandError("A JSON file must hold a list of rows.")
+
+        report = update_inventory(rows, batch_size=options["batch_size"])
+        for result in report["results"]:
+            if result["status"] == INVALID:
+                errors = "; ".join(f"{name}: {error}" for name, error in result["errors"].items())
+                self.stderr.write(f"Row {result['row']}: {errors}")
+            elif result["status"] == NOT_FOUND:
+                self.stderr.write(f"Row {result['row']}: no product with slug {result['slug']!r}")
+
+        rate = len(rows) / report["elapsed"] if report["elapsed"] else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Updated {report['updated']} products, {report['unchanged']} unchanged, "
+                f"{report['not_found']} not found, {report['invalid']} invalid "
+                f"in {report['elapsed']:.2f}s ({rate:.0f} rows/s)."
+            )
+        )
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.1 on 2026-10-19 03:11
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+    aggregates = (
+        Review.objects.values('product_id')
+        .annotate(count=Count('id'), total=Sum('rating'))
+        .order_by()
+    )
+    for row in aggregates.iterator():
+        Product.objects.filter(pk=row['product_id']).update(
+            rating_count=row['count'], rating_sum=row['total']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_alter_product_options_product_created_at_and_more'),
+        ('reviews', '0002_alter_review_options_alter_review_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-19 03:11
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rating_distribution(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+    counts = (
+        Review.objects.values('product_id', 'rating')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for row in counts.iterator():
+        if 1 <= row['rating'] <= 5:
+            Product.objects.filter(pk=row['product_id']).update(
+                **{f"rating_{row['rating']}": row['count']}
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_rating_aggregates'),
+        ('reviews', '0002_alter_review_options_alter_review_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_distribution, migrations.RunPython.noop),
+    ]
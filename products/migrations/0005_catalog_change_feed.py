@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:23
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_rating_distribution'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField(unique=True)),
+                ('reason', models.CharField(choices=[('deactivated', 'Deactivated'), ('deleted', 'Deleted')], max_length=20)),
+                ('removed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at', 'id'], name='products_pr_updated_e6e93b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producttombstone',
+            index=models.Index(fields=['removed_at', 'product_id'], name='products_pr_removed_790f2b_idx'),
+        ),
+    ]
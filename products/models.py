@@ -1,5 +1,4 @@
 from django.db import models
-from django.db.models import Avg
 from django.utils import timezone
 from django.utils.text import slugify
 
@@ -34,9 +33,19 @@ class Product(models.Model):
     image = models.ImageField(upload_to="products/", blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized review aggregates, maintained by reviews.services
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
+        # Keyset paging of the change feed (products.changes)
+        indexes = [models.Index(fields=["updated_at", "id"])]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -48,8 +57,32 @@ class Product(models.Model):
 
     @property
     def average_rating(self):
-        """Calculate the average rating from all reviews."""
-        reviews = self.reviews.all()
-        if reviews.exists():
-            return round(reviews.aggregate(Avg("rating"))["rating__avg"], 2)
-        return 0
+        """Average review rating, from the denormalized rating counters."""
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else 0
+
+    @property
+    def rating_distribution(self):
+        """Review counts per star, from five stars down to one."""
+        return {stars: getattr(self, f"rating_{stars}") for stars in range(5, 0, -1)}
+
+
+class ProductTombstone(models.Model):
+    """A product that left the catalog, reported by the change feed (``products.changes``).
+
+    Kept in step with the product by ``products.signals``: created when it is
+    deactivated or deleted, removed again when it is reactivated.
+    """
+
+    class Reason(models.TextChoices):
+        DEACTIVATED = "deactivated", "Deactivated"
+        DELETED = "deleted", "Deleted"
+
+    product_id = models.BigIntegerField(unique=True)
+    reason = models.CharField(max_length=20, choices=Reason.choices)
+    removed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["removed_at", "product_id"])]
+
+    def __str__(self):
+        return f"Product {self.product_id} ({self.reason})"
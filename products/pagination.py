@@ -0,0 +1,29 @@
+from django.core.paginator import Paginator
+from rest_framework.pagination import CursorPagination
+
+
+class ReviewCursorPagination(CursorPagination):
+    """Newest-first cursor pagination over ``(created_at, id)``."""
+
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+async def apaginate(queryset, per_page, number):
+    """Async counterpart of ``Paginator(queryset, per_page).page(number)``.
+
+    Counts with ``acount()`` and streams the page with ``aiterator()``, so no
+    query runs on the event loop thread. ``number`` may be ``"last"``.
+    Raises ``InvalidPage`` like ``Paginator.page``.
+    """
+    paginator = Paginator(queryset, per_page)
+    paginator.count = await queryset.acount()  # pre-fill the cached property
+    if number == "last":
+        number = paginator.num_pages
+    number = paginator.validate_number(number)
+    bottom = (number - 1) * per_page
+    top = min(bottom + per_page, paginator.count)
+    items = [obj async for obj in queryset[bottom:top].aiterator(chunk_size=per_page)]
+    return paginator._get_page(items, number, paginator)
@@ -0,0 +1,356 @@
+"""Deterministic synthetic store data for profiling and benchmarks.
+
+The same seed and sizes always produce the same rows, so before/after
+measurements compare like with like. The catalog and users are created in
+the calling process. Orders, order items and reviews are generated in
+fixed chunks that each own a disjoint slice of users, so review uniqueness
+per (product, user) never spans chunks. Each chunk has its own RNG, which
+lets chunks run in any number of worker processes and still produce the
+same data.
+"""
+
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from multiprocessing import get_context
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from orders.models import Order, OrderItem
+from reviews.models import Review
+from reviews.services import PURCHASED_STATUSES, recompute_rating_stats
+
+from .models import Category, Product
+
+PASSWORD = "seed-store-pass"
+USERNAME_PREFIX = "shopper"
+ORDERS_PER_CHUNK = 2000
+
+ROOT_CATEGORIES = ["Hops", "Malt", "Yeast", "Kits", "Equipment", "Adjuncts", "Water", "Books"]
+SUBCATEGORY_WORDS = [
+    "Bittering", "Aroma", "Dual Purpose", "Base", "Specialty", "Crystal", "Roasted", "Ale",
+    "Lager", "Wild", "Starter", "Advanced", "Fermentation", "Bottling", "Cleaning", "Organic",
+]
+PRODUCT_WORDS = [
+    "Classic", "Fresh", "Premium", "Whole Leaf", "Pellet", "Craft", "Estate", "Reserve",
+]
+REVIEW_TEXTS = {
+    1: "Not what I expected, would not buy again.",
+    2: "Below average quality for the price.",
+    3: "Does the job, nothing special.",
+    4: "Good quality, brewed a solid batch with it.",
+    5: "Excellent, my best brew so far!",
+}
+RATING_WEIGHTS = (4, 5, 12, 34, 45)
+REVIEW_PROBABILITY = 0.35
+HISTORY_DAYS = 365
+
+
+def product_images() -> List[str]:
+    """Product image paths (relative to MEDIA_ROOT) that exist on disk."""
+    directory = settings.MEDIA_ROOT / "products"
+    if not directory.is_dir():
+        return []
+    return sorted(f"products/{name}" for name in os.listdir(directory) if not name.startswith("."))
+
+
+def image_title(image: str) -> str:
+    """``products/cascade-hops.jpg`` -> ``Cascade Hops``."""
+    return os.path.splitext(os.path.basename(image))[0].replace("-", " ").title()
+
+
+def order_status(rng: random.Random, age_days: float) -> str:
+    """A status consistent with how long ago the order was placed."""
+    if rng.random() < 0.06:
+        return Order.Status.CANCELLED
+    if age_days < 1:
+        return rng.choice([Order.Status.PENDING, Order.Status.PAID])
+    if age_days < 4:
+        return rng.choice([Order.Status.PAID, Order.Status.SHIPPED])
+    if age_days < 8:
+        return rng.choice([Order.Status.SHIPPED, Order.Status.DELIVERED])
+    return Order.Status.DELIVERED
+
+
+def seed_catalog(
+    rng: random.Random, n_categories: int, n_products: int, batch_size: int
+) -> Tuple[List[Category], List[Product]]:
+    """Create a three-level category tree and products spread across it."""
+    roots = Category.objects.bulk_create(
+        Category(name=name, slug=f"{slugify(name)}-{i}")
+        for i, name in enumerate(ROOT_CATEGORIES[: max(1, n_categories)])
+    )
+    categories = list(roots)
+    parents = roots
+    remaining = n_categories - len(roots)
+    # Roughly a quarter of the remaining categories on level two, the rest on level three
+    for level_size in (math.ceil(remaining / 4), remaining - math.ceil(remaining / 4)):
+        level = []
+        for _ in range(level_size):
+            parent = rng.choice(parents)
+            name = f"{rng.choice(SUBCATEGORY_WORDS)} {parent.name.split(' / ')[-1]}"
+            index = len(categories) + len(level)
+            level.append(
+                Category(
+                    name=f"{parent.name} / {name}"[:200],
+                    slug=f"c{index}-{slugify(name)}"[:50],
+                    parent=parent,
+                )
+            )
+        if not level:
+            break
+        level = Category.objects.bulk_create(level, batch_size=batch_size)
+        categories.extend(level)
+        parents = level
+
+    images = product_images()
+    now = timezone.now()
+    products = []
+    for i in range(n_products):
+        image = rng.choice(images) if images else None
+        title = image_title(image) if image else rng.choice(ROOT_CATEGORIES)
+        name = f"{rng.choice(PRODUCT_WORDS)} {title} {i}"
+        products.append(
+            Product(
+                name=name,
+                slug=slugify(name)[:50],
+                category=rng.choice(categories),
+                description=f"{name}: brewing supplies for home and craft brewers. " * 3,
+                price=Decimal(rng.randint(199, 9999)) / 100,
+                stock=0 if rng.random() < 0.08 else rng.randint(1, 1000),
+                is_active=rng.random() > 0.05,
+                image=image,
+                created_at=now - timedelta(days=rng.uniform(0, HISTORY_DAYS * 2)),
+            )
+        )
+    products = Product.objects.bulk_create(products, batch_size=batch_size)
+    return categories, products
+
+
+def seed_users(n_users: int, batch_size: int) -> List[int]:
+    """Create shoppers sharing one precomputed password hash; return their ids."""
+    User = get_user_model()
+    password = make_password(PASSWORD)
+    users = User.objects.bulk_create(
+        (
+            User(
+                username=f"{USERNAME_PREFIX}{i}",
+                email=f"{USERNAME_PREFIX}{i}@example.com",
+                password=password,
+                phone=f"+1555{i:07d}",
+            )
+            for i in range(n_users)
+        ),
+        batch_size=batch_size,
+    )
+    return [user.pk for user in users]
+
+
+def backdate(model, rows: Sequence[Tuple[int, object]], fields: Sequence[str]) -> None:
+    """Set the timestamp ``fields`` of ``model`` rows from ``(pk, datetime)`` pairs.
+
+    ``auto_now_add`` overwrites timestamps on insert, and ``bulk_update``
+    compiles a CASE branch per row, so history is written with a single
+    parameterized ``executemany`` instead.
+    """
+    connection = connections[model.objects.db]
+    quote = connection.ops.quote_name
+    assignments = ", ".join(f"{quote(model._meta.get_field(name).column)} = %s" for name in fields)
+    sql = (
+        f"UPDATE {quote(model._meta.db_table)} SET {assignments} "
+        f"WHERE {quote(model._meta.pk.column)} = %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            sql,
+            [
+                [connection.ops.adapt_datetimefield_value(value)] * len(fields) + [pk]
+                for pk, value in rows
+            ],
+        )
+
+
+@transaction.atomic
+def seed_orders_chunk(
+    seed: int,
+    chunk: int,
+    n_orders: int,
+    user_ids: Sequence[int],
+    products: Sequence[Tuple[int, str]],
+    batch_size: int,
+) -> Dict[str, int]:
+    """Create one chunk of orders, their items and reviews.
+
+    Args:
+        seed: Global seed; the chunk RNG is derived from it and ``chunk``.
+        chunk: Chunk index.
+        n_orders: Orders to create in this chunk.
+        user_ids: Users owned by this chunk (no other chunk orders for them).
+        products: ``(id, price)`` pairs to order from.
+        batch_size: Rows per INSERT.
+
+    Returns:
+        Dict with created order, order item and review counts.
+    """
+    rng = random.Random(f"{seed}:{chunk}")
+    now = timezone.now()
+
+    orders, order_lines, placed = [], [], []
+    for _ in range(n_orders):
+        age_days = rng.expovariate(1 / 60) if rng.random() < 0.9 else rng.uniform(0, HISTORY_DAYS)
+        age_days = min(age_days, HISTORY_DAYS)
+        lines = [
+            (product_id, Decimal(price), rng.choices((1, 2, 3, 4, 6), (50, 25, 12, 8, 5))[0])
+            for product_id, price in rng.sample(products, min(len(products), rng.randint(1, 5)))
+        ]
+        orders.append(
+            Order(
+                user_id=rng.choice(user_ids),
+                full_name="Seed Shopper",
+                phone="+15550000000",
+                city=rng.choice(["Portland", "Denver", "Austin", "Asheville", "San Diego"]),
+                address=f"{rng.randint(1, 9999)} Brewery Row",
+                status=order_status(rng, age_days),
+                total_price=sum(price * quantity for _, price, quantity in lines),
+            )
+        )
+        order_lines.append(lines)
+        placed.append(now - timedelta(days=age_days))
+
+    orders = Order.objects.bulk_create(orders, batch_size=batch_size)
+    for order, created_at in zip(orders, placed):
+        order.created_at = order.updated_at = created_at
+    backdate(
+        Order, [(order.pk, order.created_at) for order in orders], ["created_at", "updated_at"]
+    )
+
+    items, reviews, reviewed = [], [], set()
+    for order, lines in zip(orders, order_lines):
+        for product_id, price, quantity in lines:
+            items.append(
+                OrderItem(order=order, product_id=product_id, quantity=quantity, price=price)
+            )
+            key = (product_id, order.user_id)
+            if (
+                order.status in PURCHASED_STATUSES
+                and key not in reviewed
+                and rng.random() < REVIEW_PROBABILITY
+            ):
+                reviewed.add(key)
+                rating = rng.choices(range(1, 6), RATING_WEIGHTS)[0]
+                reviews.append(
+                    Review(
+                        product_id=product_id,
+                        user_id=order.user_id,
+                        rating=rating,
+                        text=REVIEW_TEXTS[rating],
+                        created_at=min(now, order.created_at + timedelta(days=rng.uniform(3, 30))),
+                    )
+                )
+    OrderItem.objects.bulk_create(items, batch_size=batch_size)
+
+    written = [review.created_at for review in reviews]
+    reviews = Review.objects.bulk_create(reviews, batch_size=batch_size)
+    backdate(Review, [(review.pk, when) for review, when in zip(reviews, written)], ["created_at"])
+
+    return {"orders": len(orders), "order_items": len(items), "reviews": len(reviews)}
+
+
+def _setup_worker(settings_module: str) -> None:
+    """Initializer for spawned worker processes."""
+    import django
+
+    os.environ["DJANGO_SETTINGS_MODULE"] = settings_module
+    django.setup()
+
+
+def seed_store(
+    seed: int = 0,
+    categories: int = 200,
+    products: int = 5000,
+    users: int = 2000,
+    orders: int = 20000,
+    batch_size: int = 1000,
+    workers: int = 1,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> Dict[str, float]:
+    """Fill an empty store with deterministic synthetic data.
+
+    Args:
+        seed: RNG seed; the same seed and sizes produce the same data.
+        categories: Number of categories (three-level tree).
+        products: Number of products.
+        users: Number of shoppers.
+        orders: Number of orders (1-5 items each).
+        batch_size: Rows per INSERT.
+        workers: Processes generating order chunks. Above 1 every worker
+            opens its own connection, so this needs a server database.
+        progress: Optional ``callback(table, rows)`` called as tables fill.
+
+    Returns:
+        Dict with row counts per table, total ``rows`` and ``elapsed`` seconds.
+    """
+    started = time.monotonic()
+    report = progress or (lambda table, rows: None)
+    rng = random.Random(seed)
+
+    category_objs, product_objs = seed_catalog(rng, categories, products, batch_size)
+    report("categories", len(category_objs))
+    report("products", len(product_objs))
+    user_ids = seed_users(users, batch_size)
+    report("users", len(user_ids))
+
+    stats = {
+        "categories": len(category_objs),
+        "products": len(product_objs),
+        "users": len(user_ids),
+        "orders": 0,
+        "order_items": 0,
+        "reviews": 0,
+    }
+
+    if orders and user_ids and product_objs:
+        product_prices = [(product.pk, str(product.price)) for product in product_objs]
+        n_chunks = min(math.ceil(orders / ORDERS_PER_CHUNK), len(user_ids))
+        jobs = []
+        for chunk in range(n_chunks):
+            first, last = chunk * len(user_ids) // n_chunks, (chunk + 1) * len(user_ids) // n_chunks
+            chunk_orders = orders * (chunk + 1) // n_chunks - orders * chunk // n_chunks
+            jobs.append(
+                (seed, chunk, chunk_orders, user_ids[first:last], product_prices, batch_size)
+            )
+
+        if workers > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),
+                initializer=_setup_worker,
+                initargs=(os.environ["DJANGO_SETTINGS_MODULE"],),
+            ) as executor:
+                results = executor.map(seed_orders_chunk, *zip(*jobs))
+                for result in results:
+                    for table, rows in result.items():
+                        stats[table] += rows
+                        report(table, rows)
+        else:
+            for job in jobs:
+                for table, rows in seed_orders_chunk(*job).items():
+                    stats[table] += rows
+                    report(table, rows)
+
+    recompute_rating_stats(batch_size=batch_size)
+
+    stats["rows"] = sum(stats.values())
+    stats["elapsed"] = time.monotonic() - started
+    return stats
@@ -1,17 +1,69 @@
 from rest_framework import serializers
 
+from config.fast_serialization import Column
 from reviews.models import Review
 
 from .models import Category, Product
 
 
+class SparseFieldsMixin:
+    """Keep only the serializer fields listed in the ``fields`` context entry.
+
+    Unknown names are ignored; if none of the requested names exist the
+    full representation is returned.
+
+    Relations in ``expandable_fields`` are nested only when named in the
+    ``expand`` context entry. Without an ``expand`` entry every relation
+    stays nested. A relation that is not expanded is rendered by the field
+    class mapped to it, or left out when that is ``None``.
+    """
+
+    expandable_fields = {}
+    # Model columns read by fields whose source is not a model field
+    field_columns = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = set(self.context.get('fields') or ())
+        if requested & set(self.fields):
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+        expand = self.context.get('expand')
+        if expand is not None:
+            for name in (set(self.expandable_fields) & set(self.fields)) - set(expand):
+                collapsed = self.expandable_fields[name]
+                if collapsed is None:
+                    self.fields.pop(name)
+                else:
+                    self.fields[name] = collapsed(read_only=True)
+
+    def model_columns(self):
+        """Concrete model fields the remaining serializer fields read, for ``only()``."""
+        model_fields = {
+            field.name for field in self.Meta.model._meta.concrete_fields
+        }
+        columns = {self.Meta.model._meta.pk.name}
+        for name, field in self.fields.items():
+            columns.update(self.field_columns.get(name, ()))
+            source = field.source.split('.')[0]
+            if source in model_fields:
+                columns.add(source)
+        return sorted(columns)
+
+    def is_expanded(self, name):
+        """Whether relation ``name`` is rendered nested."""
+        expand = self.context.get('expand')
+        return name in self.fields and (expand is None or name in expand)
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username')
 
     class Meta:
@@ -19,15 +71,37 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'rating', 'text', 'created_at']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'category': serializers.PrimaryKeyRelatedField, 'reviews': None}
+    field_columns = {
+        'average_rating': ['rating_sum', 'rating_count'],
+        'rating_distribution': [f'rating_{stars}' for stars in range(1, 6)],
+    }
+    # Model properties, computed from the denormalized rating counters
+    values_fields = {
+        'average_rating': Column(
+            'rating_sum', 'rating_count',
+            convert=lambda total, count: round(total / count, 2) if count else 0.0,
+        ),
+        'rating_distribution': Column(
+            *(f'rating_{stars}' for stars in range(5, 0, -1)),
+            convert=lambda *counts: {
+                str(stars): count for stars, count in zip(range(5, 0, -1), counts)
+            },
+        ),
+    }
+
     category = CategorySerializer(read_only=True)
     reviews = ReviewSerializer(many=True, read_only=True)
     average_rating = serializers.FloatField(read_only=True)
+    rating_distribution = serializers.DictField(
+        child=serializers.IntegerField(), read_only=True
+    )
 
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'slug', 'category', 'description', 'price',
-            'stock', 'is_active', 'image', 'average_rating', 'reviews',
-            'created_at', 'updated_at'
+            'stock', 'is_active', 'image', 'average_rating', 'rating_distribution',
+            'reviews', 'created_at', 'updated_at'
         ]
@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import invalidate_products
+from .changes import record_activation
+from .models import Category, Product, ProductTombstone
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def drop_cached_product(sender, instance, **kwargs):
+    """Forget the cached snapshot on any change (price, stock, slug, activation)."""
+    invalidate_products([instance.pk])
+    # Again after commit, in case a concurrent request re-cached the old row
+    product_id = instance.pk
+    transaction.on_commit(lambda: invalidate_products([product_id]))
+
+
+@receiver(post_save, sender=Product)
+def track_activation(sender, instance, raw=False, **kwargs):
+    """Give an inactive product a change-feed tombstone, and take it away on reactivation."""
+    if raw:
+        return
+    if instance.is_active:
+        record_activation([instance.pk], [])
+    else:
+        record_activation([], [instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def record_deletion(sender, instance, **kwargs):
+    ProductTombstone.objects.update_or_create(
+        product_id=instance.pk,
+        defaults={"reason": ProductTombstone.Reason.DELETED, "removed_at": timezone.now()},
+    )
+
+
+@receiver(post_save, sender=Category)
+def touch_category_products(sender, instance, created, raw=False, **kwargs):
+    """Products embed their category, so a renamed category changes them (change feed, ETags)."""
+    if not created and not raw:
+        Product.objects.filter(category=instance).update(updated_at=timezone.now())
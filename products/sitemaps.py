@@ -0,0 +1,305 @@
+"""Sharded sitemaps and a merchant product feed, built as static files.
+
+``build_sitemaps`` (the command of the same name, run from cron) writes to
+``SITEMAP_DIR``:
+
+- ``sitemap.xml``, the sitemap index;
+- ``sitemap-categories.xml.gz``, the product listing of every category;
+- ``sitemap-products-<n>.xml.gz``, the active products with ids from
+  ``n * SITEMAP_SHARD_SIZE`` up to the next shard;
+- ``product-feed.xml.gz``, an RSS 2.0 feed with Google Merchant ``g:``
+  fields for every active product.
+
+Rows are streamed with ``iterator()`` into gzip files, which are renamed
+into place once complete. One aggregate query gives each shard's product
+count and newest ``updated_at``. A shard is only rewritten when that
+fingerprint differs from the one kept in ``manifest.json``: every product
+write moves its ``updated_at`` to now, and a removal changes the count. A
+shard that had writes younger than ``CATALOG_CHANGES_SETTLE_SECONDS`` is
+rewritten on the next run too, in case a slower transaction committed
+behind them. ``force``, or a change of shard size, site URL or currency,
+resets the manifest; the shard files it listed are then found on disk and
+deleted unless still current. The feed is kept as one gzip member per shard under
+``parts/`` and assembled by concatenation (a gzip file may hold several
+members), so unchanged shards are never compressed again.
+
+``sitemap_file`` serves the files with ``Last-Modified``, which only moves
+when a file is rewritten, and answers ``If-Modified-Since`` with a 304.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+
+from .models import Category, Product
+
+MANIFEST = "manifest.json"
+INDEX = "sitemap.xml"
+CATEGORY_SITEMAP = "sitemap-categories.xml.gz"
+FEED = "product-feed.xml.gz"
+ITERATOR_CHUNK_SIZE = 2000
+COMPRESS_LEVEL = 6
+DESCRIPTION_LENGTH = 5000
+# Product sitemaps and feed parts, with their shard number
+SHARD_FILE = re.compile(r"^(?:sitemap-products-(\d+)\.xml|feed-(\d+))\.gz$")
+# Characters XML 1.0 doesn't allow, even escaped
+INVALID_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+SITEMAP_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+SITEMAP_FOOTER = "</urlset>\n"
+FEED_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n'
+    "<title>{title}</title>\n<link>{link}</link>\n<description>{title} products</description>\n"
+)
+FEED_FOOTER = "</channel>\n</rss>\n"
+
+
+def sitemap_file(request, path):
+    """A file built by ``build_sitemaps``, with ``Last-Modified`` and conditional GET."""
+    response = serve(request, path, document_root=settings.SITEMAP_DIR)
+    patch_cache_control(response, public=True, max_age=3600)
+    return response
+
+
+def build_sitemaps(force: bool = False) -> Dict[str, int]:
+    """Bring the files in ``SITEMAP_DIR`` up to date with the catalog.
+
+    Args:
+        force: Rewrite every file, even those whose shard is unchanged.
+
+    Returns:
+        Dict with the number of product shards, how many were written and
+        how many were removed, and the number of products written.
+    """
+    directory = Path(settings.SITEMAP_DIR)
+    (directory / "parts").mkdir(parents=True, exist_ok=True)
+    writer = _Writer(directory)
+    options = {
+        "shard_size": settings.SITEMAP_SHARD_SIZE,
+        "site_url": writer.site_url,
+        "currency": settings.PRODUCT_FEED_CURRENCY,
+    }
+    manifest = _read_manifest(directory / MANIFEST)
+    reset = force or manifest.get("options") != options
+    if reset:
+        manifest = {"options": options, "shards": {}, "categories": None}
+    stats = {"shards": 0, "written": 0, "removed": 0, "products": 0}
+
+    settled = timezone.now() - timedelta(seconds=settings.CATALOG_CHANGES_SETTLE_SECONDS)
+    current = {
+        str(shard): (count, last)
+        for shard, count, last in Product.objects.filter(is_active=True)
+        .annotate(shard=F("pk") / settings.SITEMAP_SHARD_SIZE)
+        .values("shard")
+        .annotate(count=Count("pk"), last=Max("updated_at"))
+        .values_list("shard", "count", "last")
+        .order_by("shard")
+    }
+    shards = manifest["shards"]
+    changed = False
+    # A reset manifest no longer lists the files of earlier runs, so look on disk
+    stale = (writer.stored_shards() if reset else set(shards)) - set(current)
+    for shard in stale:
+        for path in writer.shard_paths(shard):
+            path.unlink(missing_ok=True)
+        shards.pop(shard, None)
+        stats["removed"] += 1
+        changed = True
+    for shard, (count, last) in current.items():
+        fingerprint = [count, last.isoformat()]
+        entry = shards.get(shard)
+        if entry is not None and entry["fingerprint"] == fingerprint and entry["settled"]:
+            continue
+        stats["products"] += writer.write_shard(int(shard))
+        shards[shard] = {
+            "fingerprint": fingerprint,
+            "lastmod": last.isoformat(),
+            "settled": last <= settled,
+        }
+        stats["written"] += 1
+        changed = True
+    stats["shards"] = len(current)
+
+    categories = writer.category_digest()
+    if categories != manifest["categories"]:
+        writer.write_categories()
+        manifest["categories"] = categories
+        changed = True
+
+    if changed or not (directory / INDEX).exists():
+        order = sorted(shards, key=int)
+        writer.write_index(
+            [(writer.shard_name(int(shard)), shards[shard]["lastmod"]) for shard in order]
+        )
+        writer.write_feed([int(shard) for shard in order])
+        with _replace(directory / MANIFEST) as f:
+            f.write(json.dumps(manifest, indent=2).encode())
+    return stats
+
+
+def _read_manifest(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+@contextmanager
+def _replace(path):
+    """A binary file that replaces ``path`` when the block completes."""
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as f:
+        try:
+            yield f
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+
+
+@contextmanager
+def _gzip(path):
+    with _replace(path) as f, gzip.GzipFile(
+        fileobj=f, mode="wb", compresslevel=COMPRESS_LEVEL, mtime=0
+    ) as compressed:
+        yield compressed
+
+
+def _text(value) -> str:
+    return escape(INVALID_XML.sub("", value))
+
+
+class _Writer:
+    """Renders shards, the category sitemap, the index and the feed into ``directory``."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.site_url = settings.SITE_URL.rstrip("/")
+        self.product_url = reverse("product_detail", kwargs={"slug": "__slug__"}).split("__slug__")
+        media_url = settings.MEDIA_URL
+        self.media_url = media_url if "://" in media_url else f"{self.site_url}{media_url}"
+
+    @staticmethod
+    def shard_name(shard: int) -> str:
+        return f"sitemap-products-{shard}.xml.gz"
+
+    def shard_paths(self, shard):
+        shard = int(shard)
+        return self.directory / self.shard_name(shard), self.directory / "parts" / f"feed-{shard}.gz"
+
+    def stored_shards(self):
+        """Shards with a sitemap or a feed part in the directory, as manifest keys."""
+        shards = set()
+        for path in [*self.directory.iterdir(), *(self.directory / "parts").iterdir()]:
+            match = SHARD_FILE.match(path.name)
+            if match:
+                shards.add(str(int(match[1] or match[2])))
+        return shards
+
+    def write_shard(self, shard: int) -> int:
+        """Write the sitemap and the feed part of ``shard``; returns its product count."""
+        size = settings.SITEMAP_SHARD_SIZE
+        rows = (
+            Product.objects.filter(is_active=True, pk__gte=shard * size, pk__lt=(shard + 1) * size)
+            .order_by("pk")
+            .values_list(
+                "pk", "slug", "name", "description", "price", "stock", "image",
+                "updated_at", "category__name",
+            )
+            .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+        )
+        sitemap_path, feed_path = self.shard_paths(shard)
+        prefix, suffix = self.product_url
+        currency = settings.PRODUCT_FEED_CURRENCY
+        count = 0
+        with _gzip(sitemap_path) as sitemap, _gzip(feed_path) as feed:
+            sitemap.write(SITEMAP_HEADER.encode())
+            for pk, slug, name, description, price, stock, image, updated_at, category in rows:
+                link = escape(f"{self.site_url}{prefix}{slug}{suffix}")
+                sitemap.write(
+                    f"<url><loc>{link}</loc><lastmod>{updated_at.isoformat()}</lastmod></url>\n"
+                    .encode()
+                )
+                image_link = (
+                    f"<g:image_link>{escape(self.media_url + image)}</g:image_link>" if image else ""
+                )
+                availability = "in_stock" if stock > 0 else "out_of_stock"
+                feed.write(
+                    f"<item><g:id>{pk}</g:id><title>{_text(name)}</title>"
+                    f"<description>{_text(description[:DESCRIPTION_LENGTH])}</description>"
+                    f"<link>{link}</link>{image_link}"
+                    f"<g:price>{price} {currency}</g:price>"
+                    f"<g:availability>{availability}</g:availability>"
+                    f"<g:condition>new</g:condition>"
+                    f"<g:product_type>{_text(category)}</g:product_type></item>\n".encode()
+                )
+                count += 1
+            sitemap.write(SITEMAP_FOOTER.encode())
+        return count
+
+    def categories(self):
+        return Category.objects.order_by("pk").values_list("slug", flat=True).iterator(
+            chunk_size=ITERATOR_CHUNK_SIZE
+        )
+
+    def category_digest(self) -> str:
+        digest = hashlib.sha256()
+        for slug in self.categories():
+            digest.update(f"{slug}\n".encode())
+        return digest.hexdigest()
+
+    def write_categories(self):
+        listing = f"{self.site_url}{reverse('products')}?category="
+        with _gzip(self.directory / CATEGORY_SITEMAP) as sitemap:
+            sitemap.write(SITEMAP_HEADER.encode())
+            for slug in self.categories():
+                sitemap.write(f"<url><loc>{escape(listing + slug)}</loc></url>\n".encode())
+            sitemap.write(SITEMAP_FOOTER.encode())
+
+    def write_index(self, shards):
+        """``shards`` is a list of ``(file name, lastmod)``."""
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+            f"<sitemap><loc>{escape(self.site_url)}/{CATEGORY_SITEMAP}</loc></sitemap>",
+        ]
+        lines += [
+            f"<sitemap><loc>{escape(self.site_url)}/{name}</loc><lastmod>{lastmod}</lastmod></sitemap>"
+            for name, lastmod in shards
+        ]
+        lines.append("</sitemapindex>\n")
+        with _replace(self.directory / INDEX) as f:
+            f.write("\n".join(lines).encode())
+
+    def write_feed(self, shards):
+        """Concatenate a header member, the shards' feed parts and a footer member."""
+        header = FEED_HEADER.format(
+            title=_text(settings.PRODUCT_FEED_TITLE), link=escape(f"{self.site_url}/")
+        )
+        with _replace(self.directory / FEED) as f:
+            f.write(gzip.compress(header.encode(), mtime=0))
+            for shard in shards:
+                with open(self.shard_paths(shard)[1], "rb") as part:
+                    while chunk := part.read(1 << 16):
+                        f.write(chunk)
+            f.write(gzip.compress(FEED_FOOTER.encode(), mtime=0))
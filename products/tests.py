@@ -1,11 +1,40 @@
 """Tests for products app."""
 
+import gzip
+import json
+import time
+from io import StringIO
+from xml.etree import ElementTree
+
 import pytest
+from asgiref.sync import async_to_sync
 from decimal import Decimal
 
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Exists, OuterRef
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
 
-from products.models import Category, Product
+from config import schema
+from config.db_router import PIN_COOKIE, replicas
+from config.fast_serialization import compile_plan
+from config.renderers import FastJSONRenderer
+from orders.models import Order, OrderItem
+from products.cache import get_product, get_products
+from products.models import Category, Product, ProductTombstone
+from products.seeding import USERNAME_PREFIX, seed_store
+from products.serializers import ProductSerializer
+from products.services import update_inventory
+from products.sitemaps import build_sitemaps
+from reviews.models import Review
+from reviews.services import PURCHASED_STATUSES
 
 
 @pytest.mark.django_db
@@ -66,7 +95,11 @@ class TestProductModel:
         """Test product average rating calculation."""
         from reviews.models import Review
         Review.objects.create(product=product, user=user, rating=4, text='Good')
-        assert product.average_rating == 4.0
+        Review.objects.create(
+            product=product, user=get_user_model().objects.create_user('second'), rating=5
+        )
+        product.refresh_from_db()
+        assert product.average_rating == 4.5
 
 
 @pytest.mark.django_db
@@ -136,3 +169,895 @@ class TestProductAPI:
         """Test product filter by category API."""
         response = api_client.get('/api/products/', {'category': category.id})
         assert response.status_code == 200
+
+    def test_sparse_fields_trim_columns_and_relations(
+        self, api_client, product, review, django_assert_num_queries
+    ):
+        """Test ?fields= prunes the payload and skips unused columns and prefetches."""
+        with django_assert_num_queries(3) as captured:  # validators, count, page
+            response = api_client.get('/api/products/', {'fields': 'id,name,price,image'})
+        assert response.data['results'][0].keys() == {'id', 'name', 'price', 'image'}
+        assert 'description' not in captured.captured_queries[-1]['sql']
+
+    def test_expand_collapses_relations(self, api_client, product, review):
+        """Test relations missing from ?expand= are rendered as ids or left out."""
+        data = api_client.get(f'/api/products/{product.id}/', {'expand': ''}).data
+        assert data['category'] == product.category_id
+        assert 'reviews' not in data
+        assert data['average_rating'] == 5
+
+        data = api_client.get(f'/api/products/{product.id}/', {'expand': 'category'}).data
+        assert data['category']['slug'] == 'test-category'
+
+
+@pytest.mark.django_db
+class TestBulkAndBatchAPI:
+    """Tests for ?ids= bulk retrieval and the /api/batch/ endpoint."""
+
+    @pytest.mark.parametrize('fast', [True, False])
+    def test_ids_keep_requested_order(
+        self, api_client, product, product_out_of_stock, settings, fast, django_assert_num_queries
+    ):
+        """Test ?ids= returns the known products in the order asked, in one query."""
+        settings.VALUES_LIST_SERIALIZATION = fast
+        ids = f'{product_out_of_stock.id},999,{product.id},{product_out_of_stock.id}'
+        with django_assert_num_queries(2):  # validators + products
+            response = api_client.get('/api/products/', {'ids': ids, 'fields': 'id,name'})
+        assert response.status_code == 200
+        assert [item['id'] for item in response.json()] == [product_out_of_stock.id, product.id]
+
+    @pytest.mark.parametrize('ids', ['1,x', '', '0', ','.join(['1'] * 4)])
+    def test_invalid_ids_rejected(self, api_client, settings, ids):
+        """Test malformed, empty or too many ids are a 400."""
+        settings.API_BULK_MAX_IDS = 3
+        response = api_client.get('/api/products/', {'ids': ids})
+        assert response.status_code == 400
+        assert 'ids' in response.json()
+
+    def test_batch_runs_subrequests(self, authenticated_client, product, order):
+        """Test sub-responses come back in order, with the caller's credentials."""
+        response = authenticated_client.post('/api/batch/', {'requests': [
+            {'path': f'/api/products/?ids={product.id}&fields=id,name'},
+            {'method': 'GET', 'path': f'/api/orders/{order.id}/'},
+            {'path': '/api/products/999/'},
+            {'path': '/api/nowhere/'},
+        ]}, format='json')
+        assert response.status_code == 200
+        responses = response.json()['responses']
+        assert responses[0] == {'status': 200, 'body': [{'id': product.id, 'name': product.name}]}
+        assert responses[1]['status'] == 200
+        assert responses[1]['body']['id'] == order.id
+        assert [item['status'] for item in responses[2:]] == [404, 404]
+
+    def test_batch_applies_subrequest_permissions(self, api_client, order):
+        """Test an anonymous batch can't read what an anonymous request can't."""
+        response = api_client.post(
+            '/api/batch/', {'requests': [{'path': f'/api/orders/{order.id}/'}]}, format='json'
+        )
+        assert response.json()['responses'][0]['status'] == 401
+
+    @pytest.mark.parametrize('requests', [
+        [],
+        [{'method': 'POST', 'path': '/api/products/'}],
+        [{'path': '/api/batch/'}],
+        [{'path': '/admin/'}],
+        [{'path': '/api/products/'}] * 3,
+    ])
+    def test_batch_rejects_invalid_requests(self, api_client, settings, requests):
+        """Test writes, non-API paths, nesting and oversized batches are a 400."""
+        settings.API_BATCH_MAX_REQUESTS = 2
+        response = api_client.post('/api/batch/', {'requests': requests}, format='json')
+        assert response.status_code == 400
+
+    @pytest.mark.urls('config.urls_async')
+    def test_batch_under_async_urls(self, api_client, product):
+        """Test async views are run as sub-requests too."""
+        response = api_client.post('/api/batch/', {'requests': [
+            {'path': f'/api/products/{product.id}/?fields=slug'},
+        ]}, format='json')
+        assert response.json()['responses'] == [{'status': 200, 'body': {'slug': product.slug}}]
+
+
+@pytest.mark.django_db
+class TestCatalogChangeFeed:
+    """Tests for the /api/products/changes/ delta feed."""
+
+    @pytest.fixture(autouse=True)
+    def no_settle_window(self, settings):
+        settings.CATALOG_CHANGES_SETTLE_SECONDS = 0
+
+    def sync(self, api_client, since=None, **params):
+        """Follow the feed to its end: (changed ids, removed entries, watermark)."""
+        changed, removed = [], []
+        while True:
+            params['fields'] = 'id,stock'
+            if since:
+                params['since'] = since
+            data = api_client.get('/api/products/changes/', params).json()
+            changed += [item['id'] for item in data['changed']]
+            removed += data['removed']
+            since = data['since']
+            if not data['has_more']:
+                return changed, removed, since
+
+    def test_pages_follow_writes(self, api_client, product, product_out_of_stock, category):
+        """Test paging, then updates, deactivation, deletion and reactivation."""
+        extra = Product.objects.create(
+            name='Extra', slug='extra', category=category, description='', price=Decimal('1.00')
+        )
+        changed, removed, since = self.sync(api_client, limit=1)
+        assert changed == [product.id, product_out_of_stock.id, extra.id]
+        assert removed == []
+        assert self.sync(api_client, since) == ([], [], since)
+
+        product.stock = 5
+        product.save()
+        product_out_of_stock.is_active = False
+        product_out_of_stock.save()
+        extra_id = extra.id
+        extra.delete()
+        changed, removed, since = self.sync(api_client, since, limit=1)
+        assert changed == [product.id]
+        assert removed == [
+            {'id': product_out_of_stock.id, 'reason': 'deactivated'},
+            {'id': extra_id, 'reason': 'deleted'},
+        ]
+
+        product_out_of_stock.is_active = True
+        product_out_of_stock.save()
+        assert self.sync(api_client, since)[:2] == ([product_out_of_stock.id], [])
+
+    def test_indirect_changes_are_reported(self, api_client, product, user, category):
+        """Test reviews and category renames move the products they show up in."""
+        since = self.sync(api_client)[2]
+        Review.objects.create(product=product, user=user, rating=4, text='Fine')
+        changed, _, since = self.sync(api_client, since)
+        assert changed == [product.id]
+
+        category.name = 'Ales'
+        category.save()
+        assert self.sync(api_client, since)[0] == [product.id]
+
+    def test_settle_window_holds_back_fresh_writes(self, api_client, product, settings):
+        """Test writes younger than CATALOG_CHANGES_SETTLE_SECONDS wait for a later page."""
+        settings.CATALOG_CHANGES_SETTLE_SECONDS = 60
+        assert self.sync(api_client)[0] == []
+
+    @pytest.mark.parametrize('params', [{'since': 'forged'}, {'limit': 0}, {'limit': 1000}])
+    def test_invalid_parameters_rejected(self, api_client, params):
+        """Test a tampered watermark or an out-of-range limit is a 400."""
+        assert api_client.get('/api/products/changes/', params).status_code == 400
+
+    @pytest.mark.urls('config.urls_async')
+    def test_reachable_under_async_urls(self, api_client, product):
+        """Test the async detail route doesn't swallow /changes/."""
+        assert self.sync(api_client)[0] == [product.id]
+
+
+@pytest.mark.django_db
+class TestInventoryUpdate:
+    """Tests for bulk stock/price updates (API and update_inventory command)."""
+
+    @pytest.fixture
+    def staff_client(self, api_client, admin_user):
+        api_client.force_authenticate(admin_user)
+        return api_client
+
+    def test_json_rows_report_outcomes(
+        self, staff_client, product, product_out_of_stock, django_capture_on_commit_callbacks
+    ):
+        """Test each row's status, the applied values and the cache refresh."""
+        get_product(product.id)  # cache the old snapshot
+        rows = [
+            {'slug': product.slug, 'stock': 7, 'price': '21.50'},
+            {'slug': product_out_of_stock.slug, 'stock': 0},
+            {'slug': 'missing', 'price': 1},
+            {'slug': product.slug, 'stock': 8},
+            {'slug': 'bad', 'stock': -1, 'price': '1.234'},
+            {'slug': 'empty'},
+        ]
+        with django_capture_on_commit_callbacks(execute=True):
+            response = staff_client.post('/api/products/inventory/', rows, format='json')
+        data = response.json()
+        assert response.status_code == 200
+        assert [row['status'] for row in data['results']] == [
+            'updated', 'unchanged', 'not_found', 'invalid', 'invalid', 'invalid'
+        ]
+        assert set(data['results'][4]['errors']) == {'stock', 'price'}
+        assert (data['updated'], data['unchanged'], data['not_found'], data['invalid']) == (1, 1, 1, 3)
+        assert get_product(product.id).stock == 7
+        product.refresh_from_db()
+        assert (product.stock, product.price) == (7, Decimal('21.50'))
+
+    @pytest.mark.parametrize('stock, status', [(2147483647, 'updated'), (2147483648, 'invalid')])
+    def test_stock_fits_the_column(self, staff_client, product, stock, status):
+        """Test stock beyond the integer column is rejected per row, not by the database."""
+        rows = [{'slug': product.slug, 'stock': stock}]
+        response = staff_client.post('/api/products/inventory/', rows, format='json')
+        assert response.status_code == 200
+        assert response.json()['results'][0]['status'] == status
+
+    def test_csv_body(self, staff_client, product):
+        """Test a CSV upload with a byte order mark and a header row."""
+        body = f'\ufeffslug,stock,price\n{product.slug},3,\n'.encode()
+        response = staff_client.post('/api/products/inventory/', body, content_type='text/csv')
+        assert response.json()['updated'] == 1
+        product.refresh_from_db()
+        assert (product.stock, product.price) == (3, Decimal('19.99'))
+
+    def test_staff_only(self, api_client, authenticated_client):
+        """Test anonymous and regular users are turned away."""
+        rows = [{'slug': 'x', 'stock': 1}]
+        assert api_client.post('/api/products/inventory/', rows, format='json').status_code == 401
+        assert authenticated_client.post(
+            '/api/products/inventory/', rows, format='json'
+        ).status_code == 403
+
+    def test_batches_cost_two_statements(self, category, django_assert_max_num_queries):
+        """Test each batch is one SELECT and one UPDATE, whatever its size."""
+        Product.objects.bulk_create(
+            Product(name=f'P{i}', slug=f'p{i}', category=category, description='', price=1)
+            for i in range(30)
+        )
+        rows = [{'slug': f'p{i}', 'stock': i + 1} for i in range(30)]
+        with django_assert_max_num_queries(3 * 2 + 2):  # 3 batches, plus the savepoint
+            report = update_inventory(rows, batch_size=10)
+        assert report['updated'] == 30
+        assert sorted(Product.objects.values_list('stock', flat=True)) == list(range(1, 31))
+
+    def test_command(self, tmp_path, product):
+        """Test the command reads a file and reports failures on stderr."""
+        path = tmp_path / 'stock.json'
+        path.write_text(json.dumps([{'slug': product.slug, 'stock': 1}, {'slug': 'nope', 'stock': 1}]))
+        out, err = StringIO(), StringIO()
+        call_command('update_inventory', str(path), stdout=out, stderr=err)
+        assert 'Updated 1 products' in out.getvalue()
+        assert "no product with slug 'nope'" in err.getvalue()
+        with pytest.raises(CommandError):
+            call_command('update_inventory', str(tmp_path / 'stock.txt'))
+
+
+@pytest.mark.django_db
+class TestImportCatalog:
+    """Tests for the streaming import_catalog command."""
+
+    def run(self, path, *args):
+        out = StringIO()
+        call_command('import_catalog', str(path), *args, stdout=out)
+        return out.getvalue()
+
+    def test_csv_upserts_and_reports_bad_rows(self, tmp_path, category, product):
+        """Test category chains, slug de-duplication, upserts and the error file."""
+        path = tmp_path / 'catalog.csv'
+        path.write_text(
+            'name,category,price,stock,is_active,slug\n'
+            'Citra,Hops > Aroma,4.50,10,,\n'
+            'Citra,Hops > Aroma,4.75,,false,\n'
+            'Renamed,Test Category,1.00,3,,test-product\n'
+            ',Hops,abc,-1,maybe,\n'
+            'Huge,Hops,1.00,2147483648,,\n'
+        )
+        output = self.run(path, '--batch-size', '2')
+        assert 'created 2 products, updated 1, unchanged 0, created 2 categories, rejected 2' in output
+
+        aroma = Category.objects.get(name='Aroma')
+        assert aroma.parent.name == 'Hops'
+        assert list(
+            Product.objects.filter(category=aroma).order_by('slug').values_list('slug', 'price')
+        ) == [('citra', Decimal('4.50')), ('citra-2', Decimal('4.75'))]
+        assert ProductTombstone.objects.filter(product_id=Product.objects.get(slug='citra-2').pk).exists()
+        product.refresh_from_db()
+        assert (product.name, product.category_id, product.stock) == ('Renamed', category.id, 3)
+
+        lines = (tmp_path / 'catalog.csv.errors.jsonl').read_text().splitlines()
+        error, huge = map(json.loads, lines)
+        assert error['line'] == 5
+        assert set(error['errors']) == {'name', 'price', 'stock', 'is_active'}
+        assert set(huge['errors']) == {'stock'}
+
+        # Same file again: same slugs and values, so nothing is written
+        updated_at = dict(Product.objects.values_list('pk', 'updated_at'))
+        assert 'created 0 products, updated 0, unchanged 3, created 0 categories' in self.run(path)
+        assert dict(Product.objects.values_list('pk', 'updated_at')) == updated_at
+
+    def test_blank_cells_keep_stored_values(self, tmp_path, product):
+        """Test blank optional cells under a full header leave an existing product alone."""
+        Product.objects.filter(pk=product.pk).update(is_active=False)
+        path = tmp_path / 'catalog.csv'
+        path.write_text(
+            'slug,name,category,price,stock,is_active,description\n'
+            f'{product.slug},Test Product,Ales,2.00, ,,\n'
+        )
+        assert 'updated 1' in self.run(path)
+        product.refresh_from_db()
+        assert (product.price, product.stock, product.is_active) == (Decimal('2.00'), 100, False)
+        assert product.description == 'Test description'
+
+    def test_missing_columns_keep_stored_values(self, tmp_path, product):
+        """Test an update only writes the columns the input has."""
+        Product.objects.filter(pk=product.pk).update(is_active=False)
+        path = tmp_path / 'prices.csv'
+        path.write_text(f'slug,name,category,price\n{product.slug},Test Product,Ales,2.00\n')
+        assert 'updated 1' in self.run(path)
+        product.refresh_from_db()
+        assert (product.price, product.stock, product.is_active) == (Decimal('2.00'), 100, False)
+        assert product.description == 'Test description'
+
+    def test_jsonl(self, tmp_path, product, django_capture_on_commit_callbacks):
+        """Test JSON Lines input, invalid lines and cache invalidation of updated products."""
+        get_product(product.id)
+        path = tmp_path / 'catalog.jsonl'
+        path.write_text(
+            json.dumps({'slug': product.slug, 'name': 'Test Product', 'category': 'Ales',
+                        'price': 2, 'stock': 9}) + '\n\n{broken\n'
+        )
+        with django_capture_on_commit_callbacks(execute=True):
+            output = self.run(path, '--errors', str(tmp_path / 'bad.jsonl'))
+        assert 'updated 1' in output and 'rejected 1' in output
+        assert get_product(product.id).stock == 9
+        assert 'Invalid JSON' in (tmp_path / 'bad.jsonl').read_text()
+
+
+@pytest.mark.django_db
+class TestSitemaps:
+    """Tests for the build_sitemaps command and the files it serves."""
+
+    @pytest.fixture(autouse=True)
+    def sitemap_settings(self, settings, tmp_path):
+        settings.SITEMAP_DIR = str(tmp_path)
+        settings.SITEMAP_SHARD_SIZE = 1
+        settings.SITE_URL = 'https://shop.example/'
+        settings.CATALOG_CHANGES_SETTLE_SECONDS = 0
+
+    def read(self, tmp_path, name):
+        return ElementTree.fromstring(gzip.decompress((tmp_path / name).read_bytes()))
+
+    def test_builds_and_rewrites_changed_shards(self, tmp_path, product, product_out_of_stock):
+        """Test the files, then that only the shard of a changed product is rewritten."""
+        assert build_sitemaps() == {'shards': 2, 'written': 2, 'removed': 0, 'products': 2}
+        index = ElementTree.fromstring((tmp_path / 'sitemap.xml').read_bytes())
+        assert len(index) == 3
+        shard = self.read(tmp_path, f'sitemap-products-{product.id}.xml.gz')
+        assert shard[0][0].text == 'https://shop.example/products/test-product/'
+        categories = self.read(tmp_path, 'sitemap-categories.xml.gz')
+        assert categories[0][0].text.endswith('/products/?category=test-category')
+
+        feed = self.read(tmp_path, 'product-feed.xml.gz')
+        items = feed.find('channel').findall('item')
+        g = '{http://base.google.com/ns/1.0}'
+        assert [item.find(f'{g}availability').text for item in items] == ['in_stock', 'out_of_stock']
+        assert items[0].find(f'{g}price').text == '19.99 USD'
+
+        assert build_sitemaps()['written'] == 0
+        product.stock = 0
+        product.save()
+        assert build_sitemaps()['written'] == 1
+        items = self.read(tmp_path, 'product-feed.xml.gz').find('channel').findall('item')
+        assert [item.find(f'{g}availability').text for item in items] == ['out_of_stock'] * 2
+
+        product.is_active = False
+        product.save()
+        assert build_sitemaps() == {'shards': 1, 'written': 0, 'removed': 1, 'products': 0}
+        assert not (tmp_path / f'sitemap-products-{product.id}.xml.gz').exists()
+        assert len(self.read(tmp_path, 'product-feed.xml.gz').find('channel')) == 4
+
+    def test_reset_removes_files_of_old_shards(self, tmp_path, settings, product, product_out_of_stock):
+        """Test a shard size change leaves no sitemap or feed part the manifest forgot."""
+        build_sitemaps()
+        settings.SITEMAP_SHARD_SIZE = 1000
+        stats = build_sitemaps()
+        assert (stats['shards'], stats['removed']) == (1, 2)
+        assert sorted(path.name for path in tmp_path.glob('sitemap-products-*')) == [
+            'sitemap-products-0.xml.gz'
+        ]
+        assert [path.name for path in (tmp_path / 'parts').iterdir()] == ['feed-0.gz']
+
+    def test_served_with_last_modified(self, client, product):
+        """Test the files are served with Last-Modified and answer If-Modified-Since."""
+        call_command('build_sitemaps', '--force', stdout=StringIO())
+        response = client.get('/sitemap.xml')
+        assert response.status_code == 200
+        assert b'sitemap-products-' in b''.join(response.streaming_content)
+        assert 'max-age=3600' in response['Cache-Control']
+        response = client.get('/sitemap.xml', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert response.status_code == 304
+        assert client.get('/product-feed.xml.gz').status_code == 200
+        assert client.get('/sitemap-products-999.xml.gz').status_code == 404
+
+
+@pytest.mark.django_db
+class TestValuesListSerialization:
+    """Tests for the values_list() fast path of the list endpoints."""
+
+    @pytest.fixture
+    def catalog(self, category, product, product_out_of_stock, review):
+        lagers = Category.objects.create(name='Lagers', slug='lagers', parent=category)
+        product_out_of_stock.category = lagers
+        product_out_of_stock.image = 'products/lager.png'
+        product_out_of_stock.description = 'Crisp \u2028 and cold'
+        product_out_of_stock.save()
+
+    @pytest.mark.parametrize('params', [
+        {},
+        {'fields': 'id,name,price,image'},
+        {'expand': ''},
+        {'expand': 'category'},
+        {'fields': 'average_rating,rating_distribution,reviews,category', 'expand': 'reviews'},
+        {'ordering': 'price', 'page': 'last'},
+    ])
+    def test_product_list_matches_serializer(self, api_client, catalog, settings, params):
+        """Test the fast path renders byte-for-byte what ProductSerializer renders."""
+        fast = api_client.get('/api/products/', params)
+        settings.VALUES_LIST_SERIALIZATION = False
+        slow = api_client.get('/api/products/', params)
+        assert fast.status_code == 200
+        assert fast.content == slow.content
+
+    def test_product_list_queries(self, api_client, catalog, django_assert_num_queries):
+        """Test the nested reviews cost one query per page, like the prefetch."""
+        with django_assert_num_queries(4):  # validators, count, page, reviews
+            response = api_client.get('/api/products/')
+        assert response.json()['results'][1]['reviews'][0]['user'] == 'testuser'
+
+    def test_uncompilable_serializer_has_no_plan(self):
+        """Test a field without a column mapping keeps the serializer path."""
+
+        class ProductNameSerializer(ProductSerializer):
+            shout = serializers.SerializerMethodField()
+
+            class Meta(ProductSerializer.Meta):
+                fields = ['id', 'shout']
+
+            def get_shout(self, obj):
+                return obj.name.upper()
+
+        assert compile_plan(ProductSerializer()) is not None
+        assert compile_plan(ProductNameSerializer()) is None
+
+    def test_fast_renderer_matches_json_renderer(self):
+        """Test FastJSONRenderer output equals DRF's JSONRenderer output."""
+        data = {
+            'when': timezone.now(),
+            'price': Decimal('1.50'),
+            'text': 'Пиво \u2028 \u2029 "quoted"',
+            'status': gettext_lazy('Paid'),
+            1: [None, True, 2.5, ('a', 'b')],
+        }
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+        assert FastJSONRenderer().render(data, 'application/json; indent=2') == (
+            JSONRenderer().render(data, 'application/json; indent=2')
+        )
+
+
+@pytest.mark.django_db
+@pytest.mark.urls('config.urls_async')
+class TestAsyncReadPath:
+    """Tests for the async (ASGI) catalog and cart read views."""
+
+    def test_async_api_matches_sync(self, async_client, api_client, product, review):
+        """Test async list/retrieve return the same payload as the viewset."""
+        for url in ['/api/products/', f'/api/products/{product.id}/', '/api/products/?page=last']:
+            async_response = async_to_sync(async_client.get)(url)
+            with override_settings(ROOT_URLCONF='config.urls'):
+                sync_response = api_client.get(url)
+            assert async_response.status_code == 200
+            assert async_response.json() == sync_response.json()
+
+    def test_async_api_not_found(self, async_client):
+        """Test missing products and pages map to 404."""
+        assert async_to_sync(async_client.get)('/api/products/0/').status_code == 404
+        assert async_to_sync(async_client.get)('/api/products/?page=9').status_code == 404
+
+    def test_async_html_views(self, async_client, product, review):
+        """Test async list and detail pages render."""
+        response = async_to_sync(async_client.get)(reverse('products'), {'sort': 'price'})
+        assert response.status_code == 200
+        assert list(response.context['products']) == [product]
+
+        response = async_to_sync(async_client.get)(
+            reverse('product_detail', kwargs={'slug': product.slug})
+        )
+        assert response.status_code == 200
+        assert response.context['product'] == product
+        assert response.context['can_review'] is False
+
+    def test_async_cart(self, async_client, product):
+        """Test writes fall through to the sync view and reads are async."""
+        response = async_to_sync(async_client.post)(
+            '/api/cart/', {'product_id': product.id, 'quantity': 2},
+            content_type='application/json'
+        )
+        assert response.status_code == 200
+
+        response = async_to_sync(async_client.get)('/api/cart/')
+        assert response.json()['items'][0]['product_id'] == product.id
+        assert response.json()['items_count'] == 2
+
+
+@pytest.mark.django_db
+class TestSeedStore:
+    """Tests for the synthetic data generator."""
+
+    SIZES = {'categories': 20, 'products': 40, 'users': 12, 'orders': 150, 'batch_size': 16}
+
+    def snapshot(self):
+        return (
+            list(Product.objects.order_by('slug').values_list(
+                'slug', 'price', 'stock', 'category__slug')),
+            list(Order.objects.order_by('user__username', 'created_at').values_list(
+                'user__username', 'status', 'total_price')),
+            list(Review.objects.order_by('product__slug', 'user__username').values_list(
+                'product__slug', 'user__username', 'rating')),
+        )
+
+    def test_command_creates_store(self):
+        """Test the command fills every table and honours the review rules."""
+        call_command('seed_store', *[f'--{k.replace("_", "-")}={v}' for k, v in self.SIZES.items()])
+
+        assert Category.objects.count() == 20
+        assert Category.objects.filter(parent__parent__isnull=False).exists()
+        assert Product.objects.count() == 40
+        assert Product.objects.exclude(image='').filter(image__startswith='products/').exists()
+        assert Order.objects.count() == 150
+        assert OrderItem.objects.exists()
+        assert Review.objects.exists()
+
+        purchased = OrderItem.objects.filter(
+            product=OuterRef('product'),
+            order__user=OuterRef('user'),
+            order__status__in=PURCHASED_STATUSES,
+        )
+        assert not Review.objects.exclude(Exists(purchased)).exists()
+        product = Product.objects.order_by('-rating_count').first()
+        assert product.rating_count == product.reviews.count()
+
+    def test_same_seed_same_data(self):
+        """Test a seed reproduces identical rows."""
+        seed_store(seed=7, **self.SIZES)
+        first = self.snapshot()
+
+        Category.objects.all().delete()
+        get_user_model().objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        seed_store(seed=7, **self.SIZES)
+        assert self.snapshot() == first
+
+    def test_refuses_non_empty_store(self, product):
+        """Test seeding an existing catalog is rejected."""
+        with pytest.raises(CommandError):
+            call_command('seed_store', '--products=1')
+
+
+@pytest.mark.django_db
+class TestReplayAccessLog:
+    """Tests for the access-log replay tool."""
+
+    def test_replay_reports_routes(self, tmp_path, user, product, order):
+        """Test requests are replayed, authenticated and summarized per route."""
+        log = tmp_path / 'access.jsonl'
+        log.write_text('\n'.join(json.dumps(entry) for entry in [
+            {'path': '/api/products/', 'query': {'page': 1}},
+            {'path': f'/api/products/{product.id}/'},
+            {'path': '/api/orders/', 'user': user.username},
+            {'path': '/accounts/profile/', 'user': user.username},
+            {'method': 'POST', 'path': '/api/cart/', 'body': {'product_id': product.id}},
+            {'path': '/missing/'},
+        ]))
+        output = tmp_path / 'run.json'
+
+        call_command(
+            'replay_access_log', str(log), '--transport=client', '--concurrency=1',
+            f'--output={output}', stdout=StringIO(),
+        )
+        routes = json.loads(output.read_text())['routes']
+
+        assert routes['GET order-list']['client_errors'] == 0
+        assert routes['GET users:profile']['client_errors'] == 0
+        assert routes['POST api_cart']['client_errors'] == 0
+        assert routes['GET (unresolved)']['client_errors'] == 1
+        assert routes['GET product-list']['queries'] > 0
+        assert routes['TOTAL']['requests'] == 6
+        assert routes['TOTAL']['errors'] == 0
+
+        out = StringIO()
+        call_command(
+            'replay_access_log', str(log), '--transport=client', '--concurrency=1',
+            '--client-addresses', f'--compare={output}', stdout=out,
+        )
+        assert 'Δp95' in out.getvalue()
+
+    def test_invalid_line_rejected(self, tmp_path):
+        """Test malformed log lines are reported with their line number."""
+        log = tmp_path / 'access.jsonl'
+        log.write_text('{"path": "/"}\nnot json\n')
+        with pytest.raises(CommandError, match='access.jsonl:2'):
+            call_command('replay_access_log', str(log))
+
+
+@pytest.mark.django_db(databases=['default', 'replica'])
+class TestReadReplicaRouting:
+    """Tests for replica reads with read-your-writes stickiness."""
+
+    @pytest.fixture(autouse=True)
+    def enable_replica(self, settings):
+        settings.DATABASE_REPLICAS = ['replica']
+
+    def test_catalog_reads_from_replica(self, client, api_client, product):
+        """Test catalog views read the replica, not the primary."""
+        category = Category.objects.using('replica').create(name='Replica', slug='replica')
+        Product.objects.using('replica').create(
+            name='Replica Product', slug='replica-product', category=category,
+            description='Only on the replica', price=Decimal('5.00'), stock=1,
+        )
+
+        names = [p.name for p in client.get(reverse('products')).context['products']]
+        assert names == ['Replica Product']
+        assert api_client.get('/api/products/').data['count'] == 1
+        assert client.get(reverse('product_detail', kwargs={'slug': product.slug})).status_code == 404
+
+    def test_writer_is_pinned_to_primary(self, client, user, product, order):
+        """Test a client that just wrote reads its own data from the primary."""
+        client.force_login(user)
+        response = client.post(
+            reverse('review_create', kwargs={'slug': product.slug}),
+            {'rating': 5, 'text': 'Fresh hops!'},
+        )
+        assert PIN_COOKIE in response.cookies
+
+        response = client.get(reverse('product_detail', kwargs={'slug': product.slug}))
+        assert response.status_code == 200
+        assert response.context['has_reviewed'] is True
+        assert client.get(reverse('users:profile')).context['orders'].count() == 1
+
+    def test_session_write_is_seen_by_catalog_pages(self, client, product):
+        """Test a cart change pins the client, and sessions never come from the replica."""
+        response = client.post(
+            reverse('orders:cart_add', kwargs={'product_id': product.id}), {'quantity': 2}
+        )
+        assert PIN_COOKIE in response.cookies
+
+        assert len(client.get(reverse('products')).context['cart']) == 2
+        del client.cookies[PIN_COOKIE]
+        response = client.get(reverse('products'))
+        assert response.context['products'].count() == 0  # still served by the replica
+        assert len(response.context['cart']) == 2
+
+    def test_unhealthy_replica_falls_back_to_primary(self, client, product, monkeypatch):
+        """Test reads use the primary when no replica passes its health check."""
+        monkeypatch.setattr(replicas, 'is_healthy', lambda alias: False)
+        names = [p.name for p in client.get(reverse('products')).context['products']]
+        assert names == [product.name]
+
+
+@pytest.mark.django_db
+class TestProductCache:
+    """Tests for the cached product snapshots used by the cart and checkout."""
+
+    def test_multi_get_reads_database_once(self, product, product_out_of_stock, django_assert_num_queries):
+        """Test misses load in one query and hits need none."""
+        ids = [product.id, str(product_out_of_stock.id)]
+        with django_assert_num_queries(1):
+            products = get_products([*ids, 'bogus', 999999])
+        assert products.keys() == {product.id, product_out_of_stock.id}
+        with django_assert_num_queries(0):
+            assert get_products(ids)[product.id].price == product.price
+
+    def test_save_invalidates(self, product):
+        """Test a saved product is not served stale."""
+        get_product(product.id)
+        product.price = Decimal('24.50')
+        product.save()
+        assert get_product(product.id).price == Decimal('24.50')
+
+    def test_stale_slug_pointer_is_ignored(self, product):
+        """Test a slug that moved to another product is looked up again."""
+        assert get_product(slug=product.slug) == product
+        product.slug = 'renamed-product'
+        product.save()
+        assert get_product(slug='test-product') is None
+        assert get_product(slug='renamed-product') == product
+
+    def test_cached_instance_saves_only_snapshot_fields(self, product):
+        """Test other fields are deferred and left alone on save."""
+        cached = get_product(product.id)
+        assert 'description' in cached.get_deferred_fields()
+        cached.stock = 7
+        cached.save()
+        product.refresh_from_db()
+        assert (product.stock, product.description) == (7, 'Test description')
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    """Tests for ETag/Last-Modified revalidation of product pages and API resources."""
+
+    def test_api_detail_revalidates_with_one_query(
+        self, api_client, product, review, django_assert_num_queries
+    ):
+        """Test a matching ETag gets a 304 after a single narrow query."""
+        url = f'/api/products/{product.id}/'
+        response = api_client.get(url)
+        assert response.status_code == 200
+        etag = response['ETag']
+        assert etag.startswith('W/"') and response.has_header('Last-Modified')
+
+        with django_assert_num_queries(1):
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response.content == b''
+        assert response['ETag'] == etag
+
+        product.price = Decimal('24.50')
+        product.save()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data['price'] == '24.50'
+
+    def test_api_detail_if_modified_since(self, api_client, product):
+        """Test If-Modified-Since alone also revalidates."""
+        url = f'/api/products/{product.id}/'
+        last_modified = api_client.get(url)['Last-Modified']
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+    def test_review_and_category_changes_invalidate(
+        self, api_client, product, review, django_capture_on_commit_callbacks
+    ):
+        """Test changes outside the product row still change its validators."""
+        url = f'/api/products/{product.id}/'
+        etag = api_client.get(url)['ETag']
+        with django_capture_on_commit_callbacks(execute=True):
+            review.delete()
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+        etag = api_client.get(url)['ETag']
+        with django_capture_on_commit_callbacks(execute=True):
+            product.category.name = 'Renamed'
+            product.category.save()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data['category']['name'] == 'Renamed'
+
+    def test_api_list_revalidates_without_queries(
+        self, api_client, product, django_assert_num_queries
+    ):
+        """Test list validators come from one aggregate query."""
+        etag = api_client.get('/api/products/', {'page': 1})['ETag']
+        with django_assert_num_queries(1):
+            response = api_client.get('/api/products/', {'page': 1}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        Product.objects.create(
+            name='New', slug='new', category=product.category, description='x', price=1
+        )
+        response = api_client.get('/api/products/', {'page': 1}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data['count'] == 2
+
+    def test_list_validators_see_writes_from_other_processes(self, api_client, product):
+        """Test queryset writes and deletes, which leave the cache alone, change list validators."""
+        etag = api_client.get('/api/products/')['ETag']
+        Product.objects.filter(pk=product.pk).update(price=5, updated_at=timezone.now())
+        assert api_client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+        etag = api_client.get('/api/products/')['ETag']
+        Product.objects.filter(pk=product.pk).delete()
+        response = api_client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data['count'] == 0
+
+    def test_review_text_edit_invalidates_detail(self, api_client, product, review):
+        """Test editing a review's text alone still changes its product's validators."""
+        url = f'/api/products/{product.id}/'
+        etag = api_client.get(url)['ETag']
+        review.text = 'Changed my mind'
+        review.save()
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_html_list_sees_new_categories(self, client, product):
+        """Test the product list page, whose sidebar lists categories, changes with them."""
+        url = reverse('products')
+        response = client.get(url)
+        # Nothing to date a category change by, so If-Modified-Since can't be honoured
+        assert not response.has_header('Last-Modified')
+        Category.objects.create(name='Empty', slug='empty')
+        assert client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 200
+        later = http_date(time.time() + 60)
+        assert client.get(url, HTTP_IF_MODIFIED_SINCE=later).status_code == 200
+
+    def test_html_detail_varies_with_cart(self, client, product, django_assert_num_queries):
+        """Test anonymous product pages revalidate, and a cart change busts them."""
+        url = reverse('product_detail', kwargs={'slug': product.slug})
+        etag = client.get(url)['ETag']
+        with django_assert_num_queries(1):  # validators only
+            assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        client.post(reverse('orders:cart_add', kwargs={'product_id': product.id}), {'quantity': 1})
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_html_detail_skipped_for_signed_in_users(self, client, user, product):
+        """Test signed-in users, whose review form depends on their orders, get no ETag."""
+        client.force_login(user)
+        response = client.get(reverse('product_detail', kwargs={'slug': product.slug}))
+        assert response.status_code == 200
+        assert not response.has_header('ETag')
+
+    def test_html_list(self, client, product):
+        """Test the product list page revalidates."""
+        etag = client.get(reverse('products'))['ETag']
+        assert client.get(reverse('products'), HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    @pytest.mark.urls('config.urls_async')
+    def test_async_views(self, async_client, product):
+        """Test the async read path honours validators too."""
+        for url in [f'/api/products/{product.id}/', '/api/products/',
+                    reverse('product_detail', kwargs={'slug': product.slug})]:
+            etag = async_to_sync(async_client.get)(url)['ETag']
+            response = async_to_sync(async_client.get)(url, headers={'If-None-Match': etag})
+            assert response.status_code == 304
+
+
+@pytest.mark.django_db
+class TestOpenAPISchema:
+    """Tests for the precomputed, conditionally served OpenAPI schema."""
+
+    @pytest.fixture(autouse=True)
+    def schema_dir(self, settings, tmp_path):
+        settings.OPENAPI_SCHEMA_DIR = str(tmp_path)
+        settings.APP_VERSION = 'v1'
+        schema._schemas.clear()
+        schema.code_version.cache_clear()
+        yield tmp_path
+        schema._schemas.clear()
+        schema.code_version.cache_clear()
+
+    def test_command_builds_and_prunes(self, schema_dir):
+        """Test the deploy command writes both formats and drops old versions."""
+        (schema_dir / 'v0').mkdir()
+        call_command('build_openapi_schema', stdout=StringIO())
+        assert sorted(path.name for path in (schema_dir / 'v1').iterdir()) == [
+            'schema-default-default.json', 'schema-default-default.yaml'
+        ]
+        assert not (schema_dir / 'v0').exists()
+
+    def test_served_from_artifact_with_etag(self, api_client, monkeypatch):
+        """Test the schema is generated once and revalidated with the ETag."""
+        calls = []
+        generate = schema.generate_schema
+        monkeypatch.setattr(schema, 'generate_schema', lambda *a: calls.append(a) or generate(*a))
+
+        first = api_client.get('/api/schema/')
+        assert first.status_code == 200
+        assert b'/api/products/' in first.content
+        assert first['Cache-Control'] == 'no-cache'
+        second = api_client.get('/api/schema/', HTTP_IF_NONE_MATCH=first['ETag'])
+        assert second.status_code == 304
+        assert len(calls) == 1
+
+        as_json = api_client.get('/api/schema/', {'format': 'json'})
+        assert as_json['Content-Type'].startswith('application/vnd.oai.openapi+json')
+        assert json.loads(as_json.content)['info']['title'] == 'Hop & Barley API'
+
+    def test_unknown_variants_fall_back_to_default(self, api_client, settings, schema_dir):
+        """Test ?version= and ?lang= outside the allow-lists never name a file."""
+        default = api_client.get('/api/schema/')
+        for params in ({'version': '../../../escaped'}, {'version': 'v9'}, {'lang': '../x'}):
+            response = api_client.get('/api/schema/', params)
+            assert response['ETag'] == default['ETag']
+        assert [path.name for path in schema_dir.rglob('*') if path.is_file()] == [
+            'schema-default-default.yaml'
+        ]
+        assert len(schema._schemas) == 1
+
+        with pytest.raises(ValueError):
+            schema.schema_path('json', api_version='../escaped')
+
+    def test_new_code_version_regenerates(self, api_client, settings, schema_dir):
+        """Test a deploy with a new version does not serve the old artifact."""
+        etag = api_client.get('/api/schema/')['ETag']
+        (schema_dir / 'v1' / 'schema-default-default.yaml').write_bytes(b'stale: true\n')
+        settings.APP_VERSION = 'v2'
+        schema.code_version.cache_clear()
+
+        response = api_client.get('/api/schema/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304  # same API, same content
+        assert (schema_dir / 'v2' / 'schema-default-default.yaml').is_file()
@@ -1,13 +1,111 @@
-from django.db.models import Q, QuerySet, Count, Avg
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import (
+    Count, F, FloatField, Max, OuterRef, Prefetch, Q, QuerySet, Subquery,
+)
+from django.db.models.functions import Cast, NullIf
+from django.http import Http404
+from django.shortcuts import aget_object_or_404
 from django.views.generic import DetailView, ListView, TemplateView
-from rest_framework import viewsets, status
+from rest_framework import permissions, serializers, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 
+from config.async_views import AsyncReadAPIMixin
+from config.conditional import add_validators, make_etag, not_modified, page_variant
+from config.fast_serialization import ValuesListMixin
+from config.parsers import CSVParser
+from config.db_router import use_read_replica
+from orders.cart import Cart
 from orders.models import Order
+from reviews import services as review_services
 from reviews.models import Review
-from .models import Category, Product
+from .changes import dump_watermark, load_watermark, read_changes
+from .models import Category, Product, ProductTombstone
+from .pagination import ReviewCursorPagination, apaginate
 from .serializers import ProductSerializer, ReviewSerializer
+from .services import update_inventory
+
+# Reviews with their authors, as rendered on product pages and in the API
+REVIEWS_WITH_USERS = Prefetch("reviews", queryset=Review.objects.select_related("user"))
+SPARSE_ACTIONS = ("list", "retrieve", "changes")
+# Time of a product's newest review, read through the (product, created_at) index
+LATEST_REVIEW = Subquery(
+    Review.objects.filter(product=OuterRef("pk")).order_by("-created_at").values("created_at")[:1]
+)
+# Time of the newest tombstone, for the catalog validators
+LATEST_TOMBSTONE = Subquery(
+    ProductTombstone.objects.order_by("-removed_at").values("removed_at")[:1]
+)
+
+
+def product_validators(queryset, *variant):
+    """``(etag, last_modified)`` of the product in ``queryset``, or ``None`` if there is none.
+
+    One narrow query reads the product's ``updated_at`` and newest review
+    time. Changes shown on the page but made elsewhere, such as a renamed
+    category or an edited review, touch ``updated_at`` too.
+    """
+    row = queryset.annotate(last_review=LATEST_REVIEW).values_list(
+        "pk", "updated_at", "last_review"
+    ).first()
+    if row is None:
+        return None
+    pk, updated_at, last_review = row
+    last_modified = max(updated_at.timestamp(), last_review.timestamp() if last_review else 0)
+    return make_etag("product", pk, updated_at, last_review, *variant), last_modified
+
+
+def catalog_validators(*variant):
+    """``(etag, last_modified)`` of any catalog listing.
+
+    One aggregate reads the newest product ``updated_at``, the newest
+    tombstone and the product count; every write a listing can show moves
+    at least one of them.
+    """
+    state = Product.objects.aggregate(
+        count=Count("pk"), updated=Max("updated_at"), removed=Max(LATEST_TOMBSTONE)
+    )
+    last_modified = max(
+        (state[name].timestamp() for name in ("updated", "removed") if state[name]), default=0
+    )
+    etag = make_etag("catalog", state["count"], state["updated"], state["removed"], *variant)
+    return etag, last_modified
+
+
+class SparseFieldsViewMixin:
+    """Pass ``?fields=`` and ``?expand=`` of list/retrieve requests to the serializer.
+
+    Both take comma-separated names. ``get_sparse_serializer`` returns a
+    serializer pruned accordingly, so ``get_queryset`` can fetch only what
+    it will render.
+    """
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        request = self.request
+        if request is not None and self.action in SPARSE_ACTIONS:
+            params = request.query_params
+            context["fields"] = [name for name in params.get("fields", "").split(",") if name]
+            if "expand" in params:
+                context["expand"] = [name for name in params["expand"].split(",") if name]
+        return context
+
+    _sparse_serializer = None
+
+    def get_sparse_serializer(self):
+        # Built once per request: get_queryset and the values_list() path both use it
+        if self._sparse_serializer is None:
+            self._sparse_serializer = self.get_serializer_class()(
+                context=self.get_serializer_context()
+            )
+        return self._sparse_serializer
+
+    def get_values_serializer(self):
+        return self.get_sparse_serializer()
 
 
 class HomeView(ListView):
@@ -27,6 +125,7 @@ class HomeView(ListView):
         return context
 
 
+@use_read_replica
 class ProductListView(ListView):
     """Product listing view with filtering and sorting."""
 
@@ -35,9 +134,36 @@ class ProductListView(ListView):
     context_object_name = "products"
     paginate_by = 6
 
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        return not_modified(request, validators) or add_validators(
+            super().get(request, *args, **kwargs), validators
+        )
+
+    categories = None
+
+    def get_validators(self):
+        variant = page_variant(self.request)
+        if variant is None:
+            return None
+        # The sidebar lists every category, including those without products. Categories
+        # have no timestamp, so the page can't offer a Last-Modified that covers them.
+        categories = [
+            (category.pk, category.name, category.slug) for category in self.get_categories()
+        ]
+        etag, _ = catalog_validators(categories, *variant)
+        return etag, None
+
+    def get_categories(self):
+        # Loaded once per request, for the validators and the sidebar
+        if self.categories is None:
+            self.categories = list(Category.objects.all())
+        return self.categories
+
     def get_queryset(self):
         queryset = Product.objects.filter(is_active=True).annotate(
-            review_count=Count("reviews"), avg_rating=Avg("reviews__rating")
+            review_count=F("rating_count"),
+            avg_rating=Cast("rating_sum", FloatField()) / NullIf("rating_count", 0),
         )
 
         category_slug = self.request.GET.get("category")
@@ -73,39 +199,128 @@ class ProductListView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["categories"] = Category.objects.all()
-        context["current_category"] = self.request.GET.get("category", "")
-        context["current_sort"] = self.request.GET.get("sort", "-created_at")
-        context["search_query"] = self.request.GET.get("search", "")
+        context["categories"] = self.get_categories()
+        context.update(self.get_filter_context())
         return context
 
+    def get_filter_context(self):
+        return {
+            "current_category": self.request.GET.get("category", ""),
+            "current_sort": self.request.GET.get("sort", "-created_at"),
+            "search_query": self.request.GET.get("search", ""),
+        }
+
+
+class AsyncProductListView(ProductListView):
+    """ProductListView for ASGI: all queries run through the async ORM."""
+
+    async def get(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        await Cart.acreate(request)  # warm the session for the cart context processor
+        validators = await sync_to_async(self.get_validators)()
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
+
+        page_number = request.GET.get(self.page_kwarg) or 1
+        try:
+            page = await apaginate(self.get_queryset(), self.paginate_by, page_number)
+        except InvalidPage as e:
+            raise Http404(f"Invalid page ({page_number}): {e}")
+
+        self.object_list = page.object_list
+        if self.categories is None:
+            self.categories = [category async for category in Category.objects.all()]
+        context = {
+            "view": self,
+            "paginator": page.paginator,
+            "page_obj": page,
+            "is_paginated": page.has_other_pages(),
+            "object_list": page.object_list,
+            self.context_object_name: page.object_list,
+            "categories": self.categories,
+            **self.get_filter_context(),
+        }
+        return add_validators(self.render_to_response(context), validators)
+
+
+@use_read_replica
 class ProductDetailView(DetailView):
     model = Product
     template_name = "product_detail.html"
     context_object_name = "product"
 
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        return not_modified(request, validators) or add_validators(
+            super().get(request, *args, **kwargs), validators
+        )
+
+    def get_validators(self):
+        # Whether a signed-in user may review depends on their orders, not the catalog
+        variant = page_variant(self.request)
+        if variant is None or self.request.user.is_authenticated:
+            return None
+        return product_validators(
+            Product.objects.filter(slug=self.kwargs[self.slug_url_kwarg]), *variant
+        )
+
+    def get_queryset(self):
+        return super().get_queryset().prefetch_related(REVIEWS_WITH_USERS)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        product = self.object
         user = self.request.user
 
         if user.is_authenticated:
-            has_reviewed = Review.objects.filter(product=product, user=user).exists()
-
-            has_purchased = Order.objects.filter(
-                user=user,
-                items__product=product,
-                status__in=["paid", "shipped", "delivered"],
-            ).exists()
-
+            reviewed, purchased = self.get_review_querysets(self.object, user)
+            has_reviewed = reviewed.exists()
             context["has_reviewed"] = has_reviewed
-            context["can_review"] = has_purchased and not has_reviewed
+            context["can_review"] = purchased.exists() and not has_reviewed
         else:
             context["has_reviewed"] = False
             context["can_review"] = False
 
         return context
 
+    def get_review_querysets(self, product, user):
+        """Querysets telling whether ``user`` has reviewed / purchased ``product``."""
+        reviewed = Review.objects.filter(product=product, user=user)
+        purchased = Order.objects.filter(
+            user=user,
+            items__product=product,
+            status__in=review_services.PURCHASED_STATUSES,
+        )
+        return reviewed, purchased
+
+
+class AsyncProductDetailView(ProductDetailView):
+    """ProductDetailView for ASGI: all queries run through the async ORM."""
+
+    async def get(self, request, *args, **kwargs):
+        user = request.user = await request.auser()
+        await Cart.acreate(request)  # warm the session for the cart context processor
+        validators = await sync_to_async(self.get_validators)()
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
+
+        self.object = await aget_object_or_404(
+            self.get_queryset(), slug=kwargs[self.slug_url_kwarg]
+        )
+        context = {
+            "view": self,
+            "object": self.object,
+            self.context_object_name: self.object,
+            "has_reviewed": False,
+            "can_review": False,
+        }
+        if user.is_authenticated:
+            reviewed, purchased = self.get_review_querysets(self.object, user)
+            context["has_reviewed"] = await reviewed.aexists()
+            context["can_review"] = not context["has_reviewed"] and await purchased.aexists()
+        return add_validators(self.render_to_response(context), validators)
+
 
 class GuidesRecipesView(TemplateView):
     template_name = 'guides-recipes.html'
@@ -119,7 +334,10 @@ class ResourcesView(TemplateView):
 class ContactView(TemplateView):
     template_name = 'contact.html'
 
-class ProductViewSet(viewsets.ModelViewSet):
+@use_read_replica
+class ProductViewSet(
+    SparseFieldsViewMixin, ValuesListMixin, AsyncReadAPIMixin, viewsets.ModelViewSet
+):
     """API ViewSet for Product model with reviews support."""
 
     queryset = Product.objects.filter(is_active=True)
@@ -129,15 +347,185 @@ class ProductViewSet(viewsets.ModelViewSet):
     ordering_fields = ["price", "name", "created_at"]
     ordering = ["-created_at"]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in SPARSE_ACTIONS:
+            serializer = self.get_sparse_serializer()
+            queryset = queryset.only(*serializer.model_columns())
+            if serializer.is_expanded("category"):
+                queryset = queryset.select_related("category")
+            if serializer.is_expanded("reviews"):
+                queryset = queryset.prefetch_related(REVIEWS_WITH_USERS)
+        return queryset
+
+    def get_validators(self):
+        """Validators of the list or of one product, per renderer and user."""
+        variant = (self.request.accepted_renderer.format, self.request.user.pk)
+        if self.action == "list":
+            return catalog_validators(*variant)
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            products = self.queryset.filter(**{self.lookup_field: lookup})
+        except (TypeError, ValueError):
+            return None
+        return product_validators(products, *variant)
+
+    def get_bulk_ids(self):
+        """Primary keys asked for with ``?ids=``, in order and without repeats, or ``None``."""
+        value = self.request.query_params.get("ids")
+        if value is None:
+            return None
+        field = serializers.ListField(
+            child=serializers.IntegerField(min_value=1),
+            allow_empty=False,
+            max_length=settings.API_BULK_MAX_IDS,
+        )
+        try:
+            ids = field.run_validation([pk.strip() for pk in value.split(",") if pk.strip()])
+        except ValidationError as exc:
+            raise ValidationError({"ids": exc.detail})
+        return list(dict.fromkeys(ids))
+
+    def bulk_response(self, ids):
+        return Response(self.bulk_data(self.filter_queryset(self.get_queryset()), ids))
+
+    def bulk_data(self, queryset, ids):
+        """The products of ``ids`` in ``queryset``, in the order asked for, leaving out unknown ones."""
+        queryset = queryset.filter(pk__in=ids).order_by()
+        plan = self.get_values_plan()
+        if plan is not None:
+            rows = list(plan.values(queryset))
+            found = dict(zip((row[0] for row in rows), plan.build(rows)))
+            return [found[pk] for pk in ids if pk in found]
+        found = {product.pk: product for product in queryset}
+        products = [found[pk] for pk in ids if pk in found]
+        return self.get_serializer(products, many=True).data
+
+    def list(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
+        ids = self.get_bulk_ids()
+        if ids is not None:
+            return add_validators(self.bulk_response(ids), validators)
+        return add_validators(super().list(request, *args, **kwargs), validators)
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        return not_modified(request, validators) or add_validators(
+            super().retrieve(request, *args, **kwargs), validators
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        """Async ``list`` used by the ASGI read path."""
+        validators = await sync_to_async(self.get_validators)()
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
+        ids = self.get_bulk_ids()
+        if ids is not None:
+            response = await sync_to_async(self.bulk_response)(ids)
+            return add_validators(response, validators)
+        plan = self.get_values_plan()
+        if plan is not None:
+            # values_list() querysets run their query as soon as iteration
+            # starts, so they can't be iterated asynchronously
+            response = await sync_to_async(self.values_list_response)(plan)
+            return add_validators(response, validators)
+        queryset = await sync_to_async(self.filter_queryset)(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return add_validators(self.get_paginated_response(serializer.data), validators)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        """Async ``retrieve`` used by the ASGI read path."""
+        validators = await sync_to_async(self.get_validators)()
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
+        queryset = await sync_to_async(self.filter_queryset)(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            instance = await queryset.aget(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+        except (Product.DoesNotExist, TypeError, ValueError):
+            raise Http404
+        self.check_object_permissions(request, instance)
+        serializer = self.get_serializer(instance)
+        return add_validators(Response(serializer.data), validators)
+
+    @action(detail=False, url_path="changes")
+    def changes(self, request):
+        """Products changed or removed since the ``?since=`` watermark (see ``products.changes``)."""
+        params = request.query_params
+        try:
+            watermark = load_watermark(params["since"]) if params.get("since") else None
+        except ValueError as exc:
+            raise ValidationError({"since": str(exc)})
+        limit_field = serializers.IntegerField(
+            min_value=1, max_value=settings.CATALOG_CHANGES_PAGE_SIZE
+        )
+        try:
+            limit = limit_field.run_validation(
+                params.get("limit", settings.CATALOG_CHANGES_PAGE_SIZE)
+            )
+        except ValidationError as exc:
+            raise ValidationError({"limit": exc.detail})
+
+        page = read_changes(self.get_queryset(), watermark, limit)
+        return Response({
+            "changed": self.bulk_data(self.get_queryset(), page.changed),
+            "removed": page.removed,
+            "since": dump_watermark(page.watermark),
+            "has_more": page.has_more,
+        })
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="inventory",
+        permission_classes=[permissions.IsAdminUser],
+        parser_classes=[JSONParser, CSVParser],
+    )
+    def inventory(self, request):
+        """Set stock and/or price of many products by slug (JSON list or CSV with a header)."""
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response(
+                {"detail": "Expected a list of rows with slug, stock and price."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(rows) > settings.INVENTORY_UPDATE_MAX_ROWS:
+            return Response(
+                {"detail": f"At most {settings.INVENTORY_UPDATE_MAX_ROWS} rows per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(update_inventory(rows))
+
     @action(detail=True, methods=["get", "post"], url_path="reviews")
     def reviews(self, request, pk=None):
         """Get or create reviews for a product."""
-        product = self.get_object()
-
         if request.method == "GET":
-            reviews = product.reviews.all()
-            serializer = ReviewSerializer(reviews, many=True)
-            return Response(serializer.data)
+            product = self.get_object()
+            fields = [name for name in request.query_params.get("fields", "").split(",") if name]
+            reviews = Review.objects.filter(product=product)
+            if not fields or "user" in fields:
+                reviews = reviews.select_related("user")
+
+            rating = request.query_params.get("rating")
+            if rating:
+                if rating not in {"1", "2", "3", "4", "5"}:
+                    return Response(
+                        {"rating": "Must be an integer between 1 and 5."},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                reviews = reviews.filter(rating=rating)
+
+            # No view passed: the viewset's OrderingFilter must not override the cursor ordering
+            paginator = ReviewCursorPagination()
+            page = paginator.paginate_queryset(reviews, request)
+            serializer = ReviewSerializer(page, many=True, context={"fields": fields})
+            return paginator.get_paginated_response(serializer.data)
 
         elif request.method == "POST":
             if not request.user.is_authenticated:
@@ -146,27 +534,33 @@ class ProductViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_401_UNAUTHORIZED,
                 )
 
-            # Check if user already reviewed
-            if Review.objects.filter(product=product, user=request.user).exists():
+            serializer = ReviewSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                products = self.get_queryset().filter(pk=pk)
+            except (TypeError, ValueError):
+                raise Http404
+            result = review_services.submit_review(
+                products,
+                request.user,
+                serializer.validated_data["rating"],
+                serializer.validated_data["text"],
+            )
+
+            if result["status"] == review_services.NOT_FOUND:
+                raise Http404
+            if result["status"] == review_services.ALREADY_REVIEWED:
                 return Response(
                     {"error": "You have already reviewed this product"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-
-            has_purchased = Order.objects.filter(
-                user=request.user,
-                items__product=product,
-                status__in=["paid", "shipped", "delivered"],
-            ).exists()
-
-            if not has_purchased:
+            if result["status"] == review_services.NOT_PURCHASED:
                 return Response(
                     {"error": "You can only review products you have purchased"},
                     status=status.HTTP_403_FORBIDDEN,
                 )
-
-            serializer = ReviewSerializer(data=request.data)
-            if serializer.is_valid():
-                serializer.save(user=request.user, product=product)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response(
+                ReviewSerializer(result["review"]).data, status=status.HTTP_201_CREATED
+            )
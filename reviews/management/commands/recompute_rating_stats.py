@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.services import recompute_rating_stats
+
+
+class Command(BaseCommand):
+    """Rebuild per-product rating counters from the review table."""
+
+    help = "Recompute rating count, sum and per-star counters for all products."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of products recomputed per chunk.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be positive.")
+
+        stats = recompute_rating_stats(batch_size=options["batch_size"])
+        rate = stats["products"] / stats["elapsed"] if stats["elapsed"] else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recomputed rating stats for {stats['products']} products "
+                f"({stats['updated']} changed) "
+                f"in {stats['batches']} batches in {stats['elapsed']:.2f}s "
+                f"({rate:.0f} products/s)."
+            )
+        )
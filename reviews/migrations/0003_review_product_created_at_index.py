@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-19 03:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_rating_distribution'),
+        ('reviews', '0002_alter_review_options_alter_review_unique_together'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'created_at'], name='reviews_rev_product_847b15_idx'),
+        ),
+    ]
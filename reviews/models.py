@@ -1,5 +1,5 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 
 from products.models import Product
 
@@ -21,6 +21,12 @@ class Review(models.Model):
     class Meta:
         ordering = ["-created_at"]
         unique_together = ["product", "user"]
+        indexes = [models.Index(fields=["product", "created_at"])]
+
+    def save(self, *args, **kwargs):
+        # Product rating counters are updated by signals; keep them in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Review by {self.user} for {self.product.name}: {self.rating}/5"
@@ -0,0 +1,180 @@
+import time
+from typing import Any, Dict
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Exists, F, OuterRef, QuerySet, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from products.models import Product
+
+from .models import Review
+
+PURCHASED_STATUSES = [
+    Order.Status.PAID,
+    Order.Status.SHIPPED,
+    Order.Status.DELIVERED,
+]
+
+CREATED = 'created'
+ALREADY_REVIEWED = 'already_reviewed'
+NOT_PURCHASED = 'not_purchased'
+NOT_FOUND = 'not_found'
+
+
+def rating_counter_updates(rating: int, delta: int) -> Dict[str, F]:
+    """Build ``update()`` kwargs adding ``delta`` reviews of ``rating`` stars."""
+    updates = {
+        'rating_count': F('rating_count') + delta,
+        'rating_sum': F('rating_sum') + rating * delta,
+        # The product's rendered rating changes (products.changes)
+        'updated_at': timezone.now(),
+    }
+    if 1 <= rating <= 5:
+        updates[f'rating_{rating}'] = F(f'rating_{rating}') + delta
+    return updates
+
+
+def submit_review(products: QuerySet, user, rating: int, text: str) -> Dict[str, Any]:
+    """Create a review in one INSERT ... SELECT guarded by purchase history.
+
+    The row is only inserted when ``products`` matches a product the user
+    has bought; the ``(product, user)`` unique constraint rejects repeat
+    reviews. Product rating aggregates are bumped in the same transaction,
+    so a successful submission costs two statements.
+
+    Args:
+        products: Queryset narrowed to the product being reviewed.
+        user: The reviewing user.
+        rating: Validated rating (1-5).
+        text: Validated review text.
+
+    Returns:
+        Dict with ``status`` (one of CREATED, ALREADY_REVIEWED,
+        NOT_PURCHASED, NOT_FOUND) and the created ``review`` or None.
+    """
+    created_at = timezone.now()
+    eligible = (
+        products.filter(
+            Exists(
+                OrderItem.objects.filter(
+                    product=OuterRef('pk'),
+                    order__user=user,
+                    order__status__in=PURCHASED_STATUSES,
+                )
+            )
+        )
+        .order_by()
+        .values_list('pk', Value(user.pk), Value(rating), Value(text), Value(created_at))
+    )
+    select_sql, params = eligible.query.sql_with_params()
+
+    qn = connection.ops.quote_name
+    opts = Review._meta
+    columns = ', '.join(
+        qn(opts.get_field(name).column)
+        for name in ('product', 'user', 'rating', 'text', 'created_at')
+    )
+    sql = (
+        f'INSERT INTO {qn(opts.db_table)} ({columns}) {select_sql} '
+        f'RETURNING {qn(opts.pk.column)}, {qn(opts.get_field("product").column)}'
+    )
+
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                row = cursor.fetchone()
+            if row:
+                Product.objects.filter(pk=row[1]).update(**rating_counter_updates(rating, 1))
+    except IntegrityError:
+        # Only the (product, user) unique constraint means a repeat review
+        if _rejection_status(products, user) != ALREADY_REVIEWED:
+            raise
+        return {'status': ALREADY_REVIEWED, 'review': None}
+
+    if row is None:
+        return {'status': _rejection_status(products, user), 'review': None}
+
+    review = Review(
+        id=row[0],
+        product_id=row[1],
+        user=user,
+        rating=rating,
+        text=text,
+        created_at=created_at,
+    )
+    return {'status': CREATED, 'review': review}
+
+
+def _rejection_status(products: QuerySet, user) -> str:
+    """Why ``submit_review`` inserted nothing, in one query run only on rejection.
+
+    An existing review wins over a missing purchase, so a user whose order
+    was since cancelled is still told they already reviewed the product.
+    """
+    reviewed = products.annotate(
+        reviewed=Exists(Review.objects.filter(product=OuterRef('pk'), user=user))
+    ).values_list('reviewed', flat=True).first()
+    if reviewed is None:
+        return NOT_FOUND
+    return ALREADY_REVIEWED if reviewed else NOT_PURCHASED
+
+
+def recompute_rating_stats(batch_size: int = 1000) -> Dict[str, float]:
+    """Rebuild every product's rating aggregates from the review table.
+
+    Products are walked in primary key order, ``batch_size`` at a time;
+    each chunk is one ``UPDATE`` whose counters are correlated subqueries
+    over the product's reviews, so the work stays in the database. Only
+    products whose counters drifted are written, and they get a new
+    ``updated_at`` since their rendered rating changes (``products.changes``).
+
+    Args:
+        batch_size: Number of products recomputed per chunk.
+
+    Returns:
+        Dict with processed and updated product counts, batch count and
+        elapsed time in seconds.
+    """
+    def aggregate(expression, **filters):
+        reviews = (
+            Review.objects.filter(product=OuterRef('pk'), **filters)
+            .order_by()
+            .values('product')
+            .annotate(value=expression)
+            .values('value')
+        )
+        return Coalesce(Subquery(reviews), 0)
+
+    counters = {
+        'rating_count': aggregate(Count('pk')),
+        'rating_sum': aggregate(Sum('rating')),
+        **{f'rating_{stars}': aggregate(Count('pk'), rating=stars) for stars in range(1, 6)},
+    }
+    stats = {'products': 0, 'updated': 0, 'batches': 0, 'elapsed': 0.0}
+    started = time.monotonic()
+    last_pk = 0
+
+    while True:
+        product_ids = list(
+            Product.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not product_ids:
+            break
+
+        stats['updated'] += (
+            Product.objects.filter(pk__in=product_ids)
+            .exclude(**counters)
+            .update(**counters, updated_at=timezone.now())
+        )
+
+        stats['products'] += len(product_ids)
+        stats['batches'] += 1
+        last_pk = product_ids[-1]
+
+    stats['elapsed'] = time.monotonic() - started
+    return stats
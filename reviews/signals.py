@@ -0,0 +1,50 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from products.models import Product
+
+from .models import Review
+from .services import rating_counter_updates
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    """Stash the stored rating so an edit can move it between counters."""
+    instance._previous_rating = None
+    if instance.pk and not raw:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk).values_list('rating', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    """Count a new review, or move an edited one to its new rating."""
+    if raw:
+        return
+    previous = instance._previous_rating
+    products = Product.objects.filter(pk=instance.product_id)
+    if created or previous is None:
+        products.update(**rating_counter_updates(instance.rating, 1))
+    elif previous != instance.rating:
+        updates = {
+            'rating_sum': F('rating_sum') + (instance.rating - previous),
+            'updated_at': timezone.now(),
+        }
+        for stars, delta in ((previous, -1), (instance.rating, 1)):
+            if 1 <= stars <= 5:
+                updates[f'rating_{stars}'] = F(f'rating_{stars}') + delta
+        products.update(**updates)
+    else:
+        # The product page shows the review text
+        products.update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Review)
+def update_counters_on_delete(sender, instance, **kwargs):
+    """Uncount a deleted review."""
+    Product.objects.filter(pk=instance.product_id).update(
+        **rating_counter_updates(instance.rating, -1)
+    )
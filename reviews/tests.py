@@ -2,8 +2,13 @@
 
 import pytest
 
+from django.core.management import call_command
+from django.db import IntegrityError
 from django.urls import reverse
 
+from orders.models import Order
+from products.models import Product
+from reviews import services
 from reviews.models import Review
 
 
@@ -105,8 +110,40 @@ class TestReviewAPI:
         """Test getting reviews for a product."""
         response = api_client.get(f'/api/products/{product.id}/reviews/')
         assert response.status_code == 200
-        assert len(response.data) == 1
-        assert response.data[0]['rating'] == review.rating
+        assert len(response.data['results']) == 1
+        assert response.data['results'][0]['rating'] == review.rating
+
+    def test_reviews_cursor_pagination(self, api_client, product, django_user_model):
+        """Test reviews are paged newest first with a cursor."""
+        for index in range(3):
+            reviewer = django_user_model.objects.create_user(username=f'reviewer{index}')
+            Review.objects.create(product=product, user=reviewer, rating=5, text=str(index))
+
+        url = f'/api/products/{product.id}/reviews/'
+        first = api_client.get(url, {'page_size': 2})
+        assert [row['text'] for row in first.data['results']] == ['2', '1']
+        second = api_client.get(first.data['next'])
+        assert [row['text'] for row in second.data['results']] == ['0']
+        assert second.data['next'] is None
+
+    def test_reviews_sparse_fields_and_rating_filter(self, api_client, product, review):
+        """Test ?fields= prunes the payload and ?rating= filters rows."""
+        url = f'/api/products/{product.id}/reviews/'
+        response = api_client.get(url, {'fields': 'id,rating', 'rating': 5})
+        assert response.data['results'] == [{'id': review.id, 'rating': 5}]
+        assert api_client.get(url, {'rating': 4}).data['results'] == []
+        assert api_client.get(url, {'rating': 'x'}).status_code == 400
+
+    def test_reviews_no_per_row_user_queries(
+        self, api_client, product, django_user_model, django_assert_max_num_queries
+    ):
+        """Test usernames are joined rather than fetched per review."""
+        for index in range(5):
+            reviewer = django_user_model.objects.create_user(username=f'reviewer{index}')
+            Review.objects.create(product=product, user=reviewer, rating=4, text='Ok')
+
+        with django_assert_max_num_queries(2):
+            api_client.get(f'/api/products/{product.id}/reviews/')
 
     def test_create_review_requires_auth(self, api_client, product):
         """Test review creation requires authentication."""
@@ -132,3 +169,115 @@ class TestReviewAPI:
         })
         assert response.status_code == 201
         assert response.data['rating'] == 5
+
+
+@pytest.mark.django_db
+class TestReviewSubmissionService:
+    """Tests for the single-statement review submission service."""
+
+    def test_submission_updates_product_aggregates(self, user, product, order):
+        """Test a successful submission bumps the rating aggregates."""
+        result = services.submit_review(
+            Product.objects.filter(pk=product.pk), user, 4, 'Good'
+        )
+        product.refresh_from_db()
+        assert result['status'] == services.CREATED
+        assert result['review'].pk == Review.objects.get(product=product, user=user).pk
+        assert product.rating_count == 1
+        assert product.rating_sum == 4
+
+    def test_submission_query_budget(self, user, product, order, django_assert_max_num_queries):
+        """Test a successful submission needs only the insert and aggregate update."""
+        products = Product.objects.filter(pk=product.pk)
+        # INSERT ... SELECT and UPDATE, plus SAVEPOINT/RELEASE inside the test transaction
+        with django_assert_max_num_queries(4):
+            services.submit_review(products, user, 5, 'Great')
+
+    def test_duplicate_submission_reported(self, user, product, order, review):
+        """Test the unique constraint is reported as already reviewed."""
+        result = services.submit_review(
+            Product.objects.filter(pk=product.pk), user, 3, 'Again'
+        )
+        product.refresh_from_db()
+        assert result['status'] == services.ALREADY_REVIEWED
+        assert product.rating_count == 1
+
+    def test_existing_review_wins_over_missing_purchase(self, user, product, order, review):
+        """Test a reviewer whose order was cancelled is told they already reviewed."""
+        Order.objects.filter(pk=order.pk).update(status=Order.Status.CANCELLED)
+        result = services.submit_review(Product.objects.filter(pk=product.pk), user, 3, 'Again')
+        assert result['status'] == services.ALREADY_REVIEWED
+
+    def test_other_integrity_errors_raise(self, user, product, order):
+        """Test constraint failures other than a repeat review aren't reported as one."""
+        with pytest.raises(IntegrityError):
+            services.submit_review(Product.objects.filter(pk=product.pk), user, -1, 'Bad')
+
+    def test_missing_product_reported(self, user):
+        """Test an unknown product is distinguished from a missing purchase."""
+        result = services.submit_review(Product.objects.filter(pk=0), user, 5, 'Hm')
+        assert result['status'] == services.NOT_FOUND
+
+    def test_duplicate_review_api(self, authenticated_client, product, order, review):
+        """Test API rejects a second review from the same user."""
+        response = authenticated_client.post(f'/api/products/{product.id}/reviews/', {
+            'rating': 4,
+            'text': 'Again'
+        })
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestRatingDistribution:
+    """Tests for per-star rating counters on products."""
+
+    def test_counters_follow_review_changes(self, user, product):
+        """Test counters track review creation, edits and deletion."""
+        review = Review.objects.create(product=product, user=user, rating=5, text='Top')
+        product.refresh_from_db()
+        assert product.rating_distribution == {5: 1, 4: 0, 3: 0, 2: 0, 1: 0}
+
+        review.rating = 2
+        review.save()
+        product.refresh_from_db()
+        assert product.rating_5 == 0
+        assert product.rating_2 == 1
+        assert product.rating_sum == 2
+
+        review.delete()
+        product.refresh_from_db()
+        assert product.rating_count == 0
+        assert product.rating_2 == 0
+
+    def test_service_submission_counted_once(self, user, product, order):
+        """Test the raw insert path updates the per-star counter once."""
+        services.submit_review(Product.objects.filter(pk=product.pk), user, 3, 'Ok')
+        product.refresh_from_db()
+        assert product.rating_3 == 1
+        assert product.rating_count == 1
+
+    def test_recompute_command(self, user, product, review):
+        """Test the recompute command rebuilds drifted counters."""
+        Product.objects.filter(pk=product.pk).update(rating_count=9, rating_5=0, rating_1=4)
+        call_command('recompute_rating_stats', '--batch-size=1')
+        product.refresh_from_db()
+        assert product.rating_count == 1
+        assert product.rating_sum == 5
+        assert product.rating_distribution == {5: 1, 4: 0, 3: 0, 2: 0, 1: 0}
+
+    def test_recompute_touches_only_changed_products(self, product, product_out_of_stock, review):
+        """Test recomputing moves updated_at of drifted products and leaves the rest alone."""
+        Product.objects.filter(pk=product.pk).update(rating_count=9)
+        before = dict(Product.objects.values_list('pk', 'updated_at'))
+        stats = services.recompute_rating_stats()
+        after = dict(Product.objects.values_list('pk', 'updated_at'))
+        assert stats['updated'] == 1
+        assert after[product.pk] > before[product.pk]
+        assert after[product_out_of_stock.pk] == before[product_out_of_stock.pk]
+
+        assert services.recompute_rating_stats()['updated'] == 0
+
+    def test_distribution_in_api(self, api_client, product, review):
+        """Test the product API exposes the star breakdown."""
+        response = api_client.get(f'/api/products/{product.id}/')
+        assert response.data['rating_distribution']['5'] == 1
@@ -1,13 +1,13 @@
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404, redirect
+from django.http import Http404
+from django.shortcuts import redirect
 from django.views import View
 
-from orders.models import Order
 from products.models import Product
 
+from . import services
 from .forms import ReviewForm
-from .models import Review
 
 
 class ReviewCreateView(LoginRequiredMixin, View):
@@ -18,36 +18,27 @@ class ReviewCreateView(LoginRequiredMixin, View):
     """
 
     def post(self, request, slug):
-        product = get_object_or_404(Product, slug=slug)
-
-        existing_review = Review.objects.filter(
-            product=product, user=request.user
-        ).exists()
-
-        if existing_review:
-            messages.error(request, "You have already reviewed this product.")
+        form = ReviewForm(request.POST)
+        if not form.is_valid():
+            messages.error(request, "Please correct errors below.")
             return redirect("product_detail", slug=slug)
 
-        has_purchased = Order.objects.filter(
-            user=request.user,
-            items__product=product,
-            status__in=["paid", "shipped", "delivered"],
-        ).exists()
+        result = services.submit_review(
+            Product.objects.filter(slug=slug),
+            request.user,
+            form.cleaned_data["rating"],
+            form.cleaned_data["text"],
+        )
 
-        if not has_purchased:
+        if result["status"] == services.NOT_FOUND:
+            raise Http404("No product matches the given query.")
+        if result["status"] == services.ALREADY_REVIEWED:
+            messages.error(request, "You have already reviewed this product.")
+        elif result["status"] == services.NOT_PURCHASED:
             messages.error(
                 request, "You can only leave a review for products you have purchased."
             )
-            return redirect("product_detail", slug=slug)
-
-        form = ReviewForm(request.POST)
-        if form.is_valid():
-            review = form.save(commit=False)
-            review.product = product
-            review.user = request.user
-            review.save()
-            messages.success(request, "Your review has been submitted.")
         else:
-            messages.error(request, "Please correct errors below.")
+            messages.success(request, "Your review has been submitted.")
 
         return redirect("product_detail", slug=slug)
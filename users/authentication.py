@@ -0,0 +1,119 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from config.metrics import CACHE_LOOKUPS
+
+# Claims added to issued tokens and trusted when JWT_TRUST_USER_CLAIMS is on
+USER_CLAIMS = ("username", "is_staff")
+# User fields kept in the auth cache, besides the password fingerprint
+CACHED_FIELDS = ("is_active", "is_staff")
+
+
+def user_cache_key(user_id) -> str:
+    return f"auth:user:{user_id}"
+
+
+def invalidate_cached_user(user_id) -> None:
+    cache.delete(user_cache_key(user_id))
+
+
+def partial_user(user_model, values):
+    """A read-only ``user_model`` instance with only the given field values.
+
+    Reading any other field loads all of them in one query, the query the
+    uncached path makes anyway; a view that reads, say, ``email`` saves
+    nothing by the cache but pays no more than without it. ``save()`` and
+    ``delete()`` raise, so a partial user can't overwrite the row.
+    """
+    # from_db() takes the values in field order
+    names = [f.attname for f in user_model._meta.concrete_fields if f.attname in values]
+    user = user_model.from_db(None, names, [values[name] for name in names])
+    user.save = user.delete = _read_only
+    user.refresh_from_db = partial(_refresh_deferred, user)
+    user.is_partial = True
+    return user
+
+
+def _refresh_deferred(user, using=None, fields=None, from_queryset=None):
+    # A deferred field read asks for that field alone; fetch the rest along with it
+    if fields is not None:
+        fields = {*fields, *user.get_deferred_fields()}
+    type(user).refresh_from_db(user, using=using, fields=fields, from_queryset=from_queryset)
+
+
+def _read_only(*args, **kwargs):
+    raise TypeError("This user was built from the auth cache or token claims; load it to save.")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that resolves users without a per-request query.
+
+    Users are checked against a short-lived cache entry holding the
+    ``CACHED_FIELDS`` and a fingerprint of the password, which is dropped
+    whenever the user row is saved or deleted (see ``users.signals``).
+    With ``JWT_TRUST_USER_CLAIMS`` enabled, tokens carrying the
+    ``USER_CLAIMS`` are turned into a user without touching the cache at
+    all. Either way the user is a read-only ``partial_user``.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+        if settings.JWT_TRUST_USER_CLAIMS and all(
+            claim in validated_token for claim in USER_CLAIMS
+        ):
+            return self.get_user_from_claims(user_id, validated_token)
+
+        key = user_cache_key(user_id)
+        cached = cache.get(key)
+        if cached is None:
+            CACHE_LOOKUPS.inc(cache="auth_user", result="miss")
+            user = super().get_user(validated_token)
+            cached = {field: getattr(user, field) for field in CACHED_FIELDS}
+            cached["password"] = get_md5_hash_password(user.password)
+            cache.set(key, cached, settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+        CACHE_LOOKUPS.inc(cache="auth_user", result="hit")
+
+        # Same checks as the parent class, against the cached fields
+        if api_settings.CHECK_USER_IS_ACTIVE and not cached["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != cached["password"]:
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+        return partial_user(
+            self.user_model,
+            {**self.user_id_value(user_id), **{field: cached[field] for field in CACHED_FIELDS}},
+        )
+
+    def get_user_from_claims(self, user_id, validated_token):
+        user = partial_user(
+            self.user_model,
+            {
+                **self.user_id_value(user_id),
+                **{claim: validated_token[claim] for claim in USER_CLAIMS},
+                "is_active": True,
+            },
+        )
+        user.from_token_claims = True
+        return user
+
+    def user_id_value(self, user_id):
+        """``{attname: value}`` of the user id field, from the token claim."""
+        id_field = self.user_model._meta.get_field(api_settings.USER_ID_FIELD)
+        return {id_field.attname: id_field.to_python(user_id)}
@@ -3,6 +3,9 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from .authentication import USER_CLAIMS
 
 User = get_user_model()
 
@@ -51,3 +54,14 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             phone=validated_data.get('phone', ''),
         )
         return user
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token serializer embedding the claims CachedJWTAuthentication can trust."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    """Forget the cached auth user on any change (profile, password, is_active)."""
+    invalidate_cached_user(instance.pk)
+    # Again after commit, in case a concurrent request re-cached the old row
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
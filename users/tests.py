@@ -4,6 +4,12 @@ import pytest
 
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.authentication import CachedJWTAuthentication, user_cache_key
 
 User = get_user_model()
 
@@ -193,3 +199,75 @@ class TestUserAPI:
         })
         assert response.status_code == 200
         assert 'access' in response.data
+
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+    """Tests for cached JWT user resolution."""
+
+    def test_cache_hit_needs_no_queries(self, user, django_assert_num_queries):
+        """Test a cached user resolves without queries, read-only and without its password."""
+        token = AccessToken.for_user(user)
+        authentication = CachedJWTAuthentication()
+        authentication.get_user(token)
+        assert set(cache.get(user_cache_key(user.pk))) == {'is_active', 'is_staff', 'password'}
+        assert user.password not in cache.get(user_cache_key(user.pk)).values()
+
+        with django_assert_num_queries(0):
+            resolved = authentication.get_user(token)
+        assert (resolved.pk, resolved.is_staff) == (user.pk, user.is_staff)
+        with django_assert_num_queries(1):  # the rest of the row, on first access
+            assert (resolved.email, resolved.username, resolved.last_name) == (
+                user.email, user.username, user.last_name
+            )
+        with pytest.raises(TypeError):
+            resolved.save()
+
+    def test_view_reading_uncached_fields(self, authenticated_client, user, product, order):
+        """Test a view reading fields outside the cache loads the user row once, not per field."""
+        authenticated_client.get('/api/orders/')  # warm the auth cache
+        with CaptureQueriesContext(connection) as captured:
+            response = authenticated_client.post('/api/orders/', {
+                'full_name': 'Test User', 'phone': '123', 'city': 'Town', 'address': '1 Road',
+            })
+        assert response.status_code == 201
+        assert response.data['user'] == user.username
+        user_table = connection.ops.quote_name(User._meta.db_table)
+        assert sum(f'FROM {user_table}' in query['sql'] for query in captured) == 1
+
+    def test_deactivation_invalidates_cache(self, authenticated_client, user):
+        """Test a deactivated user is rejected despite a warm cache."""
+        assert authenticated_client.get('/api/users/profile/').status_code == 200
+        user.is_active = False
+        user.save()
+        assert authenticated_client.get('/api/users/profile/').status_code == 401
+
+    def test_profile_change_visible(self, authenticated_client, user):
+        """Test profile updates are not masked by the cached user."""
+        authenticated_client.get('/api/users/profile/')
+        user.email = 'changed@example.com'
+        user.save()
+        response = authenticated_client.get('/api/users/profile/')
+        assert response.data['email'] == 'changed@example.com'
+
+    def test_trusted_claims(self, api_client, user, settings, django_assert_num_queries):
+        """Test trusted token claims authenticate without cache or database."""
+        settings.JWT_TRUST_USER_CLAIMS = True
+        token = api_client.post('/api/token/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        }).data['access']
+
+        with django_assert_num_queries(0):
+            resolved = CachedJWTAuthentication().get_user(AccessToken(token))
+        assert resolved.pk == user.pk
+        assert resolved.username == user.username
+        assert resolved.from_token_claims is True
+        with pytest.raises(TypeError):
+            resolved.save()
+        user.refresh_from_db()
+        assert user.email
+
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = api_client.get('/api/users/profile/')
+        assert response.data['email'] == user.email
@@ -1,5 +1,5 @@
 from django.contrib import messages
-from django.contrib.auth import logout, update_session_auth_hash
+from django.contrib.auth import get_user_model, logout, update_session_auth_hash
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import redirect
@@ -9,12 +9,16 @@ from django.views.decorators.http import require_POST
 from django.views.generic import CreateView, TemplateView
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from config.db_router import use_read_replica
 from orders.models import Order
 
 from .forms import RegisterForm, ProfileUpdateForm
 from .serializers import UserRegistrationSerializer, UserSerializer
 
+User = get_user_model()
+
 
 class RegisterView(CreateView):
     """User registration view."""
@@ -29,6 +33,7 @@ class RegisterView(CreateView):
         return response
 
 
+@use_read_replica
 class ProfileView(LoginRequiredMixin, TemplateView):
     """User profile view showing account info and order history."""
 
@@ -110,6 +115,18 @@ class RegisterAPIView(generics.CreateAPIView):
         )
 
 
+class ThrottledTokenObtainView(TokenObtainPairView):
+    """JWT token endpoint throttled under the ``token`` scope."""
+
+    throttle_scope = "token"
+
+
+class ThrottledTokenRefreshView(TokenRefreshView):
+    """JWT refresh endpoint throttled under the ``token`` scope."""
+
+    throttle_scope = "token"
+
+
 class UserProfileAPIView(generics.RetrieveUpdateAPIView):
     """API endpoint for viewing and updating user profile."""
 
@@ -117,4 +134,8 @@ class UserProfileAPIView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        user = self.request.user
+        if getattr(user, "is_partial", False):
+            # Users from the auth cache or token claims are read-only; load the full row
+            user = User.objects.get(pk=user.pk)
+        return user